@@ -0,0 +1,185 @@
+"""
+Asset Pack - Prekompilowane sygnały testowe na dysku
+Bose Audio Multi-Tool
+
+Jeden wersjonowany plik: nagłówek + indeks JSON + bloki PCM int16 stereo
+wyrównane do strony. Plik jest mapowany przez np.memmap, więc start aplikacji
+nie syntezuje ani nie wczytuje niczego - strony trafiają do pamięci dopiero
+przy tworzeniu dźwięku. Kluczem bloku jest skrót parametrów sygnału
+(z częstotliwością próbkowania), więc zmiana configu unieważnia tylko
+dotknięte wpisy.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+import pygame
+
+PACK_VERSION = 1
+PACK_MAGIC = b"BOSEPACK"
+PACK_DIR = "audio_cache"
+PACK_FILE = os.path.join(PACK_DIR, "signals.pack")
+
+HEADER = struct.Struct("<8sII")   # magic, wersja, długość indeksu
+PAGE = 4096
+FRAME_BYTES = 4                   # int16 × 2 kanały
+
+
+def asset_key(key):
+    """Skrót parametrów sygnału - klucz bloku w paczce"""
+    raw = f"{PACK_VERSION}:{key!r}".encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _align(offset):
+    return (offset + PAGE - 1) // PAGE * PAGE
+
+
+class AssetPack:
+    """Paczka sygnałów - singleton"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.path = PACK_FILE
+        self.entries = {}          # skrót → {'name', 'offset', 'frames'}
+        self._map = None
+        self._data_start = 0
+        self._lock = threading.Lock()          # odczyt/podmiana mapy
+        self._build_lock = threading.Lock()    # jedna przebudowa naraz
+
+    # ─────────────────────────────────────────
+    # ODCZYT
+    # ─────────────────────────────────────────
+
+    def load(self):
+        """Mapuje paczkę z dysku; brak pliku lub inna wersja = pusta paczka"""
+        with self._lock:
+            self._open()
+        print(f"[AssetPack] Załadowano {len(self.entries)} sygnałów z {self.path}")
+
+    def _open(self):
+        self._map = None
+        self.entries = {}
+
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                magic, version, index_len = HEADER.unpack(f.read(HEADER.size))
+                if magic != PACK_MAGIC or version != PACK_VERSION:
+                    print(f"[AssetPack] Nieaktualna paczka (wersja {version}) - zostanie przebudowana")
+                    return
+                index = json.loads(f.read(index_len).decode('utf-8'))
+
+            self._data_start = _align(HEADER.size + index_len)
+            self.entries = index['entries']
+            self._map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        except Exception as e:
+            print(f"[AssetPack] Błąd odczytu paczki: {e}")
+            self._map = None
+            self.entries = {}
+
+    def _block(self, entry):
+        """Widok int16 (N, 2) na zmapowany blok"""
+        start = self._data_start + entry['offset']
+        stop = start + entry['frames'] * FRAME_BYTES
+        return self._map[start:stop].view(np.int16).reshape(-1, 2)
+
+    def load_sound(self, key):
+        """
+        Zwraca pygame.Sound dla klucza albo None, gdy paczka go nie zawiera
+        SDL_mixer i tak kopiuje próbki do własnego bufora - z mapy czytane są
+        tylko strony tego bloku, a widok nie wychodzi poza blokadę
+        """
+        with self._lock:
+            entry = self.entries.get(asset_key(key))
+            if entry is None or self._map is None:
+                return None, 0
+            block = self._block(entry)
+            return pygame.mixer.Sound(buffer=block), block.nbytes
+
+    # ─────────────────────────────────────────
+    # PRZEBUDOWA
+    # ─────────────────────────────────────────
+
+    def update(self, specs):
+        """
+        Doprowadza paczkę do zestawu specs = {nazwa: (klucz, render)}
+        Renderowane są tylko brakujące wpisy, aktualne bloki są przepisywane bez
+        syntezy, a nieużywane (stary config) wypadają. Zwraca liczbę wyrenderowanych
+        """
+        with self._build_lock:
+            wanted = {asset_key(key): (name, render) for name, (key, render) in specs.items()}
+
+            with self._lock:
+                current = set(self.entries)
+            missing = [h for h in wanted if h not in current]
+            if not missing and current == set(wanted):
+                return 0
+
+            rendered = {}
+            for h in missing:
+                name, render = wanted[h]
+                rendered[h] = np.ascontiguousarray(render(), dtype=np.int16)
+                print(f"[AssetPack] Wyrenderowano: {name}")
+
+            self._write(wanted, rendered)
+            return len(missing)
+
+    def _write(self, wanted, rendered):
+        """Zapisuje nową paczkę do pliku tymczasowego i podmienia ją atomowo"""
+        index = {}
+        offset = 0
+        for h, (name, _) in wanted.items():
+            frames = len(rendered[h]) if h in rendered else self.entries[h]['frames']
+            index[h] = {'name': name, 'offset': offset, 'frames': frames}
+            offset = _align(offset + frames * FRAME_BYTES)
+
+        index_bytes = json.dumps({'entries': index}, indent=1).encode('utf-8')
+        data_start = _align(HEADER.size + len(index_bytes))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+
+        with self._lock:
+            with open(tmp_path, 'wb') as f:
+                f.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, len(index_bytes)))
+                f.write(index_bytes)
+                for h, entry in index.items():
+                    f.seek(data_start + entry['offset'])
+                    if h in rendered:
+                        f.write(rendered[h].tobytes())
+                    else:
+                        f.write(self._block(self.entries[h]).tobytes())
+                f.truncate(data_start + offset)
+
+            # Windows nie podmieni pliku, który jest zmapowany
+            self._map = None
+            try:
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"[AssetPack] Nie można podmienić paczki: {e}")
+            self._open()
+
+        print(f"[AssetPack] Zapisano paczkę: {len(index)} sygnałów, {(data_start + offset) / 1024:.0f} KiB")
+
+
+def get_asset_pack():
+    """Zwraca instancję AssetPack (singleton)"""
+    return AssetPack()
@@ -0,0 +1,377 @@
+"""
+Audio Analysis - Analizy utworów w procesie roboczym
+Bose Audio Multi-Tool
+
+Zdekodowany PCM (z TrackCache) trafia do procesu roboczego przez
+multiprocessing.shared_memory - bez kopiowania przez pickle. Moduł nie
+importuje pygame, więc proces roboczy startuje szybko (także w exe,
+patrz freeze_support w main.py). Wyniki zapisywane są w AudioMetadata
+pod skrótem treści pliku.
+"""
+
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+HOP_SECONDS = 0.1            # krok obwiedni RMS
+SHORT_TERM_SECONDS = 0.4     # okno krótkoterminowego RMS
+SILENCE_DB = -90.0           # dolna granica poziomu (log z zera)
+AUTO_FRAGMENT_SECONDS = 30   # domyślna długość proponowanego fragmentu
+
+LOUDNESS_TARGET_DB = -20.0   # zalecany poziom odniesienia TEST 1 (gated RMS, dBFS)
+ABSOLUTE_GATE_DB = -70.0     # bramkowanie wg BS.1770: bezwzględne i względne
+RELATIVE_GATE_DB = -10.0
+
+PEAK_BINS = 560              # punkty miniatury przebiegu (szerokość płótna edytora)
+PEAKS_DIR = os.path.join("audio_cache", "peaks")
+ASYNC_POLL_MS = 50            # [ms] sprawdzanie wyniku run_async() w wątku Tk
+
+
+# ─────────────────────────────────────────
+# OBLICZENIA (proces roboczy)
+# ─────────────────────────────────────────
+
+def rms_envelope(pcm, sample_rate, hop_seconds=HOP_SECONDS, window_seconds=SHORT_TERM_SECONDS):
+    """
+    Krótkoterminowy RMS [dBFS] co hop_seconds
+    Energia liczona raz na blok kroku, okno krótkoterminowe to przesuwne okno
+    (stride tricks) po energiach bloków - koszt liniowy w liczbie próbek
+    """
+    hop = max(int(sample_rate * hop_seconds), 1)
+    n_blocks = len(pcm) // hop
+    if n_blocks == 0:
+        return np.full(1, SILENCE_DB, dtype=np.float32)
+
+    # Suma kwadratów wszystkich kanałów blokami, w float32 (int16 → pełna skala 1.0)
+    blocks = pcm[:n_blocks * hop].reshape(n_blocks, -1)
+    energy = np.empty(n_blocks, dtype=np.float64)
+    scale = np.float32(1.0 / 32768.0)
+    for i in range(0, n_blocks, 256):
+        chunk = blocks[i:i + 256].astype(np.float32)
+        chunk *= scale
+        energy[i:i + 256] = np.einsum('ij,ij->i', chunk, chunk)
+    energy /= blocks.shape[1]
+
+    width = min(max(int(round(window_seconds / hop_seconds)), 1), n_blocks)
+    short_term = sliding_window_view(energy, width).mean(axis=1)
+
+    return (10.0 * np.log10(np.maximum(short_term, 10 ** (SILENCE_DB / 10.0)))).astype(np.float32)
+
+
+def gated_loudness(envelope_db):
+    """
+    Zintegrowany poziom [dBFS] z bramkowaniem jak w BS.1770: bloki 400 ms co 100 ms,
+    bramka bezwzględna -70 dB, potem względna -10 dB od średniej - cisza i wyciszenia
+    nie zaniżają wyniku
+    """
+    energy = np.power(10.0, envelope_db.astype(np.float64) / 10.0)
+    gated = energy[envelope_db > ABSOLUTE_GATE_DB]
+    if gated.size == 0:
+        return SILENCE_DB
+
+    relative_gate = 10.0 * np.log10(gated.mean()) + RELATIVE_GATE_DB
+    gated = energy[envelope_db > max(relative_gate, ABSOLUTE_GATE_DB)]
+    return float(10.0 * np.log10(gated.mean()))
+
+
+def loudness_target():
+    """
+    Poziom odniesienia TEST 1 z configu (test1_auto.loudness_target, dBFS) albo
+    None - korekta wyłączona (domyślnie: włączenie zmienia poziomy skalibrowanej
+    stacji, więc decyduje o nim stacja, np. LOUDNESS_TARGET_DB)
+    """
+    from config_manager import get_config_manager
+    target = get_config_manager().get('test1_auto.loudness_target')
+    try:
+        return None if target is None else float(target)
+    except (TypeError, ValueError):
+        return None
+
+
+def loudness_gain(loudness_db, target_db=LOUDNESS_TARGET_DB):
+    """
+    Mnożnik głośności sprowadzający utwór do target_db - tylko tłumienie (kanał
+    miksera ≤ 1.0); target_db None = bez korekty
+    """
+    if target_db is None or loudness_db is None or loudness_db <= SILENCE_DB:
+        return 1.0
+    return float(10.0 ** (min(target_db - loudness_db, 0.0) / 20.0))
+
+
+def loudest_window(envelope_db, window_blocks):
+    """
+    Indeks początku okna window_blocks kroków o najwyższym średnim poziomie [dB]
+    Średnia w dB (a nie energii) premiuje fragmenty głośne w sposób ciągły,
+    a nie pojedyncze szczyty
+    """
+    window_blocks = min(max(window_blocks, 1), len(envelope_db))
+    csum = np.concatenate(([0.0], np.cumsum(envelope_db, dtype=np.float64)))
+    means = (csum[window_blocks:] - csum[:-window_blocks]) / window_blocks
+    best = int(np.argmax(means))
+    return best, float(means[best])
+
+
+def _loudest_segment_worker(shm_name, shape, dtype, sample_rate, seconds):
+    """Proces roboczy: najgłośniejszy fragment PCM z pamięci współdzielonej"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pcm = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        envelope = rms_envelope(pcm, sample_rate)
+        duration = shape[0] / sample_rate
+
+        # Okno krótkoterminowe skraca obwiednię - fragment liczony w krokach obwiedni
+        window_blocks = int(round(seconds / HOP_SECONDS))
+        start_block, level_db = loudest_window(envelope, window_blocks)
+        start = start_block * HOP_SECONDS
+        end = min(start + seconds, duration)
+        del pcm
+    finally:
+        shm.close()
+
+    return {
+        'start': start,
+        'end': end,
+        'duration': duration,
+        'level_db': level_db
+    }
+
+
+def peak_overview(pcm, bins):
+    """
+    Miniatura przebiegu: int16 (bins, kanały, 2) z [min, max] każdego przedziału
+    Redukcja blokowa na widoku (bins, próbki_przedziału, kanały) - bez pętli po próbkach
+    """
+    frames = pcm.reshape(len(pcm), -1)
+    channels = frames.shape[1]
+    peaks = np.zeros((bins, channels, 2), dtype=np.int16)
+    per_bin = len(frames) // bins
+    if per_bin == 0:
+        return peaks
+
+    blocks = frames[:per_bin * bins].reshape(bins, per_bin, channels)
+    np.min(blocks, axis=1, out=peaks[:, :, 0])
+    np.max(blocks, axis=1, out=peaks[:, :, 1])
+    return peaks
+
+
+def _loudness_worker(shm_name, shape, dtype, sample_rate):
+    """Proces roboczy: zintegrowany poziom PCM z pamięci współdzielonej"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pcm = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        loudness = gated_loudness(rms_envelope(pcm, sample_rate))
+        del pcm
+    finally:
+        shm.close()
+    return loudness
+
+
+def _peaks_worker(shm_name, shape, dtype, bins):
+    """Proces roboczy: miniatura przebiegu PCM z pamięci współdzielonej"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pcm = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        peaks = peak_overview(pcm, bins)
+        del pcm
+    finally:
+        shm.close()
+    return peaks
+
+
+# ─────────────────────────────────────────
+# WYWOŁANIE (proces główny)
+# ─────────────────────────────────────────
+
+def _run_in_pool(pool, worker, pcm, *args):
+    """Kopiuje PCM do pamięci współdzielonej i czeka na wynik procesu roboczego"""
+    shm = shared_memory.SharedMemory(create=True, size=max(pcm.nbytes, 1))
+    try:
+        shared = np.ndarray(pcm.shape, dtype=pcm.dtype, buffer=shm.buf)
+        shared[...] = pcm
+        del shared
+        return pool.submit(worker, shm.name, pcm.shape, pcm.dtype.str, *args).result()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def find_loudest_segment(filepath, seconds=AUTO_FRAGMENT_SECONDS):
+    """
+    Najgłośniejszy fragment utworu: {'start', 'end', 'duration', 'level_db', 'start_pct', 'end_pct'}
+    Wynik z cache (skrót treści) albo liczony w procesie roboczym - wywoływać poza wątkiem Tk
+    """
+    from audio_metadata import get_audio_metadata
+    from resource_manager import get_resource_manager
+    from signals import mixer_sample_rate
+    from track_player import get_track_cache
+
+    metadata = get_audio_metadata()
+    name = f"loudest_{seconds:g}s"
+    cached = metadata.get_analysis(filepath, name)
+    if cached is not None:
+        return cached
+
+    pcm = get_track_cache().get(filepath)
+    result = _run_in_pool(get_resource_manager().analysis_pool,
+                          _loudest_segment_worker, pcm, mixer_sample_rate(), seconds)
+
+    duration = result['duration'] or 1.0
+    result['start_pct'] = min(max(int(result['start'] / duration * 100), 0), 99)
+    result['end_pct'] = min(max(int(np.ceil(result['end'] / duration * 100)), result['start_pct'] + 1), 100)
+
+    metadata.set_analysis(filepath, name, result)
+    print(f"[AudioAnalysis] {os.path.basename(filepath)}: najgłośniejsze {seconds:g}s od "
+          f"{result['start']:.1f}s ({result['level_db']:.1f} dBFS)")
+    return result
+
+
+def get_cached_loudness(filepath):
+    """Zapisany poziom utworu [dBFS] albo None - bez analizy, można w wątku Tk"""
+    from audio_metadata import get_audio_metadata
+    return get_audio_metadata().get_analysis(filepath, 'loudness')
+
+
+def track_loudness(filepath, pcm=None):
+    """
+    Zintegrowany poziom utworu [dBFS] - liczony raz na treść pliku w procesie roboczym
+    pcm: już zdekodowany utwór (opcjonalnie). Wywoływać poza wątkiem Tk
+    """
+    from audio_metadata import get_audio_metadata
+    from resource_manager import get_resource_manager
+    from signals import mixer_sample_rate
+    from track_player import get_track_cache
+
+    loudness = get_cached_loudness(filepath)
+    if loudness is not None:
+        return loudness
+
+    if pcm is None:
+        pcm = get_track_cache().decode(filepath)
+    loudness = _run_in_pool(get_resource_manager().analysis_pool,
+                            _loudness_worker, pcm, mixer_sample_rate())
+    del pcm
+
+    get_audio_metadata().set_analysis(filepath, 'loudness', loudness)
+    print(f"[AudioAnalysis] {os.path.basename(filepath)}: poziom {loudness:.1f} dBFS, "
+          f"korekta {20 * np.log10(loudness_gain(loudness, loudness_target())):.1f} dB")
+    return loudness
+
+
+def _peaks_path(digest, bins):
+    return os.path.join(PEAKS_DIR, f"{digest}_{bins}.npy")
+
+
+def load_peaks(filepath, bins=PEAK_BINS):
+    """Miniatura z dysku (plik .npy pod skrótem treści) albo None - szybkie, można w wątku Tk"""
+    from audio_metadata import get_audio_metadata
+
+    digest = get_audio_metadata().get_hash(filepath)
+    if digest is None:
+        return None
+    path = _peaks_path(digest, bins)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path)
+    except Exception as e:
+        print(f"[AudioAnalysis] Uszkodzona miniatura {path}: {e}")
+        return None
+
+
+def get_peaks(filepath, bins=PEAK_BINS, pcm=None):
+    """
+    Miniatura przebiegu (bins, kanały, 2) - z dysku albo liczona w procesie roboczym
+    Utwór spoza TrackCache dekodowany jest tylko na czas obliczeń (nie wypycha
+    z cache odtwarzanych utworów) - wywoływać poza wątkiem Tk
+    """
+    from audio_metadata import get_audio_metadata
+    from resource_manager import get_resource_manager
+    from track_player import get_track_cache
+
+    peaks = load_peaks(filepath, bins)
+    if peaks is not None:
+        return peaks
+
+    if pcm is None:
+        pcm = get_track_cache().decode(filepath)
+    peaks = _run_in_pool(get_resource_manager().analysis_pool, _peaks_worker, pcm, bins)
+    del pcm
+
+    digest = get_audio_metadata().get_hash(filepath)
+    if digest:
+        os.makedirs(PEAKS_DIR, exist_ok=True)
+        path = _peaks_path(digest, bins)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, peaks)
+        os.replace(tmp_path, path)
+    return peaks
+
+
+def analyse_playlist_async(filepaths, bins=PEAK_BINS):
+    """
+    Miniatury i poziom głośności całej playlisty w tle (np. po imporcie) - pomija gotowe
+    Utwór dekodowany jest raz na obie analizy
+    """
+    from track_player import get_track_cache
+    filepaths = list(filepaths)
+
+    def run():
+        made = 0
+        for filepath in filepaths:
+            try:
+                need_peaks = load_peaks(filepath, bins) is None
+                need_loudness = get_cached_loudness(filepath) is None
+                if not (need_peaks or need_loudness):
+                    continue
+                pcm = get_track_cache().decode(filepath)
+                if need_peaks:
+                    get_peaks(filepath, bins, pcm=pcm)
+                if need_loudness:
+                    track_loudness(filepath, pcm=pcm)
+                del pcm
+                made += 1
+            except Exception as e:
+                print(f"[AudioAnalysis] Błąd analizy {os.path.basename(filepath)}: {e}")
+        if made:
+            print(f"[AudioAnalysis] Przeanalizowano {made} utworów (miniatury, poziom)")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def run_async(window, func, args, on_result, on_error=None):
+    """
+    Uruchamia analizę func(*args) w wątku; wątek Tk odbiera wynik z kolejki
+    co ASYNC_POLL_MS (jak ImportJob). Gdy okno zamknięto, wynik jest pomijany
+    """
+    results = queue.Queue(maxsize=1)
+
+    def run():
+        try:
+            results.put((True, func(*args)))
+        except Exception as e:
+            print(f"[AudioAnalysis] Błąd analizy: {e}")
+            results.put((False, e))
+
+    def poll():
+        try:
+            if not window.winfo_exists():
+                return
+            ok, value = results.get_nowait()
+        except queue.Empty:
+            window.after(ASYNC_POLL_MS, poll)
+            return
+        except Exception:
+            return      # interpreter Tk już zamknięty
+
+        if ok:
+            on_result(value)
+        elif on_error:
+            on_error(value)
+
+    threading.Thread(target=run, daemon=True).start()
+    window.after(ASYNC_POLL_MS, poll)
@@ -0,0 +1,250 @@
+"""
+Audio Metadata - Metadane plików audio z trwałym cache
+Bose Audio Multi-Tool
+
+Długość, częstotliwość próbkowania, kanały, kodek i bitrate czytane są
+z nagłówków (mutagen, dla WAV zapasowo moduł wave) - plik nigdy nie jest
+dekodowany w całości. Metadane i wyniki analiz zapisywane są pod skrótem
+treści pliku, a ścieżka (z rozmiarem i mtime) jest tylko indeksem do skrótu -
+przeniesiona lub skopiowana biblioteka zachowuje wszystkie dane.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import wave
+
+try:
+    import mutagen
+except ImportError:
+    mutagen = None
+
+METADATA_DIR = "audio_cache"
+METADATA_FILE = os.path.join(METADATA_DIR, "metadata.json")
+METADATA_VERSION = 2
+SAVE_DELAY = 1.0           # [s] zbiorczy zapis cache po serii odczytów
+
+HASH_CHUNK = 64 * 1024     # początek i koniec pliku brane do skrótu treści
+
+
+def content_hash(filepath):
+    """
+    Skrót treści: blake2b z rozmiaru oraz pierwszych i ostatnich HASH_CHUNK bajtów
+    Stały koszt niezależnie od długości pliku; ten sam utwór pod inną ścieżką
+    (kopia, zmieniona nazwa) daje ten sam skrót
+    """
+    size = os.path.getsize(filepath)
+    digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    with open(filepath, 'rb') as f:
+        digest.update(f.read(HASH_CHUNK))
+        if size > HASH_CHUNK:
+            f.seek(max(size - HASH_CHUNK, HASH_CHUNK))
+            digest.update(f.read(HASH_CHUNK))
+    return digest.hexdigest()
+
+
+def probe(filepath):
+    """Czyta metadane z nagłówków pliku - bez dekodowania próbek"""
+    info = {
+        'duration': 0.0,
+        'sample_rate': 0,
+        'channels': 0,
+        'codec': os.path.splitext(filepath)[1].lstrip('.').lower(),
+        'bitrate': 0
+    }
+
+    if mutagen is not None:
+        try:
+            audio = mutagen.File(filepath)
+            if audio is not None and audio.info is not None:
+                info['duration'] = float(getattr(audio.info, 'length', 0) or 0)
+                info['sample_rate'] = int(getattr(audio.info, 'sample_rate', 0) or 0)
+                info['channels'] = int(getattr(audio.info, 'channels', 0) or 0)
+                info['bitrate'] = int(getattr(audio.info, 'bitrate', 0) or 0)
+                info['codec'] = type(audio).__name__.lower()
+                return info
+        except Exception as e:
+            print(f"[AudioMetadata] mutagen nie odczytał {os.path.basename(filepath)}: {e}")
+
+    # WAV bez mutagena - sam nagłówek RIFF
+    try:
+        with wave.open(filepath, 'rb') as w:
+            rate = w.getframerate()
+            info['sample_rate'] = rate
+            info['channels'] = w.getnchannels()
+            info['duration'] = w.getnframes() / rate if rate else 0.0
+            info['bitrate'] = rate * w.getnchannels() * w.getsampwidth() * 8
+            info['codec'] = 'wave'
+    except Exception:
+        pass
+
+    return info
+
+
+class AudioMetadata:
+    """Cache metadanych audio - singleton"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.path = METADATA_FILE
+        self.entries = {}          # ścieżka → {'stamp': [rozmiar, mtime], 'hash': ...} - indeks pomocniczy
+        self.content = {}          # skrót treści → {'info': {...}, 'analysis': {nazwa: wynik}}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_timer = None
+
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == METADATA_VERSION:
+                self.entries = data.get('entries', {})
+                self.content = data.get('content', {})
+            print(f"[AudioMetadata] Załadowano metadane {len(self.content)} utworów ({len(self.entries)} ścieżek)")
+        except Exception as e:
+            print(f"[AudioMetadata] Błąd odczytu cache: {e}")
+            self.entries = {}
+            self.content = {}
+
+    def _schedule_save(self):
+        """
+        Zapis odłożony o SAVE_DELAY - import tysięcy plików to jeden zapis,
+        a nie przepisywanie całego pliku po każdym (wywoływać pod blokadą)
+        """
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Zapisuje cache na dysk, jeśli się zmienił (plik tymczasowy + os.replace)"""
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = json.dumps({'version': METADATA_VERSION, 'entries': self.entries,
+                               'content': self.content},
+                              indent=1, ensure_ascii=False)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[AudioMetadata] Błąd zapisu cache: {e}")
+
+    def get_hash(self, filepath):
+        """
+        Skrót treści pliku (content_hash) - liczony raz na wersję pliku (ścieżka + rozmiar + mtime)
+        None, gdy pliku nie ma
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        stamp = [stat.st_size, stat.st_mtime]
+
+        with self._lock:
+            entry = self.entries.get(filepath)
+            if entry is not None and entry['stamp'] == stamp:
+                return entry['hash']
+
+        digest = content_hash(filepath)
+        with self._lock:
+            self.entries[filepath] = {'stamp': stamp, 'hash': digest}
+            self._schedule_save()
+        return digest
+
+    def known_hash(self, filepath):
+        """Skrót policzony już wcześniej dla ścieżki (bez dostępu do dysku) albo None"""
+        with self._lock:
+            entry = self.entries.get(filepath)
+        return entry['hash'] if entry else None
+
+    def _record(self, digest):
+        """Wpis treści dla skrótu (tworzony w razie potrzeby) - wywoływać pod blokadą"""
+        record = self.content.get(digest)
+        if record is None:
+            record = self.content[digest] = {}
+        return record
+
+    def get(self, filepath):
+        """
+        Metadane pliku (słownik) - nagłówki czytane raz na treść pliku
+        Przeniesiony lub skopiowany utwór trafia w ten sam wpis po skrócie
+        """
+        digest = self.get_hash(filepath)
+        if digest is None:
+            return None
+
+        with self._lock:
+            record = self.content.get(digest)
+            if record is not None and 'info' in record:
+                self.hits += 1
+                return record['info']
+            self.misses += 1
+
+        info = probe(filepath)
+        with self._lock:
+            self._record(digest)['info'] = info
+            self._schedule_save()
+        return info
+
+    def duration(self, filepath):
+        """Długość utworu [s], 0 gdy nie da się jej odczytać"""
+        info = self.get(filepath)
+        return info['duration'] if info else 0
+
+    def get_analysis(self, filepath, name):
+        """Zapisany wynik analizy name dla treści pliku albo None"""
+        digest = self.get_hash(filepath)
+        if digest is None:
+            return None
+        with self._lock:
+            record = self.content.get(digest)
+            if record is None:
+                return None
+            return record.get('analysis', {}).get(name)
+
+    def set_analysis(self, filepath, name, value):
+        """Zapisuje wynik analizy (dane JSON) dla treści pliku"""
+        digest = self.get_hash(filepath)
+        if digest is None:
+            return
+        with self._lock:
+            self._record(digest).setdefault('analysis', {})[name] = value
+            self._schedule_save()
+
+    def get_status(self):
+        return {
+            'files': len(self.content),
+            'paths': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def get_audio_metadata():
+    """Zwraca instancję AudioMetadata (singleton)"""
+    return AudioMetadata()
@@ -0,0 +1,329 @@
+"""
+Benchmark - pomiary wydajności modułów audio
+Bose Audio Multi-Tool
+
+Uruchomienie: python benchmark.py
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import tracemalloc
+import wave
+
+import numpy as np
+
+import signals
+from audio_metadata import get_audio_metadata, probe
+from report_journal import JOURNAL_DIR, JournalCompactor, ReportJournal
+from report_store import ReportStore
+from report_writer import ReportWriter
+from test_ids import TestIdGenerator
+
+
+def measure(func, repeats=20):
+    """Zwraca (średni czas [ms], szczytowa alokacja [KiB]) dla wywołania func()"""
+    func()  # rozgrzewka
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    elapsed_ms = (time.perf_counter() - start) / repeats * 1000
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed_ms, peak / 1024
+
+
+def measure_pair(legacy, new, repeats=20):
+    """
+    Jak measure, ale dla dwóch wersji wywoływanych na przemian - zmiany obciążenia
+    maszyny w trakcie pomiaru dotykają obu wersji tak samo
+    """
+    funcs = (legacy, new)
+    elapsed = [0.0, 0.0]
+    for func in funcs:
+        func()  # rozgrzewka
+
+    for _ in range(repeats):
+        for i, func in enumerate(funcs):
+            start = time.perf_counter()
+            func()
+            elapsed[i] += time.perf_counter() - start
+
+    results = []
+    for func, total in zip(funcs, elapsed):
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append((total / repeats * 1000, peak / 1024))
+    return results
+
+
+def report(name, legacy, new):
+    """Wypisuje porównanie dwóch pomiarów"""
+    print(f"  {name:<28} {legacy[0]:8.2f} ms {legacy[1]:9.0f} KiB"
+          f"   →  {new[0]:8.2f} ms {new[1]:9.0f} KiB"
+          f"   (x{legacy[0] / max(new[0], 1e-9):.1f})")
+
+
+# ─────────────────────────────────────────
+# SYNTEZA TONÓW
+# ─────────────────────────────────────────
+
+def _legacy_tone(frequency, volume, wave_type, duration=1.0, sample_rate=44100):
+    """Dawny generator z ToneGeneratorTest.generate_wave (float64 + np.repeat)"""
+    samples = int(duration * sample_rate)
+    t = np.linspace(0, duration, samples, False)
+
+    if wave_type == "square":
+        wave = np.sign(np.sin(2 * np.pi * frequency * t))
+    elif wave_type == "sawtooth":
+        wave = 2 * (t * frequency - np.floor(t * frequency + 0.5))
+    elif wave_type == "triangle":
+        wave = 2 * np.abs(2 * (t * frequency - np.floor(t * frequency + 0.5))) - 1
+    else:
+        wave = np.sin(2 * np.pi * frequency * t)
+
+    wave = wave * (volume / 100.0)
+    wave = np.int16(wave * 32767)
+    return np.repeat(wave.reshape(-1, 1), 2, axis=1)
+
+
+def bench_synthesis():
+    print("Synteza tonu 1s stereo int16 (stary generator → signals):")
+    for wave_type in signals.WAVE_TYPES:
+        legacy, new = measure_pair(
+            lambda: _legacy_tone(1000, 50, wave_type),
+            lambda: signals.generate_tone(1000, 1.0, 50, wave_type, sample_rate=44100))
+        report(wave_type, legacy, new)
+
+
+# ─────────────────────────────────────────
+# FALE PASMOWO OGRANICZONE
+# ─────────────────────────────────────────
+
+def alias_level_db(wave, frequency, sample_rate=44100):
+    """Energia poza harmonicznymi f względem całości [dB] - miara aliasingu"""
+    spectrum = np.abs(np.fft.rfft(wave * np.hanning(len(wave)))) ** 2
+    bins = np.fft.rfftfreq(len(wave), 1 / sample_rate)
+    harmonics = np.arange(1, int(sample_rate / 2 / frequency) + 1) * frequency
+    nearest = np.abs(bins[:, None] - harmonics[None, :]).min(axis=1)
+    alias = spectrum[nearest > 8].sum()
+    return 10 * np.log10(alias / spectrum.sum())
+
+
+def bench_band_limited():
+    print("Fale naiwne (stary generator) → PolyBLEP/PolyBLAMP (signals), 1s stereo int16:")
+    for frequency in (1000, 5000, 8123):
+        for wave_type in ("square", "sawtooth", "triangle"):
+            legacy, new = measure_pair(
+                lambda: _legacy_tone(frequency, 50, wave_type),
+                lambda: signals.generate_tone(frequency, 1.0, 50, wave_type, sample_rate=44100))
+            report(f"{wave_type} {frequency} Hz", legacy, new)
+
+            naive = _legacy_tone(frequency, 100, wave_type)[:, 0] / 32767.0
+            limited = signals.generate_tone(frequency, 1.0, 100, wave_type, sample_rate=44100)[:, 0] / 32767.0
+            print(f"    aliasing: {alias_level_db(naive, frequency):6.1f} dB"
+                  f"  →  {alias_level_db(limited, frequency):6.1f} dB")
+
+
+# ─────────────────────────────────────────
+# METADANE AUDIO
+# ─────────────────────────────────────────
+
+def _write_wav(path, seconds, sample_rate=44100):
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(np.zeros((int(seconds * sample_rate), 2), dtype=np.int16).tobytes())
+
+
+def bench_metadata():
+    print("Długość utworu (pełne dekodowanie pygame → nagłówek → cache metadanych):")
+    import pygame
+    pygame.mixer.init(frequency=44100, size=-16, channels=2)
+
+    metadata = get_audio_metadata()
+    with tempfile.TemporaryDirectory() as tmp:
+        metadata.path = os.path.join(tmp, "metadata.json")
+        for seconds in (30, 240):
+            path = os.path.join(tmp, f"track_{seconds}s.wav")
+            _write_wav(path, seconds)
+
+            legacy = measure(lambda: pygame.mixer.Sound(path).get_length(), repeats=3)
+            report(f"{seconds}s: nagłówek", legacy, measure(lambda: probe(path)))
+            report(f"{seconds}s: cache", legacy, measure(lambda: metadata.duration(path), repeats=1000))
+
+        metadata.flush()
+
+    status = metadata.get_status()
+    print(f"  trafienia: {status['hits']}, odczyty nagłówka: {status['misses']}")
+    pygame.mixer.quit()
+
+
+# ─────────────────────────────────────────
+# HISTORIA TESTÓW
+# ─────────────────────────────────────────
+
+def _history_rows(count, first=0):
+    """Syntetyczne wyniki TEST 2: 5000 egzemplarzy, 20 operatorów, 365 dni"""
+    for i in range(first, first + count):
+        yield [f"TEST2_{i:08d}", "Tone Generator Auto Test", f"SN{i % 5000:05d}",
+               f"OP{i % 20:02d}", f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}", "12:00:00",
+               11, "sine (20-20000 Hz)", "FAIL" if i % 7 == 0 else "PASS",
+               "N/A", "N/A", "50%", "No", ""]
+
+
+def _legacy_has_passed(csv_path, serial):
+    """Dawny sposób: skan i parsowanie całego CSV"""
+    import csv
+    with open(csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            if row[2] == serial and row[8] == "PASS":
+                return True
+    return False
+
+
+def bench_report_store(rows=200_000):
+    print(f"Historia testów, {rows} wyników (skan CSV → indeks SQLite):")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "test_history.csv")
+        source = ReportStore(os.path.join(tmp, "source.db"))
+        source.write_batch([('tests', row) for row in _history_rows(rows)])
+        source.export_csv(csv_path)
+        source.close()
+
+        store = ReportStore(os.path.join(tmp, "test_history.db"))
+        start = time.perf_counter()
+        store.migrate_csv(csv_path, 'tests')
+        print(f"  migracja CSV: {rows / (time.perf_counter() - start):,.0f} wierszy/s")
+
+        start = time.perf_counter()
+        store.write_batch([('tests', row) for row in _history_rows(10_000, first=rows)])
+        print(f"  zapis partii przy pełnej bazie: {10_000 / (time.perf_counter() - start):,.0f} wierszy/s")
+
+        # Nieistniejący serial - najgorszy przypadek dla skanu
+        legacy = measure(lambda: _legacy_has_passed(csv_path, "SN99999"), repeats=1)
+        report("czy serial przeszedł", legacy, measure(lambda: store.has_passed("SN99999"), repeats=1000))
+        report("yield operatora z dnia", legacy,
+               measure(lambda: store.yield_stats(operator="OP03", date_from="2025-04-04",
+                                                 date_to="2025-04-04"), repeats=100))
+        report("historia egzemplarza", legacy,
+               measure(lambda: store.find(serial="SN00042", limit=50), repeats=100))
+        store.close()
+
+# ─────────────────────────────────────────
+# ID TESTÓW
+# ─────────────────────────────────────────
+
+def _ids_in_process(count):
+    """ID wygenerowane w osobnym procesie (ten sam ID stacji)"""
+    generator = TestIdGenerator("BENCH")
+    return [generator.next_id("TEST1")[0] for _ in range(count)]
+
+
+def bench_test_ids(count=1_000_000, threads=4, processes=4):
+    print(f"ID testów ({count} wywołań):")
+
+    start = time.perf_counter()
+    legacy = {f"TEST1_{datetime.now().strftime('%Y%m%d_%H%M%S')}" for _ in range(count)}
+    legacy_us = (time.perf_counter() - start) / count * 1e6
+    print(f"  stary format (sekundy): {legacy_us:.2f} µs/ID, kolizje: {count - len(legacy)}")
+
+    generator = TestIdGenerator("BENCH")
+    start = time.perf_counter()
+    ids = [generator.next_id("TEST1")[0] for _ in range(count)]
+    new_us = (time.perf_counter() - start) / count * 1e6
+    print(f"  nowy generator: {new_us:.2f} µs/ID, kolizje: {count - len(set(ids))}, "
+          f"posortowane: {ids == sorted(ids)}")
+
+    # Wątki współdzielą generator - bez blokady, kolejność rosnąca w każdym wątku
+    per_thread = [[] for _ in range(threads)]
+
+    def worker(out):
+        for _ in range(count // threads):
+            out.append(generator.next_id("TEST1")[0])
+
+    workers = [threading.Thread(target=worker, args=(out,)) for out in per_thread]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    all_ids = [i for out in per_thread for i in out]
+    print(f"  {threads} wątki: {elapsed / len(all_ids) * 1e6:.2f} µs/ID, "
+          f"kolizje: {len(all_ids) - len(set(all_ids))}, "
+          f"posortowane w wątkach: {all(out == sorted(out) for out in per_thread)}")
+
+    with ProcessPoolExecutor(processes) as pool:
+        chunks = list(pool.map(_ids_in_process, [count // processes] * processes))
+    all_ids = [i for chunk in chunks for i in chunk]
+    print(f"  {processes} procesy: kolizje: {len(all_ids) - len(set(all_ids))}")
+
+
+# ─────────────────────────────────────────
+# DZIENNIKI STACJI (WSPÓLNY FOLDER)
+# ─────────────────────────────────────────
+
+def _journal_station(report_dir, station, rows):
+    """Jedna "stacja": zapis przez ReportWriter do własnego dziennika + scalanie"""
+    store = ReportStore(os.path.join(report_dir, "test_history.db"))
+    journal = ReportJournal(report_dir, station, store, compact_interval=0.05)
+    writer = ReportWriter(journal, batch_size=20, flush_interval=0.01)
+    for i in range(rows):
+        row = next(_history_rows(1, first=i))
+        row[0] = f"{station}_{i:08d}"
+        writer.write('tests', row)
+    writer.close(timeout=120)
+    return journal.compactor.get_status()
+
+
+def bench_journal_stress(processes=4, rows=5000):
+    print(f"Dzienniki: {processes} procesy × {rows} wyników do wspólnego folderu:")
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(processes) as pool:
+            stations = [f"ST{n}" for n in range(processes)]
+            statuses = list(pool.map(_journal_station, [tmp] * processes, stations,
+                                     [rows] * processes))
+        elapsed = time.perf_counter() - start
+
+        store = ReportStore(os.path.join(tmp, "test_history.db"))
+        JournalCompactor(tmp, store).compact()
+        expected = {f"{station}_{i:08d}" for station in stations for i in range(rows)}
+        stored = {row[0] for row in store._reader().execute("SELECT test_id FROM tests")}
+        complete = sum(1 for row in store._reader().execute(
+            "SELECT * FROM tests WHERE test_type = 'Tone Generator Auto Test' AND notes = ''"))
+        store.close()
+
+        print(f"  {processes * rows / elapsed:,.0f} wyników/s, "
+              f"scaleń: {sum(s['compactions'] for s in statuses)}, "
+              f"blokada zajęta: {sum(s['lock_busy'] for s in statuses)}")
+        print(f"  utracone: {len(expected - stored)}, nadmiarowe: {len(stored - expected)}, "
+              f"uszkodzone linie: {sum(s['torn_lines'] for s in statuses)}, "
+              f"pełne wiersze: {complete}/{len(expected)}, "
+              f"pozostałe dzienniki: {len(os.listdir(os.path.join(tmp, JOURNAL_DIR)))}")
+
+
+if __name__ == "__main__":
+    bench_synthesis()
+    print()
+    bench_band_limited()
+    print()
+    bench_metadata()
+    print()
+    bench_report_store()
+    print()
+    bench_test_ids()
+    print()
+    bench_journal_stress()
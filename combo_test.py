@@ -7,13 +7,17 @@ Fragment per-utwór pobierany z configu (Tryb Inżynieryjny)
 import tkinter as tk
 from tkinter import messagebox
 import pygame
-import numpy as np
 import threading
 import time
 import os
 from datetime import datetime
 from test_reporter import get_test_reporter
 from config_manager import get_config_manager
+from signals import sweep_frequency
+from resource_manager import get_resource_manager
+from track_player import TrackPlayer, get_track_cache
+from folder_playlist import rescan_playlist_async, resolve_playlist
+from fragment_store import load_fragments
 
 
 class ComboTest:
@@ -61,15 +65,15 @@ class ComboTest:
         # === STAN ===
         self.combo_running = False
         self.combo_start_time = None
+        self.run_id = None
         self.current_phase = None
         self.combo_job = None
         self.total_duration = 0
         self.interrupted = False
 
-        # Playlista i fragmenty per-utwór z configu
-        saved_playlist = config_mgr.get('music_player.playlist', [])
-        self.playlist = [f for f in saved_playlist if os.path.exists(f)]
-        self.fragments_config = config_mgr.get('music_player.fragments', {})
+        # Playlista (lista plików lub folder) i fragmenty per-utwór z configu
+        self.playlist = resolve_playlist(config_mgr)
+        self.fragments = load_fragments(config_mgr)
         self.current_index = 0
         self.song_length = 0
         self.fragment_start = 0
@@ -83,6 +87,7 @@ class ComboTest:
         self.sound_thread = None
         self.current_file = None
         self.start_time_offset = 0
+        self.player = TrackPlayer()
 
         # Wyniki
         self.test1_data = {}
@@ -96,6 +101,9 @@ class ComboTest:
         self.sweep_job = None
         self.t2_sound = None
 
+        # Przygotowanie audio TEST 2/3 w tle (w trakcie TEST 1)
+        self.prepare_thread = None
+
         # TEST 3
         self.t3_sound_thread = None
         self.t3_stop_sound = False
@@ -107,22 +115,50 @@ class ComboTest:
 
         self.create_widgets()
 
+        # Utwór TEST 1 dekodowany w tle, zanim operator zeskanuje jednostkę
+        get_track_cache().prefetch_playlist(self.playlist, self.current_index)
+
+        # Powiązany folder skanowany w tle - lista z ostatniego skanu od razu w oknie
+        rescan_playlist_async(self.window, config_mgr, self.on_playlist_rescanned)
+
+    def on_playlist_rescanned(self, playlist):
+        """Nowa lista z folderu - przejmowana, o ile combo nie jest w toku"""
+        if self.combo_running:
+            return
+        selected = self.playlist[self.current_index] if self.current_index < len(self.playlist) else None
+        self.playlist = playlist
+        self.current_index = playlist.index(selected) if selected in playlist else 0
+
+        self.playlist_listbox.delete(0, tk.END)
+        for fp in self.playlist:
+            self.playlist_listbox.insert(tk.END, os.path.basename(fp))
+        if self.playlist:
+            self.playlist_listbox.selection_set(self.current_index)
+        get_track_cache().prefetch_playlist(self.playlist, self.current_index)
+
     # ─────────────────────────────────────────
     # CONFIG HELPERS
     # ─────────────────────────────────────────
 
     def reload_config(self):
-        """Przeładowuje playlistę i fragmenty z pliku configu"""
+        """Przeładowuje playlistę, fragmenty i parametry TEST 2/3 z pliku configu"""
         config_mgr = get_config_manager()
         config_mgr.reload_config()
-        saved_playlist = config_mgr.get('music_player.playlist', [])
-        self.playlist = [f for f in saved_playlist if os.path.exists(f)]
-        self.fragments_config = config_mgr.get('music_player.fragments', {})
+        # Folder skanowany jest przy otwarciu okna - nie przy każdej jednostce
+        self.playlist = resolve_playlist(config_mgr)
+        self.fragments = load_fragments(config_mgr)
+
+        self.t2_freq_min = config_mgr.get('test2_auto.freq_min', 20)
+        self.t2_freq_max = config_mgr.get('test2_auto.freq_max', 20000)
+        self.t2_duration = config_mgr.get('test2_auto.duration', 11)
+        self.t2_volume = config_mgr.get('test2_auto.volume', 50)
+        self.t2_wave_type = config_mgr.get('test2_auto.wave_type', 'sine')
+        self.t3_duration_per_channel = config_mgr.get('test3_auto.duration_per_channel', 5)
+        self.t3_volume = config_mgr.get('test3_auto.volume', 50)
 
     def get_fragment_for_file(self, filepath):
-        """Zwraca (start_pct, end_pct) dla pliku, domyślnie (0, 100)"""
-        frag = self.fragments_config.get(filepath, {})
-        return frag.get('start_pct', 0), frag.get('end_pct', 100)
+        """Zwraca (start_pct, end_pct) dla pliku (po skrócie treści), domyślnie (0, 100)"""
+        return self.fragments.get(filepath)
 
     # ─────────────────────────────────────────
     # GUI
@@ -355,6 +391,7 @@ class ComboTest:
         self.test3_data = {}
         self.interrupted = False
         self.combo_start_time = datetime.now()
+        self.run_id = get_test_reporter().begin_run("COMBO")
         self.combo_running = True
 
         self.set_test_status(1, 'waiting')
@@ -367,8 +404,39 @@ class ComboTest:
         self.stop_btn.config(state=tk.NORMAL)
 
         print(f"[COMBO] START - S/N: {self.device_serial}")
+        self.prepare_audio()
         self.run_test1()
 
+    # ─────────────────────────────────────────
+    # PRZYGOTOWANIE AUDIO
+    # ─────────────────────────────────────────
+
+    def prepare_audio(self):
+        """
+        Dekoduje w tle utwór TEST 1 (jeśli nie ma go w cache) i renderuje przejazd
+        TEST 2 oraz bufory L/R/oba TEST 3, póki gra TEST 1
+        """
+        get_track_cache().prefetch([self.playlist[self.current_index]])
+        self.prepare_thread = threading.Thread(target=self._prepare_audio_thread, daemon=True)
+        self.prepare_thread.start()
+
+    def _prepare_audio_thread(self):
+        try:
+            start = time.perf_counter()
+            resource_mgr = get_resource_manager()
+            resource_mgr.get_sweep_sound(self.t2_freq_min, self.t2_freq_max,
+                                         self.t2_duration, self.t2_wave_type)
+            for channel in ('left', 'right', 'both'):
+                resource_mgr.get_loop_sound(300, "triangle", channel)
+            print(f"[COMBO] Audio TEST 2/3 gotowe ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        except Exception as e:
+            print(f"[COMBO] Blad przygotowania audio: {e}")
+
+    def wait_for_prepared_audio(self):
+        """Czeka na przygotowanie audio - zwykle skończone dużo wcześniej, w trakcie TEST 1"""
+        if self.prepare_thread and self.prepare_thread.is_alive():
+            self.prepare_thread.join()
+
     def set_test_status(self, test_num, status):
         labels = {1: self.t1_status_label, 2: self.t2_status_label, 3: self.t3_status_label}
         frames = {1: self.t1_status_frame, 2: self.t2_status_frame, 3: self.t3_status_frame}
@@ -407,10 +475,33 @@ class ComboTest:
 
     def run_test1(self):
         self.current_phase = 'test1'
-        self.test1_start_time = datetime.now()
         self.set_test_status(1, 'running')
         self.phase_label.config(text="TEST 1: Music Player", fg=self.colors['blue'])
 
+        # Utwór z cache PCM - kolejne jednostki i powroty fragmentu bez dekodowania;
+        # pierwszy raz dekodowany w tle (prepare_audio), TEST 1 startuje po załadowaniu
+        filepath = self.playlist[self.current_index]
+        if not get_track_cache().contains(filepath):
+            self.progress_label.config(text="Ładowanie utworu...")
+        self.player.load_async(self.window, filepath,
+                               lambda: self.start_test1(filepath), self.test1_load_failed)
+
+    def test1_load_failed(self, error):
+        if not self.combo_running:
+            return
+        print(f"[COMBO] Blad ladowania utworu: {error}")
+        self.test1_data = {
+            'status': 'FAIL', 'duration': 0,
+            'audio_file': 'ERROR', 'volume_levels': []
+        }
+        self.set_test_status(1, 'fail')
+        self.finish_combo(interrupted=False)
+
+    def start_test1(self, filepath):
+        if not self.combo_running:
+            return
+        self.test1_start_time = datetime.now()
+
         volume_levels = self.t1_volume_levels
         step_duration = self.t1_step_duration
         total_steps = len(volume_levels)
@@ -418,35 +509,25 @@ class ComboTest:
         self.t1_current_step = 0
         self.t1_volume_levels_copy = volume_levels[:]
 
-        filepath = self.playlist[self.current_index]
-
-        # Pobierz długość i fragment per-utwór z configu
-        if self.song_length == 0:
-            self.song_length = self.get_song_length(filepath)
+        try:
+            self.song_length = self.player.length
 
-        start_pct, end_pct = self.get_fragment_for_file(filepath)
-        self.fragment_enabled = (start_pct != 0 or end_pct != 100)
-        self.fragment_start = (start_pct / 100.0) * self.song_length
-        self.fragment_end = (end_pct / 100.0) * self.song_length
+            start_pct, end_pct = self.get_fragment_for_file(filepath)
+            self.fragment_enabled = (start_pct != 0 or end_pct != 100)
+            self.fragment_start = (start_pct / 100.0) * self.song_length
+            self.fragment_end = (end_pct / 100.0) * self.song_length
 
-        print(f"[COMBO] Fragment: {self.format_time(self.fragment_start)} → {self.format_time(self.fragment_end)}")
+            print(f"[COMBO] Fragment: {self.format_time(self.fragment_start)} → {self.format_time(self.fragment_end)}")
 
-        try:
-            pygame.mixer.music.load(filepath)
-            if self.fragment_enabled and self.fragment_start > 0:
-                pygame.mixer.music.play(start=self.fragment_start)
+            # Fragment zapętlony natywnie przez mikser - t1_step steruje tylko głośnością
+            if self.fragment_enabled:
+                self.player.play_fragment(self.fragment_start, self.fragment_end)
             else:
-                pygame.mixer.music.play()
+                self.player.play()
             self.is_playing = True
             self.current_file = filepath
         except Exception as e:
-            print(f"[COMBO] Blad ladowania utworu: {e}")
-            self.test1_data = {
-                'status': 'FAIL', 'duration': 0,
-                'audio_file': 'ERROR', 'volume_levels': []
-            }
-            self.set_test_status(1, 'fail')
-            self.finish_combo(interrupted=False)
+            self.test1_load_failed(e)
             return
 
         audio_file = os.path.basename(filepath)
@@ -456,7 +537,7 @@ class ComboTest:
                 return
 
             if self.t1_current_step >= total_steps:
-                pygame.mixer.music.stop()
+                self.player.stop()
                 self.is_playing = False
                 duration = int((datetime.now() - self.test1_start_time).total_seconds())
                 self.test1_data = {
@@ -472,23 +553,12 @@ class ComboTest:
                 return
 
             vol = self.t1_volume_levels_copy[self.t1_current_step]
-            pygame.mixer.music.set_volume(vol / 82.0)
+            self.player.set_volume(vol / 82.0)
 
             self.progress_label.config(
                 text=f"Krok {self.t1_current_step + 1}/{total_steps} | Glosnosc: {vol}% | Czas: {step_duration}s"
             )
 
-            # Pętlowanie fragmentu
-            if self.fragment_enabled and self.fragment_end > 0:
-                pos_ms = pygame.mixer.music.get_pos()
-                if pos_ms >= 0:
-                    current_pos = pos_ms / 1000.0 + self.fragment_start
-                    if current_pos >= self.fragment_end:
-                        pygame.mixer.music.stop()
-                        pygame.mixer.music.load(filepath)
-                        pygame.mixer.music.play(start=self.fragment_start)
-                        pygame.mixer.music.set_volume(vol / 82.0)
-
             self.t1_current_step += 1
             self.combo_job = self.window.after(step_duration * 1000, t1_step)
 
@@ -505,9 +575,15 @@ class ComboTest:
         self.phase_label.config(text="TEST 2: Tone Generator", fg=self.colors['blue'])
         self.progress_label.config(text="Przejazd czestotliwosci...")
 
+        # Przejazd wyrenderowany w tle w trakcie TEST 1 (pełna skala, poziom ustawia kanał)
+        self.wait_for_prepared_audio()
+        resource_mgr = get_resource_manager()
+        self.t2_sound = resource_mgr.get_sweep_sound(self.t2_freq_min, self.t2_freq_max,
+                                                     self.t2_duration, self.t2_wave_type)
+        resource_mgr.play_sound(self.t2_sound, self.t2_volume)
+
         start_time = time.time()
         end_time = start_time + self.t2_duration
-        self.t2_sound = None
 
         def sweep_step():
             if not self.combo_running:
@@ -532,53 +608,18 @@ class ComboTest:
                 self.start_break(2, self.run_test3)
                 return
 
-            progress = elapsed / total_duration
-            log_min = np.log10(self.t2_freq_min)
-            log_max = np.log10(self.t2_freq_max)
-
-            if progress <= 0.5:
-                sweep_progress = progress * 2
-                current_freq = int(10 ** (log_min + sweep_progress * (log_max - log_min)))
-            else:
-                sweep_progress = (progress - 0.5) * 2
-                current_freq = int(10 ** (log_max - sweep_progress * (log_max - log_min)))
+            current_freq = int(sweep_frequency(elapsed, self.t2_freq_min,
+                                               self.t2_freq_max, total_duration))
 
             remaining = int(total_duration - elapsed)
             self.progress_label.config(
                 text=f"Czestotliwosc: {current_freq} Hz | Pozostalo: {remaining}s"
             )
 
-            if self.t2_sound:
-                self.t2_sound.stop()
-
-            wave = self.generate_tone_wave(current_freq, self.t2_volume, self.t2_wave_type)
-            self.t2_sound = pygame.sndarray.make_sound(wave)
-            self.t2_sound.play(loops=-1)
-
             self.sweep_job = self.window.after(50, sweep_step)
 
         sweep_step()
 
-    def generate_tone_wave(self, frequency, volume, wave_type, duration=1.0, sample_rate=44100):
-        samples = int(duration * sample_rate)
-        t = np.linspace(0, duration, samples, False)
-
-        if wave_type == "sine":
-            wave = np.sin(2 * np.pi * frequency * t)
-        elif wave_type == "square":
-            wave = np.sign(np.sin(2 * np.pi * frequency * t))
-        elif wave_type == "sawtooth":
-            wave = 2 * (t * frequency - np.floor(t * frequency + 0.5))
-        elif wave_type == "triangle":
-            wave = 2 * np.abs(2 * (t * frequency - np.floor(t * frequency + 0.5))) - 1
-        else:
-            wave = np.sin(2 * np.pi * frequency * t)
-
-        wave = wave * (volume / 100.0)
-        wave = np.int16(wave * 32767)
-        wave = np.repeat(wave.reshape(-1, 1), 2, axis=1)
-        return wave
-
     # ─────────────────────────────────────────
     # TEST 3
     # ─────────────────────────────────────────
@@ -596,7 +637,7 @@ class ComboTest:
         def play_next_channel():
             if not self.combo_running or self.t3_channel_index >= len(channels):
                 self.t3_stop_sound = True
-                pygame.mixer.stop()
+                get_resource_manager().stop_all_sounds()
                 duration = int((datetime.now() - self.test3_start_time).total_seconds())
                 self.test3_data = {
                     'status': 'PASS',
@@ -616,7 +657,7 @@ class ComboTest:
             )
 
             self.t3_stop_sound = True
-            pygame.mixer.stop()
+            get_resource_manager().stop_all_sounds()
             time.sleep(0.05)
 
             self.t3_stop_sound = False
@@ -637,26 +678,10 @@ class ComboTest:
 
     def play_stereo_channel(self, channel):
         try:
-            sample_rate = 44100
-            duration = 2.0
-            t = np.linspace(0, duration, int(sample_rate * duration), False)
-            tone = 2 * np.abs(2 * (t * 300 - np.floor(t * 300 + 0.5))) - 1
-            tone = (tone * 32767).astype(np.int16)
-
-            if channel == 'left':
-                stereo = np.zeros((len(tone), 2), dtype=np.int16)
-                stereo[:, 0] = tone
-            elif channel == 'right':
-                stereo = np.zeros((len(tone), 2), dtype=np.int16)
-                stereo[:, 1] = tone
-            else:
-                stereo = np.column_stack((tone, tone))
-
-            volume_factor = self.t3_volume / 100.0
-            stereo = (stereo * volume_factor).astype(np.int16)
-
-            sound = pygame.sndarray.make_sound(stereo)
-            sound.play(loops=-1)  # ← ciągłe bez przerw
+            # Bufor przygotowany w trakcie TEST 1 - tu tylko trafienie w cache
+            resource_mgr = get_resource_manager()
+            sound = resource_mgr.get_loop_sound(300, "triangle", channel)
+            resource_mgr.play_sound(sound, self.t3_volume, loops=-1)  # ← ciągłe bez przerw
 
             while not self.t3_stop_sound:
                 time.sleep(0.05)
@@ -695,8 +720,8 @@ class ComboTest:
         self.combo_running = False
         self.interrupted = interrupted
 
-        pygame.mixer.stop()
-        pygame.mixer.music.stop()
+        get_resource_manager().stop_all_sounds()
+        self.player.stop()
         self.t3_stop_sound = True
 
         self.total_duration = 0
@@ -864,7 +889,8 @@ class ComboTest:
             test2_data=self.test2_data,
             test3_data=self.test3_data,
             total_duration=self.total_duration,
-            interrupted=self.interrupted
+            interrupted=self.interrupted,
+            test_id=self.run_id
         )
 
         color_map = {
@@ -938,8 +964,8 @@ class ComboTest:
             self.window.after_cancel(self.t3_job)
             self.t3_job = None
 
-        pygame.mixer.stop()
-        pygame.mixer.music.stop()
+        get_resource_manager().stop_all_sounds()
+        self.player.stop()
 
         if self.current_phase == 'test1':
             self.set_test_status(1, 'interrupted')
@@ -957,21 +983,6 @@ class ComboTest:
     # UTILS
     # ─────────────────────────────────────────
 
-    def get_song_length(self, filepath):
-        try:
-            try:
-                from mutagen import File as MutagenFile
-                audio = MutagenFile(filepath)
-                if audio and audio.info:
-                    return audio.info.length
-            except ImportError:
-                pass
-            temp_sound = pygame.mixer.Sound(filepath)
-            return temp_sound.get_length()
-        except Exception as e:
-            print(f"[COMBO] Blad pobierania dlugosci: {e}")
-            return 0
-
     def format_time(self, seconds):
         seconds = int(seconds)
         m = seconds // 60
@@ -981,8 +992,8 @@ class ComboTest:
     def back_to_menu(self):
         self.combo_running = False
         self.t3_stop_sound = True
-        pygame.mixer.stop()
-        pygame.mixer.music.stop()
+        get_resource_manager().stop_all_sounds()
+        self.player.stop()
 
         if self.close_callback:
             self.close_callback()
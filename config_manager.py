@@ -135,6 +135,7 @@ class ConfigManager:
                 "default_volume": 50,
                 "max_volume": 82,
                 "playlist": [],
+                "folder": "",
                 "equalizer": {
                     "60Hz": 0,
                     "250Hz": 0,
@@ -154,7 +155,8 @@ class ConfigManager:
             },
             "test1_auto": {
                 "step_duration": 2,
-                "volume_levels": [10, 20, 30, 40, 50, 60, 70, 80]
+                "volume_levels": [10, 20, 30, 40, 50, 60, 70, 80],
+                "loudness_target": None
             },
             "test2_auto": {
                 "wave_type": "sine",
@@ -167,6 +169,13 @@ class ConfigManager:
                 "duration_per_channel": 5,
                 "frequency": 1000,
                 "volume": 50
+            },
+            "reports": {
+                "station_id": "",
+                "fsync": False,
+                "batch_size": 50,
+                "flush_interval": 0.5,
+                "compact_interval": 5.0
             }
         }
         self.save_config()
@@ -0,0 +1,175 @@
+"""
+Folder Playlist - Playlista powiązana z folderem
+Bose Audio Multi-Tool
+
+Folder skanowany jest przez os.scandir (rozmiar i mtime prosto z listingu
+katalogu), a wynik porównywany z zapisanym snapshotem (ścieżka, rozmiar,
+mtime). Metadane i skróty liczone są tylko dla plików nowych i zmienionych,
+więc odświeżenie dużego folderu kosztuje tyle, ile w nim zmian.
+"""
+
+import json
+import os
+import threading
+import time
+
+from audio_metadata import get_audio_metadata
+from playlist_import import get_playlist_importer
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac')
+SNAPSHOT_DIR = "audio_cache"
+SNAPSHOT_FILE = os.path.join(SNAPSHOT_DIR, "folders.json")
+
+
+def scan_folder(folder):
+    """Pliki audio w folderze (rekurencyjnie): {ścieżka: [rozmiar, mtime]}"""
+    found = {}
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                            stat = entry.stat()
+                            found[os.path.normpath(entry.path)] = [stat.st_size, stat.st_mtime]
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"[FolderPlaylist] Nie można odczytać {current}: {e}")
+    return found
+
+
+def _warm_file(filepath):
+    """Metadane i skrót treści pliku nowego lub zmienionego (trafiają do cache)"""
+    metadata = get_audio_metadata()
+    metadata.get(filepath)
+    metadata.get_hash(filepath)
+
+
+class FolderPlaylist:
+    """Snapshoty folderów playlisty - singleton"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.path = SNAPSHOT_FILE
+        self.snapshots = {}        # folder → {ścieżka: [rozmiar, mtime]}
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.snapshots = json.load(f)
+        except Exception as e:
+            print(f"[FolderPlaylist] Błąd odczytu snapshotu: {e}")
+            self.snapshots = {}
+
+    def _save(self):
+        """Zapis atomowy (plik tymczasowy + os.replace) - wywoływać pod blokadą"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshots, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[FolderPlaylist] Błąd zapisu snapshotu: {e}")
+
+    def rescan(self, folder):
+        """
+        Skanuje folder i zwraca (posortowana playlista, {'added', 'changed', 'removed'})
+        Tylko pliki nowe i zmienione względem snapshotu trafiają do puli wątków
+        """
+        folder = os.path.normpath(folder)
+        start = time.perf_counter()
+
+        current = scan_folder(folder)
+        with self._lock:
+            previous = self.snapshots.get(folder, {})
+
+        added = [p for p in current if p not in previous]
+        changed = [p for p in current if p in previous and previous[p] != current[p]]
+        removed = [p for p in previous if p not in current]
+
+        to_probe = added + changed
+        if to_probe:
+            executor = get_playlist_importer().executor
+            for _ in executor.map(_warm_file, to_probe):
+                pass
+
+        if to_probe or removed or folder not in self.snapshots:
+            with self._lock:
+                self.snapshots[folder] = current
+                self._save()
+
+        stats = {'added': len(added), 'changed': len(changed), 'removed': len(removed)}
+        print(f"[FolderPlaylist] {folder}: {len(current)} plików, nowe {stats['added']}, "
+              f"zmienione {stats['changed']}, usunięte {stats['removed']} "
+              f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+        return sorted(current, key=str.lower), stats
+
+
+def get_folder_playlist():
+    """Zwraca instancję FolderPlaylist (singleton)"""
+    return FolderPlaylist()
+
+
+def resolve_playlist(config_mgr):
+    """
+    Playlista z configu bez skanowania: w trybie folderu (music_player.folder) -
+    lista z ostatniego skanu, w przeciwnym razie zapisana lista (istniejące pliki)
+    Świeży skan folderu - rescan_playlist_async()
+    """
+    folder = config_mgr.get('music_player.folder', '')
+    saved_playlist = config_mgr.get('music_player.playlist', [])
+
+    if folder and os.path.isdir(folder):
+        return list(saved_playlist)
+
+    return get_playlist_importer().existing_files(saved_playlist)
+
+
+def rescan_playlist_async(window, config_mgr, on_playlist):
+    """
+    Skanuje powiązany folder w tle (run_async) - wątek Tk nie czeka na sondowanie
+    i hashowanie zmienionych plików. Wynik zapisywany do music_player.playlist,
+    on_playlist(playlist) wołane w wątku Tk tylko, gdy lista się zmieniła
+    """
+    from audio_analysis import run_async
+
+    folder = config_mgr.get('music_player.folder', '')
+    if not folder or not os.path.isdir(folder):
+        return
+
+    def on_scanned(result):
+        playlist, stats = result
+        # Folder odpięty albo zmieniony w trakcie skanu - wynik nieaktualny
+        if config_mgr.get('music_player.folder', '') != folder:
+            return
+        if playlist == config_mgr.get('music_player.playlist', []):
+            return
+        config_mgr.set('music_player.playlist', playlist)
+        config_mgr.save_config()
+        on_playlist(playlist)
+
+    run_async(window, get_folder_playlist().rescan, (folder,), on_scanned,
+              lambda error: print(f"[FolderPlaylist] Błąd skanowania folderu: {error}"))
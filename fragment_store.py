@@ -0,0 +1,122 @@
+"""
+Fragment Store - Fragmenty utworów kluczowane skrótem treści
+Bose Audio Multi-Tool
+
+Fragmenty TEST 1 zapisywane są w music_player.fragments_by_hash pod skrótem
+treści pliku (audio_metadata.content_hash), więc przeniesienie folderu
+z muzyką lub instalacja na innej stacji nie gubi konfiguracji.
+music_player.fragments (ścieżka → fragment) zostaje jako indeks pomocniczy
+i źródło migracji starych configów.
+"""
+
+import os
+
+from audio_metadata import get_audio_metadata
+
+FULL_TRACK = (0, 100)
+
+
+class FragmentStore:
+    """Fragmenty z sekcji music_player configu"""
+
+    def __init__(self, section):
+        self.by_hash = dict(section.get('fragments_by_hash', {}))
+        self.by_path = dict(section.get('fragments', {}))
+
+    def get(self, filepath):
+        """(start_pct, end_pct) dla pliku - po skrócie treści, a gdy go brak po ścieżce"""
+        return self._lookup(filepath, get_audio_metadata().get_hash(filepath))
+
+    def peek(self, filepath):
+        """
+        Jak get(), ale tylko ze skrótów policzonych już przez import/skan folderu -
+        bez stat i odczytu pliku (etykiety długich list w wątku Tk)
+        """
+        return self._lookup(filepath, get_audio_metadata().known_hash(filepath))
+
+    def _lookup(self, filepath, digest):
+        frag = self.by_hash.get(digest) if digest else None
+        if frag is None:
+            frag = self.by_path.get(filepath)
+        if frag is None:
+            return FULL_TRACK
+        return frag.get('start_pct', 0), frag.get('end_pct', 100)
+
+    def set(self, filepath, start_pct, end_pct):
+        """Zapisuje fragment; (0, 100) usuwa wpis"""
+        if (start_pct, end_pct) == FULL_TRACK:
+            self.remove(filepath)
+            return
+
+        frag = {'start_pct': start_pct, 'end_pct': end_pct}
+        digest = get_audio_metadata().get_hash(filepath)
+        if digest:
+            self.by_hash[digest] = dict(frag, name=os.path.basename(filepath))
+            frag['hash'] = digest
+        self.by_path[filepath] = frag
+
+    def remove(self, filepath):
+        """
+        Usuwa fragment pliku bez odczytu pliku (wołane z wątku Tk) - skrót z wpisu
+        ścieżki albo już policzony; wpis skrótu zostaje, dopóki wskazuje go inna
+        ścieżka (kopia tego samego utworu w innym folderze)
+        """
+        frag = self.by_path.pop(filepath, None)
+        digest = frag.get('hash') if frag else None
+        if not digest:
+            digest = get_audio_metadata().known_hash(filepath)
+        if digest and not any(other.get('hash') == digest for other in self.by_path.values()):
+            self.by_hash.pop(digest, None)
+
+    def clear(self):
+        self.by_hash.clear()
+        self.by_path.clear()
+
+    def migrate(self):
+        """
+        Przenosi fragmenty kluczowane tylko ścieżką (stary config) pod skrót treści
+        Zwraca liczbę przeniesionych; pliki niedostępne zostają na później
+        """
+        moved = 0
+        for filepath, frag in list(self.by_path.items()):
+            if frag.get('hash') in self.by_hash or not os.path.exists(filepath):
+                continue
+            self.set(filepath, frag.get('start_pct', 0), frag.get('end_pct', 100))
+            moved += 1
+        if moved:
+            print(f"[FragmentStore] Przeniesiono {moved} fragmentów pod skrót treści")
+        return moved
+
+    def adopt(self, migrated):
+        """
+        Przejmuje skróty policzone przez migrate() na kopii w tle - tylko dla
+        fragmentów, które w międzyczasie się nie zmieniły. Zwraca ich liczbę
+        """
+        adopted = 0
+        for filepath, frag in migrated.by_path.items():
+            digest = frag.get('hash')
+            current = self.by_path.get(filepath)
+            if not digest or current is None or current.get('hash'):
+                continue
+            if (current.get('start_pct'), current.get('end_pct')) != \
+                    (frag.get('start_pct'), frag.get('end_pct')):
+                continue
+            current['hash'] = digest
+            self.by_hash.setdefault(digest, migrated.by_hash[digest])
+            adopted += 1
+        return adopted
+
+    def to_section(self, section):
+        """Zapisuje fragmenty z powrotem do sekcji music_player"""
+        section['fragments_by_hash'] = self.by_hash
+        section['fragments'] = self.by_path
+
+
+def load_fragments(config_mgr):
+    """FragmentStore z bieżącego configu (ConfigManager)"""
+    return FragmentStore(config_mgr.get('music_player', {}) or {})
+
+
+def save_fragments(config_mgr, store):
+    """Zapisuje fragmenty do configu (bez save_config - zapis należy do wywołującego)"""
+    store.to_section(config_mgr.config.setdefault('music_player', {}))
@@ -10,9 +10,19 @@ from tkinter import ttk, messagebox, scrolledtext, simpledialog
 import sys
 import os
 import json
+import multiprocessing
+
+import numpy as np
 
 from resource_manager import get_resource_manager
 from config_manager import get_config_manager
+from audio_metadata import get_audio_metadata
+from track_player import get_track_cache
+from playlist_import import get_playlist_importer
+from folder_playlist import get_folder_playlist
+from fragment_store import load_fragments, save_fragments
+from audio_analysis import (AUTO_FRAGMENT_SECONDS, PEAK_BINS, analyse_playlist_async, find_loudest_segment,
+                            get_peaks, load_peaks, run_async)
 from login_screen import LoginScreen
 from stereo_test import StereoTest
 
@@ -64,6 +74,9 @@ class AudioMultiTool:
             messagebox.showerror("Błąd", "Nie można zainicjować systemu audio!")
             sys.exit(1)
 
+        # Prekompilowane sygnały TEST 2/3 (audio_cache/) - zmapowane zamiast syntezy
+        self.resource_mgr.load_asset_pack()
+
         self.current_test_window = None
         self.root.protocol("WM_DELETE_WINDOW", self.exit_app)
 
@@ -712,6 +725,7 @@ class AudioMultiTool:
                 self.config_mgr.set('test2_auto.duration', duration)
                 self.config_mgr.set('test2_auto.volume', volume)
                 self.config_mgr.save_config()
+                self.resource_mgr.rebuild_asset_pack()
                 wave_names = {'sine': 'Sinusoidalna', 'square': 'Kwadratowa',
                               'sawtooth': 'Piłokształtna', 'triangle': 'Trójkątna'}
                 messagebox.showinfo("Zapisano ✓",
@@ -835,6 +849,7 @@ class AudioMultiTool:
                 self.config_mgr.set('test3_auto.frequency', freq)
                 self.config_mgr.set('test3_auto.volume', volume)
                 self.config_mgr.save_config()
+                self.resource_mgr.rebuild_asset_pack()
                 total_time = duration * 3
                 messagebox.showinfo("Zapisano ✓",
                                     f"Konfiguracja TEST 3 AUTO zapisana:\n\n"
@@ -899,17 +914,36 @@ class AudioMultiTool:
         eng_playlist_box.pack(side=tk.LEFT, fill='both', expand=True)
         pl_scroll.config(command=eng_playlist_box.yview)
 
+        def playlist_box_text(f, frags):
+            name = os.path.basename(f)
+            # Tylko skróty już policzone przez import/skan - bez odczytu plików w wątku Tk
+            s, e = frags.peek(f)
+            suffix = f" [{s}%→{e}%]" if (s != 0 or e != 100) else " [cały]"
+            return name + suffix
+
         def refresh_playlist_box():
             eng_playlist_box.delete(0, tk.END)
             pl = self.config_mgr.get('music_player.playlist', [])
-            frags = self.config_mgr.get('music_player.fragments', {})
+            frags = load_fragments(self.config_mgr)
             for f in pl:
-                name = os.path.basename(f)
-                frag = frags.get(f, {})
-                s = frag.get('start_pct', 0)
-                e = frag.get('end_pct', 100)
-                suffix = f" [{s}%→{e}%]" if (s != 0 or e != 100) else " [cały]"
-                eng_playlist_box.insert(tk.END, name + suffix)
+                eng_playlist_box.insert(tk.END, playlist_box_text(f, frags))
+
+        # Fragmenty ze starego configu (klucz = ścieżka) przenoszone pod skrót treści -
+        # skróty liczone w tle na kopii, wynik przejmowany w wątku Tk
+        def on_fragments_migrated(migrated):
+            frags = load_fragments(self.config_mgr)
+            if frags.adopt(migrated):
+                save_fragments(self.config_mgr, frags)
+                self.config_mgr.save_config()
+                refresh_playlist_box()
+
+        def migrate_fragments(frags):
+            frags.migrate()
+            return frags
+
+        run_async(eng_window, migrate_fragments, (load_fragments(self.config_mgr),),
+                  on_fragments_migrated,
+                  lambda err: print(f"[ENG] Błąd migracji fragmentów: {err}"))
 
         refresh_playlist_box()
 
@@ -926,14 +960,33 @@ class AudioMultiTool:
                     ("Wszystkie", "*.*")
                 ]
             )
-            if paths:
-                pl = self.config_mgr.get('music_player.playlist', [])
-                for p in paths:
-                    if p not in pl:
-                        pl.append(p)
+            if not paths:
+                return
+
+            # Walidacja, metadane i skróty w puli wątków - lista rośnie partiami
+            pl = self.config_mgr.get('music_player.playlist', [])
+            known = set(pl)
+
+            def on_batch(results):
+                frags = load_fragments(self.config_mgr)
+                for result in results:
+                    p = result['path']
+                    if p in known:
+                        continue
+                    known.add(p)
+                    pl.append(p)
+                    eng_playlist_box.insert(tk.END, playlist_box_text(p, frags))
+
+            def on_done(job):
+                unbind_folder()
                 self.config_mgr.set('music_player.playlist', pl)
                 self.config_mgr.save_config()
-                refresh_playlist_box()
+                analyse_playlist_async(pl)
+                if job.skipped:
+                    messagebox.showwarning("Import",
+                                           f"Pominięto {job.skipped} plików (brak pliku lub błąd odczytu)")
+
+            get_playlist_importer().import_files(paths, eng_window, on_batch, on_done)
 
         def eng_remove_file():
             sel = eng_playlist_box.curselection()
@@ -945,17 +998,21 @@ class AudioMultiTool:
             if idx < len(pl):
                 removed = pl[idx]
                 pl.pop(idx)
-                frags = self.config_mgr.get('music_player.fragments', {})
-                frags.pop(removed, None)
+                frags = load_fragments(self.config_mgr)
+                frags.remove(removed)
+                unbind_folder()
                 self.config_mgr.set('music_player.playlist', pl)
-                self.config_mgr.set('music_player.fragments', frags)
+                save_fragments(self.config_mgr, frags)
                 self.config_mgr.save_config()
                 refresh_playlist_box()
 
         def eng_clear_files():
             if messagebox.askyesno("Potwierdzenie", "Wyczyścić całą playlistę i fragmenty?"):
+                unbind_folder()
                 self.config_mgr.set('music_player.playlist', [])
-                self.config_mgr.set('music_player.fragments', {})
+                frags = load_fragments(self.config_mgr)
+                frags.clear()
+                save_fragments(self.config_mgr, frags)
                 self.config_mgr.save_config()
                 refresh_playlist_box()
 
@@ -969,6 +1026,92 @@ class AudioMultiTool:
                       bd=2, relief=tk.SOLID, font=('Arial', 8), width=13
                       ).pack(side=tk.LEFT, padx=3)
 
+        # --- PLAYLISTA Z FOLDERU ---
+        folder_row = tk.Frame(list_outer, bg=self.COLORS['bg_card'])
+        folder_row.pack(fill='x', padx=10, pady=(0, 8))
+
+        folder_lbl = tk.Label(folder_row, text="",
+                              font=('Arial', 8),
+                              bg=self.COLORS['bg_card'],
+                              fg=self.COLORS['text_secondary'],
+                              anchor='w')
+
+        def update_folder_lbl(extra=""):
+            folder = self.config_mgr.get('music_player.folder', '')
+            text = f"📁 Folder: {folder}" if folder else "Playlista: lista plików (bez folderu)"
+            folder_lbl.config(text=text + extra)
+
+        def unbind_folder():
+            """Ręczna zmiana listy przełącza playlistę z trybu folderu na listę plików"""
+            if self.config_mgr.get('music_player.folder', ''):
+                self.config_mgr.set('music_player.folder', '')
+                update_folder_lbl()
+
+        def eng_rescan_folder():
+            folder = self.config_mgr.get('music_player.folder', '')
+            if not folder:
+                messagebox.showwarning("Brak folderu", "Najpierw wybierz folder playlisty")
+                return
+            update_folder_lbl("  (skanowanie...)")
+
+            def on_scanned(result):
+                playlist, stats = result
+                if self.config_mgr.get('music_player.folder', '') != folder:
+                    return
+                self.config_mgr.set('music_player.playlist', playlist)
+                self.config_mgr.save_config()
+                refresh_playlist_box()
+                analyse_playlist_async(playlist)
+                update_folder_lbl(f"  (+{stats['added']} / ~{stats['changed']} / -{stats['removed']})")
+
+            def on_scan_error(error):
+                print(f"[ENG] Błąd skanowania folderu: {error}")
+                update_folder_lbl("  (błąd skanowania)")
+
+            # Skan w tle - przy dużym folderze okno pozostaje responsywne
+            run_async(eng_window, get_folder_playlist().rescan, (folder,), on_scanned, on_scan_error)
+
+        def eng_choose_folder():
+            from tkinter import filedialog
+            folder = filedialog.askdirectory(title="Wybierz folder z plikami audio")
+            if not folder:
+                return
+            self.config_mgr.set('music_player.folder', os.path.normpath(folder))
+            self.config_mgr.save_config()
+            eng_rescan_folder()
+
+        for btn_text, btn_cmd in [("📁 FOLDER", eng_choose_folder),
+                                   ("↻ SKANUJ", eng_rescan_folder)]:
+            tk.Button(folder_row, text=btn_text, command=btn_cmd,
+                      bg=self.COLORS['button_bg'], fg=self.COLORS['button_fg'],
+                      activebackground=self.COLORS['button_hover'],
+                      activeforeground=self.COLORS['button_hover_fg'],
+                      bd=2, relief=tk.SOLID, font=('Arial', 8), width=13
+                      ).pack(side=tk.LEFT, padx=3)
+        folder_lbl.pack(side=tk.LEFT, fill='x', expand=True, padx=(8, 0))
+        update_folder_lbl()
+
+        # --- CACHE UTWORÓW (statystyki prefetchu) ---
+        cache_stats_lbl = tk.Label(playlist_tab, text="",
+                                   font=('Arial', 8),
+                                   bg=self.COLORS['bg_main'],
+                                   fg=self.COLORS['text_secondary'])
+        cache_stats_lbl.pack(anchor='w', padx=10, pady=(0, 5))
+
+        def refresh_cache_stats():
+            if not cache_stats_lbl.winfo_exists():
+                return
+            st = get_track_cache().get_status()
+            cache_stats_lbl.config(
+                text=f"Cache utworów: {st['tracks']} plików, {st['bytes'] / 1048576:.0f} MiB  |  "
+                     f"trafienia: {st['hits']}, pudła: {st['misses']}  |  "
+                     f"prefetch: {st['prefetched']} (użyte: {st['prefetch_hits']}, w kolejce: {st['prefetch_pending']})  |  "
+                     f"dekodowanie śr.: {st['avg_decode_ms']:.0f} ms"
+            )
+            eng_window.after(1000, refresh_cache_stats)
+
+        refresh_cache_stats()
+
         # --- EDYCJA FRAGMENTU (inline) ---
         frag_outer = tk.Frame(playlist_tab, bg=self.COLORS['bg_card'], relief=tk.SOLID, bd=1)
         frag_outer.pack(fill='x', padx=10, pady=(0, 8))
@@ -1066,23 +1209,6 @@ class AudioMultiTool:
         eng_start_var.trace('w', update_frag_info_lbl)
         eng_end_var.trace('w', update_frag_info_lbl)
 
-        def get_audio_duration(filepath):
-            """Próbuje odczytać długość pliku audio przez mutagen lub pygame."""
-            try:
-                import mutagen
-                audio = mutagen.File(filepath)
-                if audio and hasattr(audio, 'info') and audio.info:
-                    return audio.info.length
-            except Exception:
-                pass
-            try:
-                import pygame
-                snd = pygame.mixer.Sound(filepath)
-                return snd.get_length()
-            except Exception:
-                pass
-            return 0
-
         def on_playlist_select(event):
             sel = eng_playlist_box.curselection()
             if not sel:
@@ -1092,12 +1218,9 @@ class AudioMultiTool:
             if idx >= len(pl):
                 return
             filepath = pl[idx]
-            frags = self.config_mgr.get('music_player.fragments', {})
-            frag = frags.get(filepath, {})
-            s = frag.get('start_pct', 0)
-            e = frag.get('end_pct', 100)
+            s, e = load_fragments(self.config_mgr).get(filepath)
 
-            dur = get_audio_duration(filepath)
+            dur = get_audio_metadata().duration(filepath)
             eng_song_duration[0] = dur
 
             dur_str = f"  ({fmt_time(int(dur))})" if dur > 0 else ""
@@ -1126,24 +1249,21 @@ class AudioMultiTool:
             if idx >= len(pl):
                 return
             filepath = pl[idx]
-            frags = self.config_mgr.get('music_player.fragments', {})
-            frag = frags.get(filepath, {})
-            cur_s = frag.get('start_pct', 0)
-            cur_e = frag.get('end_pct', 100)
+            cur_s, cur_e = load_fragments(self.config_mgr).get(filepath)
 
             # Pobierz długość pliku
-            dur = get_audio_duration(filepath)
+            dur = get_audio_metadata().duration(filepath)
 
             edit_win = tk.Toplevel(eng_window)
             edit_win.title(f"Fragment: {os.path.basename(filepath)}")
-            edit_win.geometry("520x320")
+            edit_win.geometry("600x420")
             edit_win.configure(bg='#FFFFFF')
             edit_win.resizable(False, False)
             edit_win.grab_set()
             edit_win.transient(eng_window)
             edit_win.update_idletasks()
-            x = (edit_win.winfo_screenwidth() // 2) - 260
-            y = (edit_win.winfo_screenheight() // 2) - 160
+            x = (edit_win.winfo_screenwidth() // 2) - 300
+            y = (edit_win.winfo_screenheight() // 2) - 210
             edit_win.geometry(f"+{x}+{y}")
 
             tk.Label(edit_win,
@@ -1157,6 +1277,44 @@ class AudioMultiTool:
                      font=('Arial', 9),
                      bg='#FFFFFF', fg='#666666').pack(pady=(0, 10))
 
+            # Miniatura przebiegu (min/max na kanał) z nałożonym oknem fragmentu
+            wave_w, wave_h = PEAK_BINS, 90
+            wave_canvas = tk.Canvas(edit_win, width=wave_w, height=wave_h,
+                                    bg='#F5F5F5', highlightthickness=1,
+                                    highlightbackground='#000000')
+            wave_canvas.pack(padx=20, pady=(0, 10))
+            frag_overlay = wave_canvas.create_rectangle(0, 0, 0, wave_h, fill='#1976D2', stipple='gray25',
+                                                        outline='#1976D2')
+            wave_msg = wave_canvas.create_text(wave_w // 2, wave_h // 2, text="Generowanie podglądu...",
+                                               font=('Arial', 8), fill='#666666')
+
+            def draw_peaks(peaks):
+                if not wave_canvas.winfo_exists():
+                    return
+                wave_canvas.delete(wave_msg)
+                channels = peaks.shape[1]
+                lane = wave_h / channels
+                x = np.repeat(np.arange(len(peaks), dtype=np.float32), 2)
+                for ch in range(channels):
+                    mid = lane * (ch + 0.5)
+                    # Zygzak max/min kolejnych przedziałów - jedna linia na kanał
+                    y = mid - peaks[:, ch, ::-1].reshape(-1).astype(np.float32) * (lane / 2 / 32768.0)
+                    coords = np.column_stack((x, y)).reshape(-1).tolist()
+                    wave_canvas.create_line(*coords, fill='#000000', width=1)
+                wave_canvas.tag_raise(frag_overlay)
+
+            def update_overlay():
+                x0 = win_start_var.get() / 100.0 * wave_w
+                x1 = win_end_var.get() / 100.0 * wave_w
+                wave_canvas.coords(frag_overlay, x0, 0, x1, wave_h)
+
+            peaks = load_peaks(filepath)
+            if peaks is not None:
+                draw_peaks(peaks)
+            else:
+                run_async(edit_win, get_peaks, (filepath,), draw_peaks,
+                          lambda error: wave_canvas.itemconfig(wave_msg, text="Brak podglądu"))
+
             tk.Frame(edit_win, bg='#000000', height=1).pack(fill='x', padx=20, pady=(0, 10))
 
             # START suwak
@@ -1179,6 +1337,7 @@ class AudioMultiTool:
 
             def on_start_change(v):
                 val = int(float(v))
+                update_overlay()
                 if dur > 0:
                     win_start_lbl.config(text=fmt_time(int(val / 100.0 * dur)))
                 else:
@@ -1212,6 +1371,7 @@ class AudioMultiTool:
 
             def on_end_change(v):
                 val = int(float(v))
+                update_overlay()
                 if dur > 0:
                     win_end_lbl.config(text=fmt_time(int(val / 100.0 * dur)))
                 else:
@@ -1247,6 +1407,7 @@ class AudioMultiTool:
             win_start_var.trace('w', update_preview)
             win_end_var.trace('w', update_preview)
             update_preview()
+            update_overlay()
 
             btn_row = tk.Frame(edit_win, bg='#FFFFFF')
             btn_row.pack(pady=10)
@@ -1257,12 +1418,10 @@ class AudioMultiTool:
                 if s >= e:
                     messagebox.showerror("Błąd", "START musi być mniejszy niż KONIEC!")
                     return
-                frags = self.config_mgr.get('music_player.fragments', {})
-                if s == 0 and e == 100:
-                    frags.pop(filepath, None)
-                else:
-                    frags[filepath] = {'start_pct': s, 'end_pct': e}
-                self.config_mgr.set('music_player.fragments', frags)
+                # Fragment zapisywany pod skrótem treści - przetrwa przeniesienie pliku
+                frags = load_fragments(self.config_mgr)
+                frags.set(filepath, s, e)
+                save_fragments(self.config_mgr, frags)
                 self.config_mgr.save_config()
                 refresh_playlist_box()
                 eng_start_var.set(s)
@@ -1281,6 +1440,28 @@ class AudioMultiTool:
                 win_start_var.set(0)
                 win_end_var.set(100)
 
+            def auto_fragment():
+                # Dekodowanie (cache) i obwiednia RMS poza wątkiem Tk - w procesie roboczym
+                seconds = self.config_mgr.get('music_player.auto_fragment_seconds', AUTO_FRAGMENT_SECONDS)
+                auto_btn.config(state=tk.DISABLED, text="⏳ ANALIZA...")
+
+                def on_result(result):
+                    if not edit_win.winfo_exists():
+                        return
+                    auto_btn.config(state=tk.NORMAL, text="🔊 AUTO FRAGMENT")
+                    win_start_var.set(result['start_pct'])
+                    win_end_var.set(result['end_pct'])
+                    on_start_change(result['start_pct'])
+                    on_end_change(result['end_pct'])
+
+                def on_error(error):
+                    if not edit_win.winfo_exists():
+                        return
+                    auto_btn.config(state=tk.NORMAL, text="🔊 AUTO FRAGMENT")
+                    messagebox.showerror("Błąd", f"Analiza nie powiodła się:\n{error}", parent=edit_win)
+
+                run_async(edit_win, find_loudest_segment, (filepath, seconds), on_result, on_error)
+
             tk.Button(btn_row, text="💾 ZAPISZ FRAGMENT", command=save_fragment,
                       bg='#FFFFFF', fg='#000000',
                       activebackground='#000000', activeforeground='#FFFFFF',
@@ -1291,6 +1472,12 @@ class AudioMultiTool:
                       activebackground='#000000', activeforeground='#FFFFFF',
                       bd=1, relief=tk.SOLID, font=('Arial', 8), width=18).pack(side='left', padx=5)
 
+            auto_btn = tk.Button(btn_row, text="🔊 AUTO FRAGMENT", command=auto_fragment,
+                                 bg='#FFFFFF', fg='#666666',
+                                 activebackground='#000000', activeforeground='#FFFFFF',
+                                 bd=1, relief=tk.SOLID, font=('Arial', 8), width=18)
+            auto_btn.pack(side='left', padx=5)
+
         tk.Button(playlist_tab,
                   text="✏ EDYTUJ FRAGMENT WYBRANEGO UTWORU",
                   command=open_fragment_editor,
@@ -1827,6 +2014,9 @@ class AudioMultiTool:
 
 
 if __name__ == "__main__":
+    # Procesy robocze analiz (ProcessPoolExecutor) w wersji exe
+    multiprocessing.freeze_support()
+
     try:
         root = tk.Tk()
         root.configure(bg='#FFFFFF')
@@ -9,10 +9,15 @@ from tkinter import ttk, filedialog, messagebox
 import pygame
 import os
 import json
-import time
-from mutagen import File
 from datetime import datetime
 from test_reporter import get_test_reporter
+from track_player import TrackPlayer, get_track_cache
+from audio_metadata import get_audio_metadata
+from playlist_import import get_playlist_importer
+from config_manager import get_config_manager
+from folder_playlist import rescan_playlist_async, resolve_playlist
+from fragment_store import FragmentStore, load_fragments
+from audio_analysis import analyse_playlist_async
 
 
 class MusicPlayerTest:
@@ -49,14 +54,15 @@ class MusicPlayerTest:
         self.volume = 50
         self.song_length = 0
         self.update_job = None
-        self.start_time = 0
-        self.pause_pos = 0
+
+        # Utwór odtwarzany z zdekodowanego PCM (cache) - przewijanie bez ponownego dekodowania
+        self.player = TrackPlayer()
 
         # Fragment per-utwór — pobierany z configu
         self.fragment_start = 0
         self.fragment_end = 0
         self.fragment_enabled = False
-        self.fragments_config = {}
+        self.fragments = FragmentStore({})
 
         # Auto test
         self.auto_test_running = False
@@ -65,13 +71,20 @@ class MusicPlayerTest:
         self.auto_test_volumes = list(range(10, 83, 10))
         self.auto_test_duration = 5000
         self.auto_test_start_time = None
+        self.run_id = None
 
         self.config_file = "audio_tool_config.json"
+        self.import_jobs = []
 
         self.load_playlist_from_config()
         self.create_widgets()
         self.refresh_playlist_display()
 
+        # Pierwsze utwory playlisty dekodowane w tle - start bez przycięcia UI
+        get_track_cache().prefetch_playlist(self.playlist, 0)
+
+        rescan_playlist_async(self.window, get_config_manager(), self.on_playlist_rescanned)
+
         self.window.protocol("WM_DELETE_WINDOW", self.close_window)
 
     # ─────────────────────────────────────────
@@ -81,18 +94,29 @@ class MusicPlayerTest:
     def load_playlist_from_config(self):
         """Wczytuje playlistę i fragmenty z konfiguracji"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                mp = config.get('music_player', {})
-                saved_playlist = mp.get('playlist', [])
-                self.playlist = [f for f in saved_playlist if os.path.exists(f)]
-                self.fragments_config = mp.get('fragments', {})
-        except:
-            pass
+            config_mgr = get_config_manager()
+            config_mgr.reload_config()
+            # Playlista powiązana z folderem - lista z ostatniego skanu, zmiany po skanie w tle
+            self.playlist = resolve_playlist(config_mgr)
+            self.fragments = load_fragments(config_mgr)
+        except Exception as e:
+            print(f"Błąd wczytywania playlisty: {e}")
 
-    def save_playlist_to_config(self):
-        """Zapisuje playlistę do konfiguracji (fragmenty są zarządzane przez Tryb Inżynieryjny)"""
+    def on_playlist_rescanned(self, playlist):
+        """Nowa lista z folderu - bieżący utwór zachowuje zaznaczenie"""
+        if self.auto_test_running:
+            return
+        self.playlist = playlist
+        self.current_index = playlist.index(self.current_file) if self.current_file in playlist else -1
+        self.refresh_playlist_display()
+        get_track_cache().prefetch_playlist(self.playlist, max(self.current_index, 0))
+
+    def save_playlist_to_config(self, manual_edit=False):
+        """
+        Zapisuje playlistę do konfiguracji (fragmenty są zarządzane przez Tryb Inżynieryjny)
+        manual_edit - ręczna zmiana listy odpina folder (jak unbind_folder w Trybie Inżynieryjnym),
+        inaczej kolejny skan folderu nadpisałby zmiany operatora
+        """
         try:
             config = {}
             if os.path.exists(self.config_file):
@@ -101,8 +125,12 @@ class MusicPlayerTest:
             if 'music_player' not in config:
                 config['music_player'] = {}
             config['music_player']['playlist'] = self.playlist
+            if manual_edit and config['music_player'].get('folder'):
+                config['music_player']['folder'] = ""
+                print("[MusicPlayer] Ręczna zmiana playlisty - odpięto folder")
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=4, ensure_ascii=False)
+            get_config_manager().reload_config()
         except Exception as e:
             print(f"Błąd zapisu playlisty: {e}")
 
@@ -112,14 +140,13 @@ class MusicPlayerTest:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
-                self.fragments_config = config.get('music_player', {}).get('fragments', {})
+                self.fragments = FragmentStore(config.get('music_player', {}))
         except:
             pass
 
     def get_fragment_for_file(self, filepath):
-        """Zwraca (start_pct, end_pct) dla pliku, domyślnie (0, 100)"""
-        frag = self.fragments_config.get(filepath, {})
-        return frag.get('start_pct', 0), frag.get('end_pct', 100)
+        """Zwraca (start_pct, end_pct) dla pliku (po skrócie treści), domyślnie (0, 100)"""
+        return self.fragments.get(filepath)
 
     # ─────────────────────────────────────────
     # UI
@@ -449,21 +476,40 @@ class MusicPlayerTest:
             ]
         )
         if file_paths:
-            for path in file_paths:
-                if path not in self.playlist:
-                    self.playlist.append(path)
-            self.refresh_playlist_display()
-            self.save_playlist_to_config()
+            # Walidacja, metadane i skróty w puli wątków - lista rośnie partiami
+            self.import_jobs.append(get_playlist_importer().import_files(
+                file_paths, self.window, self.on_import_batch, self.on_import_done
+            ))
             self.window.lift()
             self.window.focus_force()
 
+    def on_import_batch(self, results):
+        """Dopisuje partię zaimportowanych plików bez przebudowy całej listy"""
+        known = set(self.playlist)
+        for result in results:
+            path = result['path']
+            if path in known:
+                continue
+            known.add(path)
+            self.playlist.append(path)
+            self.playlist_listbox.insert(tk.END, f"  {os.path.basename(path)}")
+
+    def on_import_done(self, job):
+        self.import_jobs.remove(job)
+        self.refresh_playlist_display()
+        self.save_playlist_to_config(manual_edit=True)
+        analyse_playlist_async(self.playlist)
+        if job.skipped:
+            messagebox.showwarning("Import",
+                                   f"Pominięto {job.skipped} plików (brak pliku lub błąd odczytu)")
+
     def remove_selected(self):
         selection = self.playlist_listbox.curselection()
         if selection:
             index = selection[0]
             del self.playlist[index]
             self.refresh_playlist_display()
-            self.save_playlist_to_config()
+            self.save_playlist_to_config(manual_edit=True)
             if index == self.current_index:
                 self.stop_music()
                 self.current_index = -1
@@ -474,7 +520,7 @@ class MusicPlayerTest:
             self.playlist = []
             self.current_index = -1
             self.refresh_playlist_display()
-            self.save_playlist_to_config()
+            self.save_playlist_to_config(manual_edit=True)
 
     def refresh_playlist_display(self):
         self.playlist_listbox.delete(0, tk.END)
@@ -502,10 +548,30 @@ class MusicPlayerTest:
     # ODTWARZANIE
     # ─────────────────────────────────────────
 
-    def load_and_play(self, filepath):
-        """Ładuje i odtwarza plik — fragment pobierany z configu per-utwór"""
+    def load_and_play(self, filepath, on_started=None):
+        """
+        Ładuje i odtwarza plik — fragment pobierany z configu per-utwór
+        Utwór spoza cache dekodowany jest w tle; on_started() po starcie odtwarzania
+        """
+        self.file_label.config(text=f"ŁADOWANIE: {os.path.basename(filepath).upper()}",
+                               fg=self.colors['text_secondary'])
+        self.player.load_async(self.window, filepath,
+                               lambda: self.start_loaded(filepath, on_started),
+                               self.on_load_error)
+
+    def on_load_error(self, error):
+        messagebox.showerror("Błąd", f"Nie można odtworzyć:\n{str(error)}")
+        if self.auto_test_running:
+            self.stop_auto_test(save_report=False)
+
+    def start_loaded(self, filepath, on_started=None):
+        """Start odtwarzania utworu załadowanego przez load_and_play()"""
         try:
-            self.song_length = self.get_song_length(filepath)
+            self.song_length = self.player.length
+
+            # Następne utwory dekodowane w tle, póki gra bieżący
+            if filepath in self.playlist:
+                get_track_cache().prefetch_playlist(self.playlist, self.playlist.index(filepath) + 1)
 
             # Przeładuj fragmenty z configu (żeby mieć aktualne dane)
             self.reload_fragments_config()
@@ -531,19 +597,18 @@ class MusicPlayerTest:
                     fg=self.colors['text_secondary']
                 )
 
-            pygame.mixer.music.load(filepath)
             self.current_file = filepath
             filename = os.path.basename(filepath)
             self.file_label.config(text=filename.upper(), fg=self.colors['text_primary'])
 
-            if self.fragment_enabled and self.fragment_start > 0:
-                pygame.mixer.music.play(start=self.fragment_start)
-                self.start_time = time.time() - self.fragment_start
+            self.player.set_volume(self.volume / 82.0)
+            if self.fragment_enabled and self.auto_test_running:
+                # Auto test: fragment zapętlony natywnie przez mikser
+                self.player.play_fragment(self.fragment_start, self.fragment_end)
+            elif self.fragment_enabled and self.fragment_start > 0:
+                self.player.play(start=self.fragment_start)
             else:
-                pygame.mixer.music.play()
-                self.start_time = time.time()
-
-            pygame.mixer.music.set_volume(self.volume / 82.0)
+                self.player.play()
             self.is_playing = True
             self.is_paused = False
 
@@ -555,7 +620,11 @@ class MusicPlayerTest:
             self.update_progress()
 
         except Exception as e:
-            messagebox.showerror("Błąd", f"Nie można odtworzyć:\n{str(e)}")
+            self.on_load_error(e)
+            return
+
+        if on_started:
+            on_started()
 
     def play_music(self):
         if not self.playlist:
@@ -569,10 +638,9 @@ class MusicPlayerTest:
             self.current_index = 0
 
         if self.is_paused:
-            pygame.mixer.music.unpause()
+            self.player.unpause()
             self.is_paused = False
             self.is_playing = True
-            self.start_time = time.time() - self.pause_pos
             if self.update_job:
                 self.window.after_cancel(self.update_job)
             self.update_progress()
@@ -583,8 +651,7 @@ class MusicPlayerTest:
 
     def pause_music(self):
         if self.is_playing and not self.is_paused:
-            self.pause_pos = time.time() - self.start_time
-            pygame.mixer.music.pause()
+            self.player.pause()
             self.is_paused = True
             if self.update_job:
                 self.window.after_cancel(self.update_job)
@@ -592,7 +659,7 @@ class MusicPlayerTest:
             self.update_buttons_paused()
 
     def stop_music(self):
-        pygame.mixer.music.stop()
+        self.player.stop()
         self.is_playing = False
         self.is_paused = False
         if self.update_job:
@@ -605,27 +672,19 @@ class MusicPlayerTest:
     def rewind_10s(self):
         if self.is_playing and not self.is_paused and self.current_file:
             try:
-                elapsed = time.time() - self.start_time
+                elapsed = self.player.get_pos()
                 new_pos = max(self.fragment_start if self.fragment_enabled else 0,
                               elapsed - 10)
-                pygame.mixer.music.stop()
-                pygame.mixer.music.load(self.current_file)
-                pygame.mixer.music.play(start=new_pos)
-                pygame.mixer.music.set_volume(self.volume / 82.0)
-                self.start_time = time.time() - new_pos
+                self.player.play(start=new_pos)
             except Exception as e:
                 print(f"Błąd przewijania: {e}")
 
     def forward_10s(self):
         if self.is_playing and not self.is_paused and self.current_file:
             try:
-                elapsed = time.time() - self.start_time
+                elapsed = self.player.get_pos()
                 new_pos = elapsed + 10
-                pygame.mixer.music.stop()
-                pygame.mixer.music.load(self.current_file)
-                pygame.mixer.music.play(start=new_pos)
-                pygame.mixer.music.set_volume(self.volume / 82.0)
-                self.start_time = time.time() - new_pos
+                self.player.play(start=new_pos)
             except Exception as e:
                 print(f"Błąd przewijania: {e}")
 
@@ -637,43 +696,23 @@ class MusicPlayerTest:
                 percent = (click_pos / total_width) * 100
                 percent = max(0, min(100, percent))
                 new_pos = (percent / 100) * self.song_length
-                pygame.mixer.music.stop()
-                pygame.mixer.music.load(self.current_file)
-                pygame.mixer.music.play(start=new_pos)
-                pygame.mixer.music.set_volume(self.volume / 82.0)
-                self.start_time = time.time() - new_pos
+                self.player.play(start=new_pos)
             except Exception as e:
                 print(f"Błąd przewijania: {e}")
 
     def change_volume(self, value):
         self.volume = int(float(value))
-        pygame.mixer.music.set_volume(self.volume / 82.0)
+        self.player.set_volume(self.volume / 82.0)
         self.volume_label.config(text=f"POZIOM: {self.volume}%")
 
     def update_progress(self):
         if self.is_playing and not self.is_paused:
             try:
-                pos_sec = time.time() - self.start_time
-
-                # Pętlowanie fragmentu podczas auto testu
-                if (self.fragment_enabled and
-                        self.auto_test_running and
-                        self.fragment_end > 0 and
-                        pos_sec >= self.fragment_end):
-                    pygame.mixer.music.stop()
-                    pygame.mixer.music.load(self.current_file)
-                    pygame.mixer.music.play(start=self.fragment_start)
-                    pygame.mixer.music.set_volume(self.volume / 82.0)
-                    self.start_time = time.time() - self.fragment_start
-                    pos_sec = self.fragment_start
+                pos_sec = self.player.get_pos()
 
                 if self.song_length > 0:
                     progress = (pos_sec / self.song_length) * 100
                     self.progress_var.set(min(progress, 100))
-                else:
-                    pos_ms = pygame.mixer.music.get_pos()
-                    if pos_ms >= 0:
-                        pos_sec = pos_ms / 1000.0
 
                 current_time = self.format_time(pos_sec)
                 total_time = self.format_time(self.song_length) if self.song_length > 0 else "00:00"
@@ -694,15 +733,6 @@ class MusicPlayerTest:
         secs = int(seconds % 60)
         return f"{mins:02d}:{secs:02d}"
 
-    def get_song_length(self, filepath):
-        try:
-            audio = File(filepath)
-            if audio is not None and hasattr(audio.info, 'length'):
-                return audio.info.length
-            return 0
-        except:
-            return 0
-
     def update_buttons_playing(self):
         self.play_btn.config(state=tk.DISABLED,
                              bg=self.colors['bg_card'],
@@ -757,7 +787,6 @@ class MusicPlayerTest:
             messagebox.showwarning("Uwaga", "Playlista jest pusta")
             return
 
-        from config_manager import get_config_manager
         config_mgr = get_config_manager()
         config_mgr.reload_config()
 
@@ -782,7 +811,7 @@ class MusicPlayerTest:
 
         # Pobierz długość i fragment dla wybranego pliku
         filepath = self.playlist[self.current_index]
-        self.song_length = self.get_song_length(filepath)
+        self.song_length = get_audio_metadata().duration(filepath)
 
         self.reload_fragments_config()
         start_pct, end_pct = self.get_fragment_for_file(filepath)
@@ -795,6 +824,7 @@ class MusicPlayerTest:
         self.auto_test_running = True
         self.auto_test_step = 0
         self.auto_test_start_time = datetime.now()
+        self.run_id = get_test_reporter().begin_run("TEST1")
 
         # Zablokuj UI
         self.play_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'], fg=self.colors['text_secondary'])
@@ -825,7 +855,7 @@ class MusicPlayerTest:
         self.volume_slider.set(volume)
         self.volume_slider.config(state=tk.DISABLED)
 
-        pygame.mixer.music.set_volume(volume / 82.0)
+        self.player.set_volume(volume / 82.0)
         self.volume_label.config(text=f"POZIOM: {volume}%")
 
         total_steps = len(self.auto_test_volumes)
@@ -835,12 +865,18 @@ class MusicPlayerTest:
         )
 
         if self.auto_test_step == 0:
-            filepath = self.playlist[self.current_index]
-            self.load_and_play(filepath)
+            # Czas kroku liczony od startu odtwarzania - dekodowanie go nie skraca
+            self.load_and_play(self.playlist[self.current_index], self.schedule_next_auto_step)
+        else:
+            self.schedule_next_auto_step()
+
+    def schedule_next_auto_step(self):
+        if not self.auto_test_running:
+            return
+        if self.auto_test_step == 0:
             # Zablokuj przyciski nawigacji (load_and_play je odblokował)
-            if self.auto_test_running:
-                self.rewind_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'], fg=self.colors['text_secondary'])
-                self.forward_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'], fg=self.colors['text_secondary'])
+            self.rewind_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'], fg=self.colors['text_secondary'])
+            self.forward_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'], fg=self.colors['text_secondary'])
 
         self.auto_test_step += 1
         self.auto_test_job = self.window.after(self.auto_test_duration, self.run_auto_test_step)
@@ -856,7 +892,7 @@ class MusicPlayerTest:
             self.window.after_cancel(self.auto_test_job)
             self.auto_test_job = None
 
-        if self.is_playing:
+        if self.is_playing or self.player.is_loading:
             self.stop_music()
 
         self.auto_start_btn.config(state=tk.NORMAL, bg=self.colors['button_bg'], fg=self.colors['button_fg'])
@@ -886,7 +922,8 @@ class MusicPlayerTest:
                 completed_steps=completed_steps,
                 volume_levels=volumes_tested,
                 interrupted=interrupted,
-                notes=""
+                notes="",
+                test_id=self.run_id
             )
             print(f"✓ Raport TEST 1 zapisany")
         except Exception as e:
@@ -983,8 +1020,10 @@ class MusicPlayerTest:
                 self.stop_auto_test()
             if self.update_job:
                 self.window.after_cancel(self.update_job)
+            for job in self.import_jobs:
+                job.cancel()
             if self.is_playing:
-                pygame.mixer.music.stop()
+                self.player.stop()
             self.save_playlist_to_config()
             self.window.destroy()
         except Exception as e:
@@ -0,0 +1,174 @@
+"""
+Playlist Import - Równoległy import i walidacja playlisty
+Bose Audio Multi-Tool
+
+Sprawdzenie istnienia, odczyt metadanych i skrót treści każdego pliku
+wykonywane są w puli wątków (operacje I/O, także na udziałach sieciowych).
+Wyniki trafiają do kolejki, którą wątek Tk opróżnia partiami przez after(),
+więc lista rośnie na bieżąco, a okno nie przestaje odpowiadać.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_metadata import get_audio_metadata
+
+IMPORT_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+POLL_MS = 50          # odpytywanie kolejki wyników z wątku Tk
+BATCH_SIZE = 200      # maks. liczba plików dodanych do UI w jednym kroku
+
+
+def probe_file(filepath):
+    """
+    Sprawdza plik do playlisty: {'path', 'info', 'hash'} albo None,
+    gdy pliku nie ma lub nie da się go odczytać
+    """
+    if not os.path.isfile(filepath):
+        return None
+    metadata = get_audio_metadata()
+    try:
+        return {
+            'path': filepath,
+            'info': metadata.get(filepath),
+            'hash': metadata.get_hash(filepath)
+        }
+    except OSError as e:
+        print(f"[PlaylistImport] Pominięto {os.path.basename(filepath)}: {e}")
+        return None
+
+
+class ImportJob:
+    """Import w toku - wyniki podawane do UI w kolejności wejściowej"""
+
+    def __init__(self, paths, window, on_batch, on_done=None):
+        self.paths = list(paths)
+        self.window = window
+        self.on_batch = on_batch
+        self.on_done = on_done
+
+        self.cancelled = False
+        self.added = 0
+        self.skipped = 0
+
+        self._results = queue.Queue()
+        self._ready = {}          # indeks → wynik, czeka na wcześniejsze pliki
+        self._next = 0            # następny indeks do przekazania do UI
+        self._job = None
+
+    def start(self, executor):
+        for index, path in enumerate(self.paths):
+            future = executor.submit(probe_file, path)
+            future.add_done_callback(lambda f, i=index: self._results.put((i, f)))
+        self._job = self.window.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        self.cancelled = True
+        if self._job is not None:
+            try:
+                self.window.after_cancel(self._job)
+            except Exception:
+                pass
+            self._job = None
+
+    @property
+    def done(self):
+        return self._next >= len(self.paths)
+
+    def _poll(self):
+        """Wątek Tk: przekazuje gotowe wyniki partiami i planuje kolejne sprawdzenie"""
+        self._job = None
+        if self.cancelled:
+            return
+
+        try:
+            while True:
+                index, future = self._results.get_nowait()
+                try:
+                    self._ready[index] = future.result()
+                except Exception as e:
+                    print(f"[PlaylistImport] Błąd odczytu {os.path.basename(self.paths[index])}: {e}")
+                    self._ready[index] = None
+        except queue.Empty:
+            pass
+
+        batch = []
+        while self._next in self._ready and len(batch) < BATCH_SIZE:
+            result = self._ready.pop(self._next)
+            self._next += 1
+            if result is None:
+                self.skipped += 1
+            else:
+                batch.append(result)
+
+        if batch:
+            self.added += len(batch)
+            self.on_batch(batch)
+
+        if self.done:
+            print(f"[PlaylistImport] Zakończono: {self.added} plików, pominięto {self.skipped}")
+            if self.on_done:
+                self.on_done(self)
+            return
+
+        try:
+            self._job = self.window.after(POLL_MS, self._poll)
+        except Exception:
+            # Okno zamknięte w trakcie importu
+            self.cancelled = True
+
+
+class PlaylistImporter:
+    """Pula wątków importu playlisty - singleton"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS,
+                                                    thread_name_prefix="playlist-import")
+            return self._executor
+
+    def import_files(self, paths, window, on_batch, on_done=None):
+        """
+        Importuje pliki asynchronicznie; on_batch(lista wyników probe_file) i on_done(job)
+        wywoływane są w wątku Tk. Zwraca ImportJob (można go anulować)
+        """
+        job = ImportJob(paths, window, on_batch, on_done)
+        job.start(self.executor)
+        return job
+
+    def existing_files(self, paths):
+        """Filtruje playlistę do istniejących plików - sprawdzenia równolegle, kolejność zachowana"""
+        paths = list(paths)
+        if len(paths) < 2:
+            return [p for p in paths if os.path.exists(p)]
+        return [p for p, ok in zip(paths, self.executor.map(os.path.exists, paths)) if ok]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def get_playlist_importer():
+    """Zwraca instancję PlaylistImporter (singleton)"""
+    return PlaylistImporter()
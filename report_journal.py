@@ -0,0 +1,309 @@
+"""
+Report Journal - Dzienniki wyników stacji i scalanie do bazy
+Bose Audio Multi-Tool
+
+Kilka stacji może pisać do jednego folderu test_reports. Każdy proces
+dopisuje wyniki wyłącznie do własnego dziennika
+(journal/STACJA_PID_start.jsonl, jeden wiersz JSON na wynik), więc na
+gorącej ścieżce nie ma żadnej wspólnej blokady ani przeplatania wierszy.
+
+Dzienniki scala do bazy JournalCompactor - naraz tylko jeden (plik
+compact.lock, w którym posiadacz co scalony dziennik zapisuje kolejny
+"puls"; blokadę bez nowego pulsu przez LOCK_STALE wg zegara obserwującej
+stacji uznaje się za porzuconą - bez porównywania zegarów stacji
+z czasem modyfikacji na serwerze plików). Porzucona blokada jest najpierw
+atomowo przenoszona pod unikalną nazwę, dopiero potem zakładana nowa.
+
+Scalany jest zawsze tylko ciąg pełnych linii, a pozycja w dzienniku
+zapisywana jest w tej samej transakcji co wiersze; upsert po test_id
+sprawia, że ponowne scalenie tych samych linii niczego nie dubluje.
+Dziennik usuwa wyłącznie proces, który go pisze (po zamknięciu) - obcy
+dziennik mógłby być wciąż otwarty przez bezczynną stację.
+"""
+
+import json
+import os
+import socket
+import time
+
+JOURNAL_DIR = "journal"
+JOURNAL_EXT = ".jsonl"
+LOCK_FILE = "compact.lock"
+LOCK_STALE = 60.0                 # [s] blokada bez nowego pulsu - po padniętym procesie
+COMPACT_INTERVAL = 5.0            # [s] scalanie po zapisie partii co najwyżej tak często
+
+
+class JournalCompactor:
+    """Scala dzienniki z folderu raportów do ReportStore"""
+
+    def __init__(self, report_dir, store):
+        self.journal_dir = os.path.join(report_dir, JOURNAL_DIR)
+        self.lock_path = os.path.join(report_dir, LOCK_FILE)
+        self.store = store
+
+        self.compactions = 0
+        self.rows_merged = 0
+        self.torn_lines = 0
+        self.lock_busy = 0
+
+        self._token = ""                  # odróżnia kolejne blokady tego samego procesu
+        self._beat = 0
+        self._seen_lock = (None, 0.0)     # (treść compact.lock, od kiedy bez zmian - monotonic)
+
+    # ─────────────────────────────────────────
+    # BLOKADA
+    # ─────────────────────────────────────────
+
+    def _acquire(self):
+        """Zakłada compact.lock; False gdy scala już inny proces"""
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                stale = self._stale_lock_text()
+                if stale is None or not self._break_lock(stale):
+                    return False
+                continue
+            self._token = os.urandom(4).hex()
+            self._beat = 0
+            with os.fdopen(fd, 'w') as f:
+                f.write(self._lock_text())
+            return True
+        return False
+
+    def _lock_text(self):
+        return f"{socket.gethostname()} {os.getpid()} {self._token} {self._beat}\n"
+
+    def _read_lock(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _stale_lock_text(self):
+        """
+        Treść blokady, której posiadacz przestał ją odświeżać (bez zmian przez
+        LOCK_STALE mierzone lokalnym zegarem monotonicznym), albo None
+        """
+        text = self._read_lock(self.lock_path)
+        if text is None:
+            return None
+
+        now = time.monotonic()
+        seen, since = self._seen_lock
+        if text != seen:
+            self._seen_lock = (text, now)
+            return None
+        if now - since < LOCK_STALE:
+            return None
+        self._seen_lock = (None, 0.0)
+        return text
+
+    def _break_lock(self, stale):
+        """
+        Przenosi porzuconą blokadę pod unikalną nazwę (os.replace - atomowo),
+        zamiast ją usuwać: dwie stacje nie skasują sobie nawzajem nowej blokady.
+        Gdy przeniesiona okazała się świeżą blokadą innej stacji - wraca na miejsce
+        """
+        broken = f"{self.lock_path}.{socket.gethostname()}_{os.getpid()}_{os.urandom(4).hex()}"
+        try:
+            os.replace(self.lock_path, broken)
+        except OSError:
+            return False
+
+        if self._read_lock(broken) != stale:
+            try:
+                if not os.path.exists(self.lock_path):
+                    os.replace(broken, self.lock_path)
+            except OSError:
+                pass
+            return False
+        try:
+            os.remove(broken)
+        except OSError:
+            pass
+        print("[JournalCompactor] Usunięto porzuconą blokadę")
+        return True
+
+    def _touch_lock(self):
+        """Puls - nowa treść compact.lock, widoczna dla pozostałych stacji"""
+        owner = self._lock_text()
+        self._beat += 1
+        try:
+            # r+ - blokady usuniętej w międzyczasie nie zakłada ponownie;
+            # blokady przejętej przez inną stację nie nadpisuje
+            with open(self.lock_path, 'r+', encoding='utf-8') as f:
+                if f.read() != owner:
+                    return
+                f.seek(0)
+                f.write(self._lock_text())
+                f.truncate()
+        except OSError:
+            pass
+
+    def _release(self):
+        try:
+            # Tylko własną blokadę - porzuconą mogła już przejąć inna stacja
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                if f.read() != self._lock_text():
+                    return
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+    # ─────────────────────────────────────────
+    # SCALANIE
+    # ─────────────────────────────────────────
+
+    def compact(self):
+        """
+        Scala nowe linie ze wszystkich dzienników
+        Zwraca liczbę scalonych wierszy albo None, gdy blokadę ma inny proces
+        """
+        if not os.path.isdir(self.journal_dir):
+            return 0
+        if not self._acquire():
+            self.lock_busy += 1
+            return None
+
+        merged = 0
+        try:
+            for name in sorted(os.listdir(self.journal_dir)):
+                if name.endswith(JOURNAL_EXT):
+                    merged += self._merge(name)
+                    self._touch_lock()
+        finally:
+            self._release()
+
+        self.compactions += 1
+        self.rows_merged += merged
+        return merged
+
+    def _merge(self, name):
+        path = os.path.join(self.journal_dir, name)
+        offset = self.store.journal_offset(name)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError as e:
+            print(f"[JournalCompactor] Nie można odczytać {name}: {e}")
+            return 0
+
+        # Tylko pełne linie - ostatnia może być właśnie dopisywana
+        end = data.rfind(b'\n') + 1
+        items = []
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+                items.append((record['t'], record['r']))
+            except (ValueError, KeyError, TypeError):
+                # Urwany zapis (błąd dysku) - zakończony przez ReportJournal._open()
+                self.torn_lines += 1
+                print(f"[JournalCompactor] {name}: pominięto uszkodzoną linię")
+
+        if end:
+            self.store.apply_journal(name, offset + end, items)
+        return len(items)
+
+    def remove_journal(self, path):
+        """Usuwa dziennik po zamknięciu, jeśli został w całości scalony"""
+        name = os.path.basename(path)
+        try:
+            if self.store.journal_offset(name) != os.path.getsize(path):
+                return False
+            os.remove(path)
+        except OSError:
+            return False
+        self.store.forget_journal(name)
+        return True
+
+    def get_status(self):
+        return {
+            'compactions': self.compactions,
+            'rows_merged': self.rows_merged,
+            'torn_lines': self.torn_lines,
+            'lock_busy': self.lock_busy
+        }
+
+
+class ReportJournal:
+    """
+    Dziennik tego procesu - odbiornik ReportWriter
+
+    Partia trafia do pliku jednym write(); co COMPACT_INTERVAL (i przy
+    zamknięciu) dzienniki scalane są do bazy, o ile blokady nie ma inny proces.
+    Wszystkie metody wołane są z wątku zapisu.
+    """
+
+    def __init__(self, report_dir, station, store, fsync=False, compact_interval=COMPACT_INTERVAL):
+        journal_dir = os.path.join(report_dir, JOURNAL_DIR)
+        os.makedirs(journal_dir, exist_ok=True)
+
+        self.path = os.path.join(
+            journal_dir, f"{station}_{os.getpid()}_{int(time.time() * 1000)}{JOURNAL_EXT}")
+        self.store = store
+        self.fsync = fsync
+        self.compact_interval = compact_interval
+        self.compactor = JournalCompactor(report_dir, store)
+
+        self._file = None
+        self._last_compact = 0.0
+
+    def _open(self):
+        f = open(self.path, 'ab')
+        # Po błędzie zapisu plik może kończyć się urwaną linią - zamknij ją,
+        # żeby ponowiona partia zaczęła się od nowej linii
+        if f.tell() > 0:
+            with open(self.path, 'rb') as r:
+                r.seek(-1, os.SEEK_END)
+                if r.read(1) != b'\n':
+                    f.write(b'\n')
+        return f
+
+    def write_batch(self, items):
+        """Dopisuje partię [(tabela, wiersz), ...] do dziennika"""
+        data = ''.join(json.dumps({'t': table, 'r': row}, ensure_ascii=False) + '\n'
+                       for table, row in items).encode('utf-8')
+        try:
+            if self._file is None:
+                self._file = self._open()
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except OSError:
+            self._close_file()
+            raise
+
+        if time.monotonic() - self._last_compact >= self.compact_interval:
+            self.compact()
+
+    def compact(self):
+        """Scala dzienniki do bazy (pomija, gdy scala inna stacja)"""
+        self._last_compact = time.monotonic()
+        try:
+            return self.compactor.compact()
+        except Exception as e:
+            print(f"[ReportJournal] Błąd scalania dzienników: {e}")
+            return None
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def close(self):
+        """Zamyka dziennik, scala go i usuwa, jeśli nic w nim nie zostało"""
+        self._close_file()
+        if os.path.exists(self.path):
+            for _ in range(3):
+                if self.compact() is not None:
+                    break
+                time.sleep(0.2)
+            self.compactor.remove_journal(self.path)
+        self.store.close()
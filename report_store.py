@@ -0,0 +1,362 @@
+"""
+Report Store - Historia testów w bazie SQLite
+Bose Audio Multi-Tool
+
+Wyniki trafiają do test_reports/test_history.db. Folder bywa udziałem
+sieciowym wspólnym dla kilku stacji, więc baza pracuje z dziennikiem
+wycofań (journal_mode=DELETE) - WAL wymaga pamięci współdzielonej na
+jednym hoście i nie działa przez sieciowy system plików.
+
+Indeksy po numerze seryjnym, operatorze, dacie i statusie sprawiają, że
+pytania typu "czy ten egzemplarz już przeszedł?" albo "yield operatora
+z dziś" nie wymagają skanowania całej historii. Zapytania SQL są stałymi
+tekstami, więc sqlite3 kompiluje je raz (cache instrukcji połączenia).
+CSV jest już tylko formatem eksportu; stare pliki CSV importowane są
+jednorazowo przez migrate_csv().
+
+test_id jest unikalny: ponowny zapis tego samego przebiegu aktualizuje
+rekord zamiast dopisywać nowy, a wynik ostateczny (PASS/FAIL) nie zostaje
+nadpisany późniejszym INTERRUPTED - analizy nie muszą usuwać duplikatów.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DB_FILE = "test_history.db"
+SCHEMA_VERSION = 2              # 2: unikalny test_id (PRAGMA user_version)
+
+FINAL_STATUSES = ('PASS', 'FAIL')
+
+# Tabele: (nagłówek CSV, kolumna, typ) - kolejność jak w wierszach TestReporter
+TEST_FIELDS = [
+    ('Test ID', 'test_id', 'TEXT'),
+    ('Test Type', 'test_type', 'TEXT'),
+    ('Device Serial', 'device_serial', 'TEXT'),
+    ('Operator HRID', 'operator_hrid', 'TEXT'),
+    ('Date', 'date', 'TEXT'),
+    ('Time', 'time', 'TEXT'),
+    ('Duration (s)', 'duration', 'NUMERIC'),
+    ('Audio File', 'audio_file', 'TEXT'),
+    ('Status', 'status', 'TEXT'),
+    ('Steps Completed', 'steps_completed', 'NUMERIC'),
+    ('Total Steps', 'total_steps', 'NUMERIC'),
+    ('Volumes Tested', 'volumes_tested', 'TEXT'),
+    ('Interrupted', 'interrupted', 'TEXT'),
+    ('Notes', 'notes', 'TEXT')
+]
+
+COMBO_FIELDS = [
+    ('Test ID', 'test_id', 'TEXT'),
+    ('Test Type', 'test_type', 'TEXT'),
+    ('Device Serial', 'device_serial', 'TEXT'),
+    ('Operator HRID', 'operator_hrid', 'TEXT'),
+    ('Date', 'date', 'TEXT'),
+    ('Time', 'time', 'TEXT'),
+    ('TEST1_Status', 'test1_status', 'TEXT'),
+    ('TEST1_Duration', 'test1_duration', 'NUMERIC'),
+    ('TEST1_Audio_File', 'test1_audio_file', 'TEXT'),
+    ('TEST1_Volumes', 'test1_volumes', 'TEXT'),
+    ('TEST2_Status', 'test2_status', 'TEXT'),
+    ('TEST2_Duration', 'test2_duration', 'NUMERIC'),
+    ('TEST2_WaveType', 'test2_wave_type', 'TEXT'),
+    ('TEST2_FreqRange', 'test2_freq_range', 'TEXT'),
+    ('TEST3_Status', 'test3_status', 'TEXT'),
+    ('TEST3_Duration', 'test3_duration', 'NUMERIC'),
+    ('TEST3_Channels', 'test3_channels', 'TEXT'),
+    ('Overall_Status', 'status', 'TEXT'),
+    ('Total_Duration', 'total_duration', 'NUMERIC'),
+    ('Interrupted', 'interrupted', 'TEXT'),
+    ('Notes', 'notes', 'TEXT')
+]
+
+TABLES = {
+    'tests': TEST_FIELDS,
+    'combo_tests': COMBO_FIELDS
+}
+
+
+def _columns(table):
+    return [column for _, column, _ in TABLES[table]]
+
+
+def _insert_sql(table):
+    """
+    Upsert po test_id - ponowny zapis przebiegu zastępuje rekord,
+    chyba że rekord jest ostateczny, a nowy zapis nie
+    """
+    columns = _columns(table)
+    updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column != 'test_id')
+    final = ', '.join(f"'{status}'" for status in FINAL_STATUSES)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (test_id) DO UPDATE SET {updates} "
+            f"WHERE {table}.status NOT IN ({final}) OR excluded.status IN ({final})")
+
+
+def _create_sql(table):
+    columns = ',\n    '.join(f"{column} {kind}" for _, column, kind in TABLES[table])
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    id INTEGER PRIMARY KEY,\n    {columns}\n)"
+
+
+def _indexes(table):
+    """{nazwa indeksu: kolumny} - indeksy pomocnicze (bez unikalnego test_id)"""
+    return {
+        f"idx_{table}_serial": "device_serial, status, date",
+        f"idx_{table}_operator": "operator_hrid, date",
+        f"idx_{table}_date": "date",
+        f"idx_{table}_status": "status, date"
+    }
+
+
+def _create_indexes(conn, table):
+    for name, columns in _indexes(table).items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def _upgrade_unique_test_id(conn, table):
+    """
+    Schemat 1 → 2: zostawia jeden rekord na przebieg (test_id, serial, operator;
+    ostateczny, a z nich najnowszy). Różne egzemplarze z tym samym dawnym ID
+    zostają, z ID uzupełnionym o numer rekordu; potem unikalny indeks
+    """
+    final = ', '.join(f"'{status}'" for status in FINAL_STATUSES)
+    removed = conn.execute(
+        f"DELETE FROM {table} WHERE id NOT IN ("
+        f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        f"PARTITION BY test_id, device_serial, operator_hrid "
+        f"ORDER BY status IN ({final}) DESC, id DESC) AS n "
+        f"FROM {table}) WHERE n = 1)").rowcount
+    renamed = conn.execute(
+        f"UPDATE {table} SET test_id = test_id || '_R' || id WHERE id IN ("
+        f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY test_id ORDER BY id) AS n "
+        f"FROM {table}) WHERE n > 1)").rowcount
+    conn.execute(f"DROP INDEX IF EXISTS idx_{table}_test_id")
+    if removed or renamed:
+        print(f"[ReportStore] {table}: usunięto {removed} zdublowanych zapisów przebiegów, "
+              f"zmieniono {renamed} powtórzonych test_id")
+
+
+class ReportStore:
+    """
+    Baza wyników testów - odbiornik dla ReportWriter
+
+    Zapis (write_batch, apply_journal, migrate_csv) idzie jednym połączeniem
+    z wątku zapisu, odczyty - osobnym połączeniem na wątek wywołujący.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._insert = {table: _insert_sql(table) for table in TABLES}
+
+        self._conn = None                 # połączenie wątku zapisu
+        self._local = threading.local()   # połączenia do odczytu
+
+        conn = self._connect()
+        with conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for table in TABLES:
+                conn.execute(_create_sql(table))
+                if version < 2:
+                    _upgrade_unique_test_id(conn, table)
+                conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_test_id ON {table} (test_id)")
+                _create_indexes(conn, table)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("CREATE TABLE IF NOT EXISTS migrations ("
+                         "source TEXT PRIMARY KEY, rows INTEGER, migrated_at TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS journal_offsets ("
+                         "journal TEXT PRIMARY KEY, offset INTEGER)")
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        # Dziennik wycofań zamiast WAL - baza na udziale sieciowym kilku stacji;
+        # przełącza też bazę utworzoną wcześniej w trybie WAL
+        conn.execute("PRAGMA journal_mode=DELETE")
+        # FULL: fsync także katalogu dziennika przy każdym commicie; NORMAL - rzadziej
+        conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    # ─────────────────────────────────────────
+    # ZAPIS (wątek ReportWriter)
+    # ─────────────────────────────────────────
+
+    def write_batch(self, items):
+        """Zapisuje partię [(tabela, wiersz), ...] w jednej transakcji"""
+        by_table = {}
+        for table, row in items:
+            by_table.setdefault(table, []).append(row)
+
+        conn = self._writer_conn()
+        with conn:
+            for table, rows in by_table.items():
+                conn.executemany(self._insert[table], rows)
+
+    def _writer_conn(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def journal_offset(self, journal):
+        """Pozycja w dzienniku (bajty), do której wiersze są już w bazie"""
+        row = self._writer_conn().execute(
+            "SELECT offset FROM journal_offsets WHERE journal = ?", (journal,)).fetchone()
+        return row[0] if row else 0
+
+    def apply_journal(self, journal, offset, items):
+        """Wiersze z dziennika i nowa pozycja w nim - w jednej transakcji"""
+        by_table = {}
+        for table, row in items:
+            by_table.setdefault(table, []).append(row)
+
+        conn = self._writer_conn()
+        with conn:
+            for table, rows in by_table.items():
+                conn.executemany(self._insert[table], rows)
+            conn.execute("INSERT INTO journal_offsets VALUES (?, ?) "
+                         "ON CONFLICT (journal) DO UPDATE SET offset = excluded.offset",
+                         (journal, offset))
+
+    def forget_journal(self, journal):
+        with self._writer_conn() as conn:
+            conn.execute("DELETE FROM journal_offsets WHERE journal = ?", (journal,))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+            self._conn = None
+
+    def migrate_csv(self, csv_path, table):
+        """
+        Jednorazowy import historii CSV do tabeli (strumieniowo, jedna transakcja)
+        Zwraca liczbę zaimportowanych wierszy; plik już przeniesiony jest pomijany
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        self._writer_conn()
+
+        source = f"{table}:{os.path.basename(csv_path)}"
+        if self._conn.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+            return 0
+
+        columns = _columns(table)
+        width = len(columns)
+        serial_col, operator_col = columns.index('device_serial'), columns.index('operator_hrid')
+        lookup = f"SELECT device_serial, operator_hrid FROM {table} WHERE test_id = ?"
+        imported = 0
+        renamed = 0
+
+        def rows(reader):
+            nonlocal imported, renamed
+            next(reader, None)  # nagłówek
+            for row in reader:
+                if not row:
+                    continue
+                imported += 1
+                row = (row + [''] * width)[:width]
+                # Dawne ID (sekundowe) powtarzały się między stanowiskami: scalany jest
+                # tylko ten sam przebieg (serial i operator), inny egzemplarz dostaje
+                # ID z numerem linii CSV zamiast nadpisać cudzy rekord
+                existing = self._conn.execute(lookup, (row[0],)).fetchone()
+                if existing is not None and existing != (row[serial_col], row[operator_col]):
+                    row[0] = f"{row[0]}_L{reader.line_num}"
+                    renamed += 1
+                yield row
+
+        # Indeksy pomocnicze budowane od nowa po imporcie - kilka razy szybciej niż
+        # aktualizowanie ich wiersz po wierszu (wszystko w jednej transakcji).
+        # Zapis tego samego przebiegu kilka razy scala upsert (jak przy zapisie)
+        with open(csv_path, 'r', newline='', encoding='utf-8-sig') as f, self._conn:
+            for name in _indexes(table):
+                self._conn.execute(f"DROP INDEX IF EXISTS {name}")
+            self._conn.executemany(self._insert[table], rows(csv.reader(f)))
+            _create_indexes(self._conn, table)
+            self._conn.execute(f"ANALYZE {table}")
+            self._conn.execute("INSERT INTO migrations VALUES (?, ?, ?)",
+                               (source, imported, datetime.now().isoformat(timespec='seconds')))
+
+        print(f"[ReportStore] Zaimportowano {imported} wierszy z {os.path.basename(csv_path)}"
+              + (f" ({renamed} ze zmienionym, powtórzonym test_id)" if renamed else ""))
+        return imported
+
+    # ─────────────────────────────────────────
+    # ODCZYT
+    # ─────────────────────────────────────────
+
+    def _where(self, serial=None, operator=None, date_from=None, date_to=None, status=None):
+        clauses, params = [], []
+        for clause, value in (("device_serial = ?", serial), ("operator_hrid = ?", operator),
+                              ("date >= ?", date_from), ("date <= ?", date_to),
+                              ("status = ?", status)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def find(self, table='tests', limit=1000, **filters):
+        """
+        Wyniki pasujące do filtrów (serial, operator, date_from, date_to, status),
+        od najnowszych - lista słowników kolumna → wartość
+        """
+        where, params = self._where(**filters)
+        cursor = self._reader().execute(
+            f"SELECT * FROM {table}{where} ORDER BY date DESC, time DESC, id DESC LIMIT ?",
+            params + [limit])
+        return [dict(row) for row in cursor]
+
+    def has_passed(self, serial):
+        """Czy egzemplarz ma już wynik PASS (testy pojedyncze lub COMBO)"""
+        conn = self._reader()
+        for table in TABLES:
+            if conn.execute(f"SELECT 1 FROM {table} WHERE device_serial = ? AND status = 'PASS' "
+                            f"LIMIT 1", (serial,)).fetchone():
+                return True
+        return False
+
+    def yield_stats(self, table='tests', **filters):
+        """Liczba wyników wg statusu i yield (PASS / wszystkie) dla filtrów"""
+        where, params = self._where(**filters)
+        counts = dict(self._reader().execute(
+            f"SELECT status, COUNT(*) FROM {table}{where} GROUP BY status", params).fetchall())
+        total = sum(counts.values())
+        return {
+            'total': total,
+            'by_status': counts,
+            'yield': counts.get('PASS', 0) / total if total else None
+        }
+
+    def get_status(self, test_id, table='tests'):
+        """Status zapisanego przebiegu albo None"""
+        row = self._reader().execute(f"SELECT status FROM {table} WHERE test_id = ?",
+                                     (test_id,)).fetchone()
+        return row[0] if row else None
+
+    def count(self, table='tests'):
+        return self._reader().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def export_csv(self, path, table='tests', **filters):
+        """Eksport wyników do CSV (nagłówki jak w dawnej historii); zwraca liczbę wierszy"""
+        where, params = self._where(**filters)
+        columns = _columns(table)
+        cursor = self._reader().execute(
+            f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY id", params)
+
+        exported = 0
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow([header for header, _, _ in TABLES[table]])
+            for row in cursor:
+                writer.writerow(row)
+                exported += 1
+        return exported
@@ -0,0 +1,157 @@
+"""
+Report Writer - Zapis raportów w wątku tła
+Bose Audio Multi-Tool
+
+Wiersze trafiają do ograniczonej kolejki i zapisywane są partiami przez
+jeden wątek do odbiornika (np. ReportJournal). Partia zapisywana jest, gdy
+uzbiera się batch_size wierszy albo minie flush_interval od pierwszego
+oczekującego - wątek Tk nigdy nie czeka na dysk.
+
+Odbiornik udostępnia write_batch([(klucz, wiersz), ...]) i close();
+obie metody wołane są wyłącznie z wątku zapisu.
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+REPORT_QUEUE_SIZE = 1000      # maks. liczba oczekujących wierszy (dalej put() czeka)
+REPORT_BATCH_SIZE = 50
+REPORT_FLUSH_INTERVAL = 0.5   # [s]
+RETRY_INTERVAL = 5.0          # [s] ponowienie po błędzie zapisu (np. brak udziału sieciowego)
+
+
+class ReportWriter:
+    """Wątek zapisujący wiersze partiami do odbiornika"""
+
+    def __init__(self, sink, batch_size=REPORT_BATCH_SIZE, flush_interval=REPORT_FLUSH_INTERVAL,
+                 queue_size=REPORT_QUEUE_SIZE):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.errors = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = []          # (klucz, wiersz) czekające na zapis
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ─────────────────────────────────────────
+    # API
+    # ─────────────────────────────────────────
+
+    def write(self, key, row, check=None):
+        """
+        Dodaje wiersz do zapisu - wraca od razu (czeka tylko przy pełnej kolejce)
+        check() - opcjonalny warunek sprawdzany w wątku zapisu; False pomija wiersz
+        """
+        if self._closed:
+            raise RuntimeError("ReportWriter zamknięty")
+        self._queue.put(('row', (key, check), row))
+
+    def call(self, func):
+        """Wykonuje func() w wątku zapisu, po wierszach dodanych wcześniej"""
+        if self._closed:
+            raise RuntimeError("ReportWriter zamknięty")
+        self._queue.put(('call', func, None))
+
+    def flush(self, timeout=10.0):
+        """Zapisuje wszystkie oczekujące wiersze i czeka na koniec zapisu"""
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(('flush', done, None))
+        done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Opróżnia kolejkę, zapisuje resztę i zamyka odbiornik"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(('stop', None, None))
+        self._thread.join(timeout)
+
+    def get_status(self):
+        return {
+            'queued': self._queue.qsize(),
+            'pending': len(self._pending),
+            'rows_written': self.rows_written,
+            'batches_written': self.batches_written,
+            'errors': self.errors
+        }
+
+    # ─────────────────────────────────────────
+    # WĄTEK
+    # ─────────────────────────────────────────
+
+    def _run(self):
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                kind, a, b = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind = 'timeout'
+
+            if kind == 'row':
+                key, check = a
+                if check is not None and not self._check(check):
+                    continue
+                self._pending.append((key, b))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(self._pending) < self.batch_size:
+                    continue
+            elif kind == 'call':
+                self._write_pending()
+                try:
+                    a()
+                except Exception as e:
+                    print(f"[ReportWriter] Błąd zadania w wątku zapisu: {e}")
+            elif kind == 'flush':
+                self._write_pending()
+                a.set()
+                deadline = None if not self._pending else time.monotonic() + RETRY_INTERVAL
+                continue
+            elif kind == 'stop':
+                self._write_pending()
+                try:
+                    self.sink.close()
+                except Exception as e:
+                    print(f"[ReportWriter] Błąd zamykania odbiornika: {e}")
+                return
+
+            self._write_pending()
+            deadline = None if not self._pending else time.monotonic() + RETRY_INTERVAL
+
+    def _check(self, check):
+        """Warunek zapisu wiersza; przy błędzie wiersz jest zapisywany jak bez warunku"""
+        try:
+            return check()
+        except Exception as e:
+            print(f"[ReportWriter] Błąd sprawdzania wiersza: {e}")
+            return True
+
+    def _write_pending(self):
+        """Zapisuje partię; przy błędzie wiersze zostają do ponowienia"""
+        if not self._pending:
+            return
+
+        try:
+            self.sink.write_batch(self._pending)
+        except Exception as e:
+            self.errors += 1
+            print(f"[ReportWriter] Błąd zapisu raportu (ponowienie za {RETRY_INTERVAL:.0f}s): {e}")
+            return
+
+        self.rows_written += len(self._pending)
+        self.batches_written += 1
+        self._pending = []
@@ -5,6 +5,23 @@ Singleton pattern - jedna instancja dla całej aplikacji
 
 import pygame
 import gc
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from asset_pack import get_asset_pack
+from signals import generate_loop, mixer_sample_rate, render_log_sweep
+
+# Budżet pamięci cache gotowych dźwięków (LRU, liczony w bajtach PCM)
+SOUND_CACHE_BUDGET = 64 * 1024 * 1024
+
+# Procesy robocze analiz audio (audio_analysis)
+ANALYSIS_WORKERS = 1
+
+# Kanały miksera zarezerwowane (Sound.play() ich nie przejmie)
+STREAM_CHANNEL = 0      # strumień tonu (ToneStream)
+TRACK_CHANNEL = 1       # utwór muzyczny (TrackPlayer)
+RESERVED_CHANNELS = 2
 
 class ResourceManager:
     """Menedżer zasobów - singleton"""
@@ -24,8 +41,18 @@ class ResourceManager:
         self._initialized = True
         self.pygame_initialized = False
         self.open_windows = []
-        self.cached_files = {}
+        self.cached_files = OrderedDict()  # klucz → (pygame.Sound, bajty), od najdawniej użytego
         self.active_sounds = []
+        self.active_streams = []           # uruchomione ToneStream - zatrzymywane w stop_all_sounds
+
+        self.cache_budget = SOUND_CACHE_BUDGET
+        self.cache_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_lock = threading.Lock()
+
+        self._analysis_pool = None
+        self._pool_lock = threading.Lock()
 
         print("[ResourceManager] Inicjalizacja menedżera zasobów")
 
@@ -42,6 +69,11 @@ class ResourceManager:
                 return False
         return True
 
+    def reserved_channel(self, channel_id):
+        """Zwraca zarezerwowany kanał miksera (STREAM_CHANNEL / TRACK_CHANNEL)"""
+        pygame.mixer.set_reserved(RESERVED_CHANNELS)
+        return pygame.mixer.Channel(channel_id)
+
     def register_window(self, window, name):
         """Rejestruje otwarte okno"""
         self.open_windows.append({'window': window, 'name': name})
@@ -52,14 +84,162 @@ class ResourceManager:
         self.open_windows = [w for w in self.open_windows if w['window'] != window]
         print(f"[ResourceManager] Wyrejestrowano okno")
 
+    def register_stream(self, stream):
+        """Rejestruje uruchomiony strumień tonu"""
+        if stream not in self.active_streams:
+            self.active_streams.append(stream)
+
+    def unregister_stream(self, stream):
+        self.active_streams = [s for s in self.active_streams if s is not stream]
+
     def stop_all_sounds(self):
-        """Zatrzymuje wszystkie dźwięki"""
+        """Zatrzymuje wszystkie dźwięki (także strumienie tonu)"""
+        for stream in self.active_streams[:]:
+            try:
+                stream.stop()
+            except Exception as e:
+                print(f"[ResourceManager] Błąd zatrzymywania strumienia: {e}")
         try:
             pygame.mixer.stop()
             print("[ResourceManager] Zatrzymano wszystkie dźwięki")
         except Exception as e:
             print(f"[ResourceManager] Błąd zatrzymywania dźwięków: {e}")
 
+    # ─────────────────────────────────────────
+    # CACHE DŹWIĘKÓW (LRU)
+    # ─────────────────────────────────────────
+
+    def get_cached_sound(self, key, render):
+        """
+        Zwraca pygame.Sound z cache, z paczki na dysku albo z tablicy int16 z render()
+        Synteza odbywa się poza blokadą - równoległe wątki nie czekają na siebie
+        """
+        with self._cache_lock:
+            entry = self.cached_files.get(key)
+            if entry is not None:
+                self.cached_files.move_to_end(key)
+                self.cache_hits += 1
+                return entry[0]
+            self.cache_misses += 1
+
+        sound, size = get_asset_pack().load_sound(key)
+        if sound is None:
+            data = render()
+            sound = pygame.sndarray.make_sound(data)
+            size = data.nbytes
+
+        with self._cache_lock:
+            if key not in self.cached_files and size <= self.cache_budget:
+                self.cached_files[key] = (sound, size)
+                self.cache_bytes += size
+                self._evict_sounds()
+
+        return sound
+
+    def get_loop_sound(self, frequency, wave_type="sine", channel="both"):
+        """Zwraca ton do odtwarzania w pętli (bufor z całkowitą liczbą okresów, pełna skala) z cache"""
+        return self.get_cached_sound(*self._loop_entry(frequency, wave_type, channel))
+
+    def get_sweep_sound(self, freq_min, freq_max, duration, wave_type="sine"):
+        """Zwraca cały przejazd log góra/dół (pełna skala) z cache - kolejne jednostki bez syntezy"""
+        return self.get_cached_sound(*self._sweep_entry(freq_min, freq_max, duration, wave_type))
+
+    def _loop_entry(self, frequency, wave_type, channel):
+        """(klucz, render) tonu w pętli - wspólne dla cache i paczki na dysku"""
+        sample_rate = mixer_sample_rate()
+        key = ('loop', wave_type, frequency, channel, sample_rate)
+        return key, lambda: generate_loop(frequency, 100, wave_type, channel, sample_rate)
+
+    def _sweep_entry(self, freq_min, freq_max, duration, wave_type):
+        """(klucz, render) przejazdu - wspólne dla cache i paczki na dysku"""
+        sample_rate = mixer_sample_rate()
+        key = ('sweep', wave_type, freq_min, freq_max, duration, sample_rate)
+        return key, lambda: render_log_sweep(freq_min, freq_max, duration, 100, wave_type, sample_rate)
+
+    def play_sound(self, sound, volume=100, loops=0):
+        """
+        Odtwarza dźwięk z głośnością kanału (0-100%) ustawioną przed startem
+        Sound.play() resetuje głośność kanału, Channel.play() ją zachowuje
+        """
+        channel = pygame.mixer.find_channel(True)
+        channel.set_volume(volume / 100.0)
+        channel.play(sound, loops=loops)
+        return channel
+
+    # ─────────────────────────────────────────
+    # PACZKA SYGNAŁÓW NA DYSKU
+    # ─────────────────────────────────────────
+
+    def precompiled_entries(self):
+        """Sygnały TEST 2/3 z bieżącego configu: {nazwa: (klucz, render)}"""
+        from config_manager import get_config_manager
+        config_mgr = get_config_manager()
+
+        entries = {
+            'test2_sweep': self._sweep_entry(
+                config_mgr.get('test2_auto.freq_min', 20),
+                config_mgr.get('test2_auto.freq_max', 20000),
+                config_mgr.get('test2_auto.duration', 11),
+                config_mgr.get('test2_auto.wave_type', 'sine')
+            )
+        }
+        # TEST 3 gra stały trójkąt 300 Hz niezależnie od test3_auto.frequency
+        for channel in ('left', 'right', 'both'):
+            entries[f'test3_{channel}'] = self._loop_entry(300, "triangle", channel)
+        return entries
+
+    def load_asset_pack(self):
+        """Mapuje paczkę sygnałów i w tle uzupełnia brakujące wpisy"""
+        get_asset_pack().load()
+        self.rebuild_asset_pack()
+
+    def rebuild_asset_pack(self):
+        """
+        Przebudowuje w tle wpisy paczki, których config się zmienił
+        Wywoływane po zapisie konfiguracji TEST 2/3 w trybie inżynieryjnym
+        """
+        entries = self.precompiled_entries()
+
+        def build():
+            try:
+                get_asset_pack().update(entries)
+            except Exception as e:
+                print(f"[ResourceManager] Błąd przebudowy paczki sygnałów: {e}")
+
+        threading.Thread(target=build, daemon=True).start()
+
+    # ─────────────────────────────────────────
+    # PROCESY ROBOCZE ANALIZ
+    # ─────────────────────────────────────────
+
+    @property
+    def analysis_pool(self):
+        """Pula procesów analiz audio - tworzona przy pierwszym użyciu, zamykana w shutdown()"""
+        with self._pool_lock:
+            if self._analysis_pool is None:
+                self._analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+                print(f"[ResourceManager] Uruchomiono pulę analiz ({ANALYSIS_WORKERS} proc.)")
+            return self._analysis_pool
+
+    def _shutdown_analysis_pool(self):
+        with self._pool_lock:
+            if self._analysis_pool is not None:
+                self._analysis_pool.shutdown(wait=False, cancel_futures=True)
+                self._analysis_pool = None
+
+    def _evict_sounds(self):
+        """Usuwa najdawniej użyte dźwięki aż cache zmieści się w budżecie (wywoływać pod blokadą)"""
+        while self.cache_bytes > self.cache_budget and self.cached_files:
+            _, (_, size) = self.cached_files.popitem(last=False)
+            self.cache_bytes -= size
+
+    def clear_sound_cache(self):
+        """Czyści cache dźwięków"""
+        with self._cache_lock:
+            self.cached_files.clear()
+            self.cache_bytes = 0
+        print("[ResourceManager] Wyczyszczono cache dźwięków")
+
     def force_garbage_collection(self):
         """Wymusza garbage collection"""
         collected = gc.collect()
@@ -72,7 +252,11 @@ class ResourceManager:
             'pygame_initialized': self.pygame_initialized,
             'open_windows': len(self.open_windows),
             'cached_files': len(self.cached_files),
-            'active_sounds': len(self.active_sounds)
+            'cache_bytes': self.cache_bytes,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'active_sounds': len(self.active_sounds),
+            'active_streams': len(self.active_streams)
         }
 
     def shutdown(self):
@@ -80,6 +264,18 @@ class ResourceManager:
         print("[ResourceManager] Zamykanie zasobów...")
 
         self.stop_all_sounds()
+        self.clear_sound_cache()
+
+        # Import playlisty, procesy analiz i odłożony zapis metadanych
+        from audio_metadata import get_audio_metadata
+        from playlist_import import get_playlist_importer
+        from test_reporter import shutdown_test_reporter
+        get_playlist_importer().shutdown()
+        self._shutdown_analysis_pool()
+        get_audio_metadata().flush()
+
+        # Raporty czekające w kolejce zapisu - przed zamknięciem okien i pygame
+        shutdown_test_reporter()
 
         # Zamknij wszystkie okna
         for win_info in self.open_windows[:]:
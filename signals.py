@@ -0,0 +1,360 @@
+"""
+Signals - Synteza sygnałów testowych
+Bose Audio Multi-Tool
+
+Jeden wektorowy silnik dla wszystkich testów:
+faza (cykle) → kształt fali float32 (operacje w miejscu, out=) → int16 stereo w jednym przejściu
+"""
+
+import threading
+
+import numpy as np
+import pygame
+
+DEFAULT_SAMPLE_RATE = 44100
+INT16_MAX = 32767
+
+WAVE_TYPES = ("sine", "square", "sawtooth", "triangle")
+CHANNEL_LAYOUTS = ("left", "right", "both")
+
+# Bufory pętli: najkrótszy bufor z całkowitą liczbą okresów
+LOOP_MIN_SAMPLES = 2048          # nie krócej niż kilka bloków miksera (buffer=512)
+LOOP_FREQ_TOLERANCE = 0.001      # dopuszczalny względny błąd częstotliwości (0.1%)
+
+# Przejazd renderowany blokami po 1s, żeby nie trzymać całej fazy w float64
+SWEEP_BLOCK_SAMPLES = 44100
+
+
+# Instrumentacja: liczba syntez per źródło ('tone', 'loop', 'sweep', 'stream')
+_synthesis_counts = {}
+_synthesis_lock = threading.Lock()
+
+
+def count_synthesis(source):
+    """Rejestruje jedną syntezę bufora audio"""
+    with _synthesis_lock:
+        _synthesis_counts[source] = _synthesis_counts.get(source, 0) + 1
+
+
+def get_synthesis_count(*sources):
+    """Liczba syntez dla podanych źródeł (bez argumentów - wszystkich)"""
+    with _synthesis_lock:
+        if not sources:
+            return sum(_synthesis_counts.values())
+        return sum(_synthesis_counts.get(source, 0) for source in sources)
+
+
+def mixer_sample_rate():
+    """Zwraca częstotliwość próbkowania aktywnego miksera pygame"""
+    init = pygame.mixer.get_init()
+    if init:
+        return init[0]
+    return DEFAULT_SAMPLE_RATE
+
+
+# ─────────────────────────────────────────
+# FAZA
+# ─────────────────────────────────────────
+
+def tone_phase(frequency, n_samples, sample_rate, phase0=0.0, out=None):
+    """
+    Faza tonu stałej częstotliwości zredukowana do [0, 1) w buforze float32
+    Akumulacja w float64 (dokładność przy wysokich f), wynik rzutowany przy redukcji
+    """
+    phase = np.arange(n_samples, dtype=np.float64)
+    phase *= frequency / sample_rate
+    if phase0:
+        phase += phase0
+    return wrap_phase(phase, out)
+
+
+def wrap_phase(phase, out=None):
+    """
+    Część ułamkowa fazy float64 zapisana do float32 (x - floor(x), bez np.mod)
+    phase jest nadpisywana - odejmowanie w miejscu na float64 jest ponad dwa razy
+    szybsze od mieszanego float64 - float32 → float32
+    Część całkowita mieści się w float32 dokładnie do 2**24 cykli - z zapasem dla testów
+    """
+    if out is None:
+        out = np.empty(phase.shape, dtype=np.float32)
+    np.floor(phase, out=out, casting='same_kind')
+    np.subtract(phase, out, out=phase)
+    np.copyto(out, phase, casting='same_kind')
+    return out
+
+
+def sweep_frequency(elapsed, freq_min, freq_max, duration):
+    """
+    Zwraca częstotliwość przejazdu po czasie elapsed (sekundy)
+    Pierwsza połowa: freq_min → freq_max, druga połowa: freq_max → freq_min (skala log)
+    """
+    progress = min(max(elapsed / duration, 0.0), 1.0)
+    log_min = np.log10(freq_min)
+    log_max = np.log10(freq_max)
+
+    if progress <= 0.5:
+        sweep_progress = progress * 2
+        return 10 ** (log_min + sweep_progress * (log_max - log_min))
+    sweep_progress = (progress - 0.5) * 2
+    return 10 ** (log_max - sweep_progress * (log_max - log_min))
+
+
+def sweep_phase(t, freq_min, freq_max, duration):
+    """
+    Faza przejazdu (w cyklach) w chwilach t - całka z sweep_frequency
+    Ciągła w punkcie zwrotnym, więc cały przejazd nie ma ani jednego kliknięcia
+    """
+    half = duration / 2.0
+    log_ratio = np.log(freq_max / freq_min)
+    t = np.asarray(t, dtype=np.float64)
+    rising = t <= half
+    u = np.where(rising, t, t - half)
+
+    if log_ratio == 0:
+        return freq_min * t
+
+    scale = half / log_ratio
+    up = freq_min * scale * np.expm1(log_ratio * u / half)
+    up_end = freq_min * scale * (freq_max / freq_min - 1.0)
+    down = up_end - freq_max * scale * np.expm1(-log_ratio * u / half)
+    return np.where(rising, up, down)
+
+
+def loop_buffer_length(frequency, sample_rate, tolerance=LOOP_FREQ_TOLERANCE,
+                       min_samples=LOOP_MIN_SAMPLES, max_samples=None):
+    """
+    Najkrótszy bufor (n próbek, k okresów) do odtwarzania w pętli bez kliknięcia
+    Zwraca (n, k, f_eff) - renderując z f_eff = k * sr / n koniec bufora styka się z początkiem
+    """
+    if max_samples is None:
+        max_samples = sample_rate
+    min_samples = min(min_samples, max_samples)
+
+    n = np.arange(min_samples, max_samples + 1, dtype=np.float64)
+    cycles = n * (frequency / sample_rate)
+    k = np.maximum(np.rint(cycles), 1.0)
+    error = np.abs(k / cycles - 1.0)
+
+    within = np.flatnonzero(error <= tolerance)
+    best = within[0] if within.size else int(np.argmin(error))
+    n_best = int(n[best])
+    k_best = int(k[best])
+    return n_best, k_best, k_best * sample_rate / n_best
+
+
+# ─────────────────────────────────────────
+# KSZTAŁT FALI
+# ─────────────────────────────────────────
+
+def render_wave(phase, wave_type, out=None, dt=None):
+    """
+    Kształt fali z fazy w [0, 1) - float32, bez tymczasowych tablic float
+    Można podać out=phase, wtedy faza jest nadpisywana falą
+    dt (przyrost fazy na próbkę, skalar lub tablica) włącza wersję pasmowo ograniczoną
+    """
+    if out is None:
+        out = np.empty(phase.shape, dtype=np.float32)
+
+    second_half = None
+    corrections = ()
+    if wave_type in ("square", "sawtooth") or (dt is not None and wave_type == "triangle"):
+        second_half = np.greater_equal(phase, 0.5)
+    if dt is not None and second_half is not None:
+        # Korekta liczona z fazy, zanim faza zostanie nadpisana falą
+        corrections = _band_limit_correction(phase, second_half, wave_type, dt)
+
+    if wave_type == "square":
+        # sign(sin(2πx)) = +1 dla x < 0.5, -1 dla x >= 0.5
+        np.multiply(second_half, np.float32(-2.0), out=out)
+        np.add(out, 1.0, out=out)
+    elif wave_type == "sawtooth":
+        # 2 * (x - floor(x + 0.5)) = 2x dla x < 0.5, 2(x - 1) dla x >= 0.5
+        # Odjęcie maski zamiast where= - maska zmienia się co kilka próbek,
+        # a where= rozgałęzia się na każdej z nich
+        np.subtract(phase, second_half, out=out)
+        np.multiply(out, 2.0, out=out)
+    elif wave_type == "triangle":
+        # 2 * |piła| - 1 = 1 - 2 * |2x - 1| = 1 - 4 * |x - 0.5|
+        np.subtract(phase, 0.5, out=out)
+        np.abs(out, out=out)
+        np.multiply(out, -4.0, out=out)
+        np.add(out, 1.0, out=out)
+    else:
+        np.multiply(phase, 2 * np.pi, out=out)
+        np.sin(out, out=out)
+
+    for samples, correction in corrections:
+        # add.at zamiast out[samples] += - bez kopii wybranych próbek; przy dwóch
+        # krawędziach na sąsiednich próbkach (powyżej sr/4) obie korekty się sumują
+        np.add.at(out, samples, correction)
+
+    return out
+
+
+# ─────────────────────────────────────────
+# OGRANICZENIE PASMA (PolyBLEP / PolyBLAMP)
+# ─────────────────────────────────────────
+#
+# Naiwne fale mają skoki (kwadrat, piła) lub załamania (trójkąt), których
+# harmoniczne powyżej Nyquista odbijają się w paśmie jako aliasy. PolyBLEP
+# wygładza każdy skok wielomianem na dwóch sąsiednich próbkach, PolyBLAMP
+# (całka PolyBLEP) robi to samo dla załamań. Okno krawędzi ma promień dt
+# (przyrost fazy na próbkę), więc obejmuje tylko dwie próbki, między którymi
+# leży krawędź - wielomiany liczone są wyłącznie dla nich, reszta bufora
+# zostaje naiwna bez żadnego kosztu.
+
+def _band_limit_correction(phase, second_half, wave_type, dt):
+    """
+    Korekta PolyBLEP/PolyBLAMP do dodania do naiwnej fali:
+    [(indeksy próbek, korekta), ...] - próbki przed i za krawędziami
+    """
+    # Powyżej sr/2 okno krawędzi obejmowałoby więcej niż okres; dt w float32,
+    # żeby nie promować obliczeń na tablicach do float64
+    n = len(phase)
+    if np.ndim(dt):
+        dt = np.minimum(dt, 0.5, dtype=np.float32)
+        dt_first, dt_last = float(dt[0]), float(dt[-1])
+    else:
+        dt = dt_first = dt_last = min(float(dt), 0.5)
+
+    # Połowa okresu także tuż przed i tuż za buforem - krawędź skrajnej
+    # próbki może leżeć poza nim. Przejście k leży między próbkami k-1 i k
+    halves = np.empty(n + 2, dtype=bool)
+    halves[1:-1] = second_half
+    halves[0] = (phase[0] - dt_first) % 1.0 >= 0.5
+    halves[-1] = (phase[-1] + dt_last) % 1.0 >= 0.5
+
+    k = np.flatnonzero(np.not_equal(halves[1:], halves[:-1]))
+    if not len(k):
+        return []
+    # Zmiany połowy okresu są na przemian wejściem w drugą połowę (krawędź
+    # przy 0.5) i powrotem do pierwszej (krawędź przy 0)
+    rising = slice(0 if halves[k[0] + 1] else 1, None, 2)
+    falling = slice(1 - rising.start, None, 2)
+    if wave_type == "sawtooth":
+        # Jedyny skok przy 0.5 - przejście przez 0 jest ciągłe
+        k = k[rising]
+        rising, falling = slice(None), None
+        if not len(k):
+            return []
+
+    # Próbka k leży tuż za krawędzią, k-1 tuż przed nią; x = (faza[k] - krawędź) / dt
+    # w [0, 1] to położenie krawędzi między nimi - obie korekty liczone z jednego x
+    x = phase.take(k, mode='clip')
+    tail = k[-1] == n
+    if tail:
+        # Krawędź za ostatnią próbką - faza wirtualnej próbki n
+        x[-1] = (phase[-1] + dt_last) % 1.0
+    x[rising] -= np.float32(0.5)
+    # Krok fazy z k-1 do k (dt[i] to przyrost od próbki i do i+1)
+    edge_dt = dt.take(k - 1, mode='clip') if np.ndim(dt) else dt
+    x /= edge_dt
+    # Powyżej sr/2 krok fazy bywa dłuższy niż przycięte dt
+    np.minimum(x, 1.0, out=x)
+    rest = np.subtract(1.0, x)
+
+    if wave_type == "triangle":
+        # PolyBLAMP: x³/6 przed załamaniem, (1-x)³/6 za nim; maksimum przy 0.5
+        # zmienia nachylenie (±4 na okres) o -8 dt
+        weight = edge_dt * (-8.0 / 6.0)
+        squared = np.multiply(x, x)
+        before = np.multiply(x, squared, out=x)
+        before *= weight
+        np.multiply(rest, rest, out=squared)
+        after = np.multiply(rest, squared, out=rest)
+        after *= weight
+    else:
+        # PolyBLEP: x²/2 przed skokiem, -(1-x)²/2 za nim; skok przy 0.5 to +1 → -1
+        before = np.multiply(x, x, out=x)
+        np.negative(before, out=before)
+        after = np.multiply(rest, rest, out=rest)
+    if falling is not None:
+        # Przy 0 skok (-1 → +1) i załamanie (minimum) mają przeciwny znak
+        before[falling] *= -1.0
+        after[falling] *= -1.0
+
+    start = 1 if k[0] == 0 else 0
+    stop = len(k) - 1 if tail else len(k)
+    return [(k[start:] - 1, before[start:]), (k[:stop], after[:stop])]
+
+
+def to_stereo_int16(wave, volume, channel="both", out=None):
+    """
+    Skaluje falę (w miejscu) i zapisuje ją do ciągłego bufora int16 (N, 2)
+    pygame wymaga ciągłej tablicy, więc bez np.repeat/np.column_stack - zapis prosto do kolumn
+    """
+    if out is None:
+        out = np.empty((len(wave), 2), dtype=np.int16)
+
+    np.multiply(wave, volume / 100.0 * INT16_MAX, out=wave)
+
+    if channel == "left":
+        out[:, 1] = 0
+        np.copyto(out[:, 0], wave, casting='unsafe')
+    elif channel == "right":
+        out[:, 0] = 0
+        np.copyto(out[:, 1], wave, casting='unsafe')
+    else:
+        # Dwa zapisy kolumnowe - szybsze niż jeden zapis rozgłoszonego widoku (N, 1)
+        np.copyto(out[:, 0], wave, casting='unsafe')
+        out[:, 1] = out[:, 0]
+
+    return out
+
+
+# ─────────────────────────────────────────
+# GOTOWE BUFORY
+# ─────────────────────────────────────────
+
+def generate_tone(frequency, duration, volume, wave_type="sine", channel="both", sample_rate=None):
+    """Generuje ton stereo int16 gotowy dla pygame.sndarray.make_sound"""
+    if sample_rate is None:
+        sample_rate = mixer_sample_rate()
+
+    count_synthesis('tone')
+    n_samples = int(duration * sample_rate)
+    buf = tone_phase(frequency, n_samples, sample_rate)
+    render_wave(buf, wave_type, out=buf, dt=frequency / sample_rate)
+    return to_stereo_int16(buf, volume, channel)
+
+
+def generate_loop(frequency, volume, wave_type="sine", channel="both", sample_rate=None):
+    """
+    Generuje ton do play(loops=-1) - całkowita liczba okresów, więc pętla jest bez szwu
+    Bufor zwykle ma kilka tysięcy próbek zamiast pełnej sekundy
+    """
+    if sample_rate is None:
+        sample_rate = mixer_sample_rate()
+
+    count_synthesis('loop')
+    n_samples, _, f_eff = loop_buffer_length(frequency, sample_rate)
+    buf = tone_phase(f_eff, n_samples, sample_rate)
+    render_wave(buf, wave_type, out=buf, dt=f_eff / sample_rate)
+    return to_stereo_int16(buf, volume, channel)
+
+
+def render_log_sweep(freq_min, freq_max, duration, volume, wave_type="sine", sample_rate=None):
+    """
+    Renderuje cały przejazd góra/dół jako jeden ciągły fazowo bufor stereo int16
+    Odtwarzany jednym Sound.play() - bez syntezy w trakcie testu
+    """
+    if sample_rate is None:
+        sample_rate = mixer_sample_rate()
+
+    count_synthesis('sweep')
+    total = int(duration * sample_rate)
+    stereo = np.empty((total, 2), dtype=np.int16)
+    block = np.empty(SWEEP_BLOCK_SAMPLES, dtype=np.float32)
+
+    for start in range(0, total, SWEEP_BLOCK_SAMPLES):
+        stop = min(start + SWEEP_BLOCK_SAMPLES, total)
+        buf = block[:stop - start]
+        # Jedna próbka więcej - różnica faz to chwilowy przyrost dt dla PolyBLEP
+        t = np.arange(start, stop + 1, dtype=np.float64) / sample_rate
+        phase = sweep_phase(t, freq_min, freq_max, duration)
+        dt = np.diff(phase)
+        wrap_phase(phase[:-1], out=buf)
+        render_wave(buf, wave_type, out=buf, dt=dt)
+        to_stereo_int16(buf, volume, out=stereo[start:stop])
+
+    return stereo
@@ -6,11 +6,11 @@ Bose Style - White Theme (wersja polska)
 import tkinter as tk
 from tkinter import ttk, messagebox
 import pygame
-import numpy as np
 import threading
 import time
 from datetime import datetime
 from test_reporter import get_test_reporter
+from resource_manager import get_resource_manager
 
 
 class StereoTest:
@@ -53,6 +53,7 @@ class StereoTest:
         # === ZMIENNE AUTO TESTU ===
         self.auto_test_running = False
         self.auto_test_start_time = None
+        self.run_id = None
         self.auto_test_job = None
         self.auto_duration_per_channel = 5  # domyślnie 5 sekund
         self.auto_frequency = 1000
@@ -350,6 +351,7 @@ class StereoTest:
         # Zablokuj kontrolki
         self.auto_test_running = True
         self.auto_test_start_time = datetime.now()
+        self.run_id = get_test_reporter().begin_run("TEST3")
 
         self.btn_left.config(state=tk.DISABLED)
         self.btn_right.config(state=tk.DISABLED)
@@ -454,7 +456,8 @@ class StereoTest:
                 duration_per_channel=self.auto_duration_per_channel,
                 total_duration=duration,
                 status=status,
-                interrupted=interrupted
+                interrupted=interrupted,
+                test_id=self.run_id
             )
         except Exception as e:
             print(f"Błąd zapisu raportu TEST 3: {e}")
@@ -557,16 +560,6 @@ class StereoTest:
         self.volume = int(float(value))
         self.vol_value_label.config(text=f"{self.volume}%")
 
-    def generate_tone(self, frequency, duration, sample_rate=44100):
-        """Generuje ton trójkątny 300Hz"""
-        t = np.linspace(0, duration, int(sample_rate * duration), False)
-        tone = 2 * np.abs(2 * (t * 300 - np.floor(t * 300 + 0.5))) - 1
-
-        # Normalizacja do 16-bit
-        tone = (tone * 32767).astype(np.int16)
-
-        return tone
-
     def play_channel(self, channel, restart=False):
         """Odtwarza dźwięk na wybranym kanale"""
         if self.is_playing and not restart and not self.auto_test_running:
@@ -575,7 +568,7 @@ class StereoTest:
         # Zatrzymaj poprzedni dźwięk
         if self.is_playing:
             self.stop_sound = True  # Oznacz do zatrzymania
-            pygame.mixer.stop()
+            get_resource_manager().stop_all_sounds()
 
             # Poczekaj aż wątek się zatrzyma (max 1 sekunda)
             if self.sound_thread and self.sound_thread.is_alive():
@@ -598,22 +591,10 @@ class StereoTest:
     def _play_sound_thread(self, channel):
         """Wątek odtwarzający dźwięk"""
         try:
-            tone = self.generate_tone(self.frequency, 2.0)  # 2s bufor
-
-            if channel == 'left':
-                stereo_tone = np.zeros((len(tone), 2), dtype=np.int16)
-                stereo_tone[:, 0] = tone
-            elif channel == 'right':
-                stereo_tone = np.zeros((len(tone), 2), dtype=np.int16)
-                stereo_tone[:, 1] = tone
-            else:
-                stereo_tone = np.column_stack((tone, tone))
-
-            volume_factor = self.volume / 100.0
-            stereo_tone = (stereo_tone * volume_factor).astype(np.int16)
-
-            sound = pygame.sndarray.make_sound(stereo_tone)
-            sound.play(loops=-1)  # ← ciągłe odtwarzanie bez przerw
+            # Ton trójkątny 300Hz, bufor z całkowitą liczbą okresów (z cache)
+            resource_mgr = get_resource_manager()
+            sound = resource_mgr.get_loop_sound(300, "triangle", channel)
+            resource_mgr.play_sound(sound, self.volume, loops=-1)  # ← ciągłe odtwarzanie bez przerw
 
             while not self.stop_sound:
                 time.sleep(0.05)
@@ -629,7 +610,7 @@ class StereoTest:
         """Zatrzymuje odtwarzanie"""
         self.stop_sound = True
         self.is_playing = False
-        pygame.mixer.stop()
+        get_resource_manager().stop_all_sounds()
 
         # Resetuj wizualizację
         self.update_visualization(None)
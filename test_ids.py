@@ -0,0 +1,74 @@
+"""
+Test IDs - Unikalne, sortowalne ID testów
+Bose Audio Multi-Tool
+
+Format: PREFIX_RRRRMMDD_GGMMSS_mikrosekundy_STACJA_PID_licznik,
+np. TEST1_20260122_215052_413207_LAB01_4312_000017.
+
+Czas liczony jest od zegara monotonicznego zakotwiczonego w czasie ściennym
+przy starcie procesu, więc nie cofa się przy korekcie zegara systemowego.
+Unikalność w procesie zapewnia licznik (itertools.count - next() jest
+atomowe w CPythonie, bez blokady), między procesami - PID, między
+stanowiskami - ID stacji.
+"""
+
+import itertools
+import os
+import re
+import socket
+import time
+from datetime import datetime
+
+
+def _station_name(station_id):
+    """ID stacji z configu albo nazwa hosta - tylko litery i cyfry"""
+    name = re.sub(r'[^A-Za-z0-9]', '', station_id or socket.gethostname())
+    return (name or "STATION").upper()
+
+
+class TestIdGenerator:
+    """Generator ID testów dla jednej stacji"""
+
+    def __init__(self, station_id=""):
+        self.station = _station_name(station_id)
+        self._counter = itertools.count(1)
+        self._wall_ns = time.time_ns()
+        self._mono_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._second = (None, "", None)    # (sekunda, "RRRRMMDD_GGMMSS", datetime)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._pid = os.getpid()
+
+    def now(self):
+        """Czas ścienny (ns) - monotoniczny w obrębie procesu"""
+        return self._wall_ns + (time.perf_counter_ns() - self._mono_ns)
+
+    def next_id(self, prefix):
+        """(test_id, datetime) - data i godzina raportu z tego samego odczytu zegara"""
+        seq = next(self._counter)
+        second, micro = divmod(self.now() // 1000, 1_000_000)
+
+        # strftime raz na sekundę; krotka podmieniana atomowo, więc bez blokady
+        cached = self._second
+        if cached[0] != second:
+            base = datetime.fromtimestamp(second)
+            cached = self._second = (second, base.strftime('%Y%m%d_%H%M%S'), base)
+
+        test_id = f"{prefix}_{cached[1]}_{micro:06d}_{self.station}_{self._pid}_{seq:06d}"
+        return test_id, cached[2].replace(microsecond=micro)
+
+
+_generator_instance = None
+
+
+def get_test_id_generator():
+    """Zwraca singleton TestIdGenerator (stacja z reports.station_id)"""
+    global _generator_instance
+    if _generator_instance is None:
+        from config_manager import get_config_manager
+        station_id = get_config_manager().get('reports.station_id', '')
+        _generator_instance = TestIdGenerator(station_id)
+    return _generator_instance
@@ -1,15 +1,29 @@
 """
 Test Reporter - Moduł raportowania wyników testów
 Bose Audio Multi-Tool
+
+Wyniki zapisuje ReportWriter w wątku tła do dziennika tej stacji
+(ReportJournal), skąd scalane są do bazy SQLite (ReportStore) wspólnej dla
+stacji piszących do jednego folderu - save_*() wraca od razu z ID testu.
+CSV jest formatem eksportu (export_history); dawne pliki historii CSV
+importowane są do bazy jednorazowo przy starcie.
+
+ID przebiegu nadaje begin_run() na starcie testu; kolejne zapisy z tym ID
+(np. INTERRUPTED z zamykania okna po ocenie PASS) aktualizują ten sam rekord
+albo są pomijane, gdy przebieg ma już wynik ostateczny.
 """
 
-import csv
 import os
 from datetime import datetime
 
+from report_journal import COMPACT_INTERVAL, ReportJournal
+from report_store import DB_FILE, FINAL_STATUSES, ReportStore
+from report_writer import REPORT_BATCH_SIZE, REPORT_FLUSH_INTERVAL, ReportWriter
+from test_ids import get_test_id_generator
+
 
 class TestReporter:
-    """Klasa do zapisywania wyników testów do CSV"""
+    """Klasa do zapisywania wyników testów"""
 
     def __init__(self, report_dir="test_reports"):
         self.report_dir = report_dir
@@ -20,59 +34,86 @@ class TestReporter:
         if not os.path.exists(report_dir):
             os.makedirs(report_dir)
 
-        # Utwórz pliki CSV z nagłówkami jeśli nie istnieją
-        if not os.path.exists(self.csv_file):
-            self.create_csv_file()
+        # ID unikalne także przy kilku wynikach w tej samej sekundzie i kilku stacjach
+        self.ids = get_test_id_generator()
+        self._finalized = {}      # test_id → PASS/FAIL albo None (indeks przebiegów)
+
+        # Zapis w tle, partiami, do dziennika tego procesu; dzienniki wszystkich
+        # stacji scalane są do bazy (fsync na partię i commit opcjonalnie)
+        from config_manager import get_config_manager
+        config_mgr = get_config_manager()
+        fsync = config_mgr.get('reports.fsync', False)
+        self.store = ReportStore(os.path.join(report_dir, DB_FILE), fsync=fsync)
+        self.journal = ReportJournal(
+            report_dir, self.ids.station, self.store, fsync=fsync,
+            compact_interval=config_mgr.get('reports.compact_interval', COMPACT_INTERVAL)
+        )
+        self.writer = ReportWriter(
+            self.journal,
+            batch_size=config_mgr.get('reports.batch_size', REPORT_BATCH_SIZE),
+            flush_interval=config_mgr.get('reports.flush_interval', REPORT_FLUSH_INTERVAL)
+        )
+
+        # Import starej historii CSV - w wątku zapisu, przed nowymi wynikami
+        self.writer.call(self._migrate_csv_history)
+
+    def _migrate_csv_history(self):
+        self.store.migrate_csv(self.csv_file, 'tests')
+        self.store.migrate_csv(self.combo_csv_file, 'combo_tests')
+
+    # ─────────────────────────────────────────
+    # PRZEBIEGI
+    # ─────────────────────────────────────────
+
+    def begin_run(self, prefix):
+        """Nadaje ID przebiegu na starcie testu (prefix: TEST1/TEST2/TEST3/COMBO)"""
+        test_id = self.ids.next_id(prefix)[0]
+        self._finalized[test_id] = None
+        return test_id
 
-        if not os.path.exists(self.combo_csv_file):
-            self.create_combo_csv_file()
+    def _run_id(self, prefix, test_id):
+        if test_id is None:
+            test_id, now = self.ids.next_id(prefix)
+            self._finalized[test_id] = None     # nowe ID - w bazie go jeszcze nie ma
+            return test_id, now
+        return test_id, datetime.now()
 
-    def create_csv_file(self):
-        """Tworzy plik CSV z nagłówkami"""
-        headers = [
-            'Test ID', 'Test Type', 'Device Serial', 'Operator HRID',
-            'Date', 'Time', 'Duration (s)', 'Audio File', 'Status',
-            'Steps Completed', 'Total Steps', 'Volumes Tested',
-            'Interrupted', 'Notes'
-        ]
-        with open(self.csv_file, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
-
-    def create_combo_csv_file(self):
-        """Tworzy plik CSV dla COMBO testów"""
-        headers = [
-            'Test ID',
-            'Test Type',
-            'Device Serial',
-            'Operator HRID',
-            'Date',
-            'Time',
-            'TEST1_Status',
-            'TEST1_Duration',
-            'TEST1_Audio_File',
-            'TEST1_Volumes',
-            'TEST2_Status',
-            'TEST2_Duration',
-            'TEST2_WaveType',
-            'TEST2_FreqRange',
-            'TEST3_Status',
-            'TEST3_Duration',
-            'TEST3_Channels',
-            'Overall_Status',
-            'Total_Duration',
-            'Interrupted',
-            'Notes'
-        ]
-        with open(self.combo_csv_file, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
+    def _submit(self, table, row, test_id, status):
+        """
+        Przekazuje wynik do zapisu; zapis nieostateczny po PASS/FAIL jest pomijany (False)
+        Przebieg spoza tej sesji sprawdzany jest w bazie przez wątek zapisu - wątek Tk
+        nie czeka na SQLite
+        """
+        final = self._finalized.get(test_id)
+        if final and status not in FINAL_STATUSES:
+            print(f"[TestReporter] {test_id} ma już wynik {final} - pominięto zapis {status}")
+            return False
+
+        check = None
+        if status in FINAL_STATUSES:
+            self._finalized[test_id] = status
+        elif test_id not in self._finalized:
+            check = lambda: self._not_finalized(test_id, status, table)
+        self.writer.write(table, row, check=check)
+        return True
+
+    def _not_finalized(self, test_id, status, table):
+        """Wątek zapisu: czy przebieg nie ma jeszcze w bazie wyniku ostatecznego"""
+        final = self.store.get_status(test_id, table)
+        if final not in FINAL_STATUSES:
+            return True
+        self._finalized.setdefault(test_id, final)
+        print(f"[TestReporter] {test_id} ma już wynik {final} - pominięto zapis {status}")
+        return False
+
+    # ─────────────────────────────────────────
+    # ZAPIS WYNIKÓW
+    # ─────────────────────────────────────────
 
     def save_test1_result(self, operator_hrid, device_serial, test_duration,
                           audio_file, status, total_steps, completed_steps,
-                          volume_levels, interrupted, notes=""):
-        now = datetime.now()
-        test_id = f"TEST1_{now.strftime('%Y%m%d_%H%M%S')}"
+                          volume_levels, interrupted, notes="", test_id=None):
+        test_id, now = self._run_id("TEST1", test_id)
         date_str = now.strftime('%Y-%m-%d')
         time_str = now.strftime('%H:%M:%S')
 
@@ -88,17 +129,16 @@ class TestReporter:
             "Yes" if interrupted else "No", notes
         ]
 
-        with open(self.csv_file, 'a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        if not self._submit('tests', row, test_id, status):
+            return test_id
 
         print(f"✓ Raport zapisany: {test_id}")
         return test_id
 
     def save_test2_result(self, operator_hrid, device_serial, wave_type,
-                          freq_range, duration, volume, status, interrupted, notes=""):
-        now = datetime.now()
-        test_id = f"TEST2_{now.strftime('%Y%m%d_%H%M%S')}"
+                          freq_range, duration, volume, status, interrupted, notes="",
+                          test_id=None):
+        test_id, now = self._run_id("TEST2", test_id)
         date_str = now.strftime('%Y-%m-%d')
         time_str = now.strftime('%H:%M:%S')
 
@@ -112,18 +152,16 @@ class TestReporter:
             "Yes" if interrupted else "No", notes
         ]
 
-        with open(self.csv_file, 'a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        if not self._submit('tests', row, test_id, status):
+            return test_id
 
         print(f"✓ Raport TEST 2 zapisany: {test_id}")
         return test_id
 
     def save_test3_result(self, operator_hrid, device_serial, frequency,
                           volume, duration_per_channel, total_duration,
-                          status, interrupted, notes=""):
-        now = datetime.now()
-        test_id = f"TEST3_{now.strftime('%Y%m%d_%H%M%S')}"
+                          status, interrupted, notes="", test_id=None):
+        test_id, now = self._run_id("TEST3", test_id)
         date_str = now.strftime('%Y-%m-%d')
         time_str = now.strftime('%H:%M:%S')
 
@@ -138,16 +176,15 @@ class TestReporter:
             "Yes" if interrupted else "No", notes
         ]
 
-        with open(self.csv_file, 'a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        if not self._submit('tests', row, test_id, status):
+            return test_id
 
         print(f"✓ Raport TEST 3 zapisany: {test_id}")
         return test_id
 
     def save_combo_result(self, operator_hrid, device_serial,
                           test1_data, test2_data, test3_data,
-                          total_duration, interrupted, notes=""):
+                          total_duration, interrupted, notes="", test_id=None):
         """
         Zapisuje wynik COMBO testu (TEST 1 + TEST 2 + TEST 3)
 
@@ -160,9 +197,9 @@ class TestReporter:
             total_duration: Łączny czas wszystkich testów (s)
             interrupted: Czy przerwano
             notes: Notatki
+            test_id: ID przebiegu z begin_run() (brak - nowe ID)
         """
-        now = datetime.now()
-        test_id = f"COMBO_{now.strftime('%Y%m%d_%H%M%S')}"
+        test_id, now = self._run_id("COMBO", test_id)
         date_str = now.strftime('%Y-%m-%d')
         time_str = now.strftime('%H:%M:%S')
 
@@ -213,14 +250,60 @@ class TestReporter:
             notes
         ]
 
-        with open(self.combo_csv_file, 'a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        if not self._submit('combo_tests', row, test_id, overall_status):
+            return test_id, self._finalized[test_id]
 
         print(f"✓ Raport COMBO zapisany: {test_id} | Status: {overall_status}")
         return test_id, overall_status
 
 
+    # ─────────────────────────────────────────
+    # HISTORIA
+    # ─────────────────────────────────────────
+
+    def _sync(self):
+        """Zapisuje oczekujące wyniki i scala dzienniki przed zapytaniem do bazy"""
+        self.writer.call(self.journal.compact)
+        self.writer.flush()
+
+    def find_results(self, combo=False, limit=1000, **filters):
+        """Wyniki z historii (serial, operator, date_from, date_to, status) - od najnowszych"""
+        self._sync()
+        return self.store.find('combo_tests' if combo else 'tests', limit, **filters)
+
+    def has_passed(self, device_serial):
+        """Czy egzemplarz przeszedł już którykolwiek test"""
+        self._sync()
+        return self.store.has_passed(device_serial)
+
+    def yield_stats(self, operator_hrid=None, date=None, combo=False):
+        """Yield operatora / dnia, np. yield_stats('HRID', '2026-02-18')"""
+        self._sync()
+        return self.store.yield_stats('combo_tests' if combo else 'tests',
+                                      operator=operator_hrid, date_from=date, date_to=date)
+
+    def export_history(self, path=None, combo=False, **filters):
+        """Eksportuje historię do CSV (domyślnie test_reports/exports/); zwraca ścieżkę"""
+        self._sync()
+        if path is None:
+            export_dir = os.path.join(self.report_dir, "exports")
+            os.makedirs(export_dir, exist_ok=True)
+            name = "combo_test_history" if combo else "test_history"
+            path = os.path.join(export_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+
+        rows = self.store.export_csv(path, 'combo_tests' if combo else 'tests', **filters)
+        print(f"[TestReporter] Wyeksportowano {rows} wyników do {path}")
+        return path
+
+    def flush(self):
+        """Czeka na zapis wszystkich oczekujących wyników"""
+        self.writer.flush()
+
+    def close(self):
+        """Zapisuje resztę wyników i zamyka bazę"""
+        self.writer.close()
+
+
 # Singleton
 _reporter_instance = None
 
@@ -231,3 +314,9 @@ def get_test_reporter():
     if _reporter_instance is None:
         _reporter_instance = TestReporter()
     return _reporter_instance
+
+
+def shutdown_test_reporter():
+    """Zamyka reporter, jeśli był używany (wywoływane z ResourceManager.shutdown)"""
+    if _reporter_instance is not None:
+        _reporter_instance.close()
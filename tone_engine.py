@@ -0,0 +1,204 @@
+"""
+Tone Engine - Strumieniowy generator tonu
+Bose Audio Multi-Tool
+
+Krótkie bloki (~50 ms) syntezowane w wątku i podawane na dedykowany kanał
+miksera przez Channel.queue() - jeden blok gra, drugi czeka w kolejce.
+Zatrzymanie z zewnątrz idzie przez stop() (ResourceManager.stop_all_sounds),
+a chwilowy brak bloku (wątek nie zdążył) tylko wznawia odtwarzanie.
+Faza przechodzi między blokami, więc zmiana częstotliwości, fali lub
+poziomu działa od następnego bloku bez przerwy i bez kliknięcia.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pygame
+
+from resource_manager import STREAM_CHANNEL, get_resource_manager
+from signals import (count_synthesis, mixer_sample_rate, render_wave, sweep_phase,
+                     to_stereo_int16, tone_phase, wrap_phase)
+
+CHUNK_MS = 50             # zapas kolejki: tyle wątek może się spóźnić bez przerwy w dźwięku
+GAIN_RAMP_SAMPLES = 512   # zmiana poziomu rozłożona na jeden bufor miksera
+
+
+class ToneStream:
+    """Ton grany strumieniowo na własnym kanale miksera"""
+
+    def __init__(self, channel_id=STREAM_CHANNEL, chunk_ms=CHUNK_MS):
+        self.channel_id = channel_id
+        self.chunk_ms = chunk_ms
+
+        self.frequency = 440.0
+        self.wave_type = "sine"
+        self.gain = 0.5
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self._channel = None
+
+        self._phase = 0.0            # faza tonu w cyklach, [0, 1)
+        self._applied_gain = None    # poziom końca ostatniego bloku - start rampy następnego
+        self._ramp = None            # 0 → 1 na GAIN_RAMP_SAMPLES, bufory przydzielane raz w wątku
+        self._gain_buf = None
+        self._work = None
+        self._stereo = None
+        self._sweep = None           # (freq_min, freq_max, duration) w trybie przejazdu
+        self._position = 0           # próbka przejazdu
+        self.underruns = 0
+
+    # ─────────────────────────────────────────
+    # API
+    # ─────────────────────────────────────────
+
+    def set_frequency(self, frequency):
+        with self._lock:
+            self.frequency = float(frequency)
+
+    def set_wave(self, wave_type):
+        with self._lock:
+            self.wave_type = wave_type
+
+    def set_gain(self, gain):
+        """Poziom 0.0-1.0 - nakładany przy odtwarzaniu, bez ponownej syntezy"""
+        with self._lock:
+            self.gain = min(max(float(gain), 0.0), 1.0)
+
+    def start(self):
+        """Uruchamia (lub wznawia) strumień - faza jest kontynuowana"""
+        if self._running:
+            return
+
+        resource_mgr = get_resource_manager()
+        self._channel = resource_mgr.reserved_channel(self.channel_id)
+        resource_mgr.register_stream(self)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def start_sweep(self, freq_min, freq_max, duration):
+        """Przejazd log góra/dół syntezowany blokami - bez renderowania całości z góry"""
+        self.stop()
+        with self._lock:
+            self._sweep = (freq_min, freq_max, duration)
+            self._position = 0
+            self.frequency = float(freq_min)
+        self.start()
+
+    def stop(self):
+        """Zatrzymuje strumień i czyści kanał"""
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=0.5)
+        self._thread = None
+
+        if self._channel:
+            self._channel.stop()
+        self._applied_gain = None
+        get_resource_manager().unregister_stream(self)
+
+        with self._lock:
+            self._sweep = None
+
+    @property
+    def is_running(self):
+        return self._running
+
+    # ─────────────────────────────────────────
+    # WĄTEK
+    # ─────────────────────────────────────────
+
+    def _run(self):
+        sample_rate = mixer_sample_rate()
+        chunk = max(int(sample_rate * self.chunk_ms / 1000), 64)
+        poll = self.chunk_ms / 4000.0
+
+        ramp_len = min(GAIN_RAMP_SAMPLES, chunk)
+        self._ramp = np.linspace(0.0, 1.0, ramp_len, dtype=np.float32)
+        self._gain_buf = np.empty(ramp_len, dtype=np.float32)
+        self._work = np.empty(chunk, dtype=np.float32)
+        self._stereo = np.empty((chunk, 2), dtype=np.int16)
+
+        played = False
+        try:
+            while self._running:
+                busy = self._channel.get_busy()
+                if busy and self._channel.get_queue() is not None:
+                    time.sleep(poll)
+                    continue
+
+                data = self._render_chunk(chunk, sample_rate)
+                if data is None:
+                    break
+
+                sound = pygame.sndarray.make_sound(data)
+                if busy:
+                    self._channel.queue(sound)
+                    continue
+
+                # Kanał ucichł przed kolejnym blokiem (wątek nie zdążył) - grać dalej;
+                # celowe zatrzymanie przychodzi przez stop(), nie przez ciszę kanału
+                if played:
+                    self.underruns += 1
+                    print(f"[ToneStream] Przerwa w strumieniu ({self.underruns}) - wznowiono")
+                self._channel.play(sound)
+                played = True
+
+        except Exception as e:
+            print(f"[ToneStream] Błąd strumienia: {e}")
+        finally:
+            self._running = False
+            get_resource_manager().unregister_stream(self)
+
+    def _render_chunk(self, n_samples, sample_rate):
+        """Następny blok int16 stereo albo None, gdy przejazd się skończył"""
+        with self._lock:
+            frequency = self.frequency
+            wave_type = self.wave_type
+            gain = self.gain
+            sweep = self._sweep
+
+        if sweep:
+            freq_min, freq_max, duration = sweep
+            n_samples = min(n_samples, int(duration * sample_rate) - self._position)
+            if n_samples <= 0:
+                return None
+
+            t = np.arange(self._position, self._position + n_samples + 1, dtype=np.float64)
+            t /= sample_rate
+            phase = sweep_phase(t, freq_min, freq_max, duration)
+            dt = np.diff(phase)
+            buf = wrap_phase(phase[:-1], out=self._work[:n_samples])
+            self._position += n_samples
+        else:
+            dt = frequency / sample_rate
+            buf = tone_phase(frequency, n_samples, sample_rate, phase0=self._phase,
+                             out=self._work[:n_samples])
+            self._phase = (self._phase + n_samples * dt) % 1.0
+
+        # Fala w pełnej skali, poziom dopiero przy wyjściu
+        count_synthesis('stream')
+        render_wave(buf, wave_type, out=buf, dt=dt)
+        self._apply_gain(buf, gain)
+
+        # make_sound kopiuje dane, więc bufor stereo można użyć ponownie
+        return to_stereo_int16(buf, 100, out=self._stereo[:n_samples])
+
+    def _apply_gain(self, buf, gain):
+        """Poziom w miejscu; zmiana jako rampa na jeden bufor miksera - bez alokacji NumPy"""
+        start_gain = gain if self._applied_gain is None else self._applied_gain
+        self._applied_gain = gain
+
+        if start_gain == gain:
+            np.multiply(buf, gain, out=buf)
+            return
+
+        ramp_len = min(len(self._ramp), len(buf))
+        ramp = self._gain_buf[:ramp_len]
+        np.multiply(self._ramp[:ramp_len], gain - start_gain, out=ramp)
+        ramp += start_gain
+        buf[:ramp_len] *= ramp
+        buf[ramp_len:] *= gain
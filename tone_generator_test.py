@@ -11,6 +11,8 @@ import numpy as np
 import time
 from datetime import datetime
 from test_reporter import get_test_reporter
+from signals import get_synthesis_count, render_wave, sweep_frequency
+from tone_engine import ToneStream
 
 
 class ToneGeneratorTest:
@@ -42,12 +44,19 @@ class ToneGeneratorTest:
         self.wave_type = "sine"
         self.is_playing = False
         self.is_paused = False
-        self.sound = None
         self.animation_running = False
 
+        # Strumień tonu - zmiany parametrów w trakcie grania bez restartu dźwięku
+        self.stream = ToneStream()
+        self.stream.set_frequency(self.frequency)
+        self.stream.set_gain(self.volume / 100.0)
+        # Okno zamknięte inną drogą niż POWRÓT (X, wylogowanie, inny test) - zatrzymaj strumień
+        self.parent_frame.bind("<Destroy>", self.on_destroy, add="+")
+
         # === ZMIENNE AUTO TESTU ===
         self.auto_test_running = False
         self.auto_test_start_time = None
+        self.run_id = None
         self.auto_test_job = None
         self.auto_freq_min = 20
         self.auto_freq_max = 20000
@@ -484,6 +493,7 @@ class ToneGeneratorTest:
         # Zablokuj kontrolki
         self.auto_test_running = True
         self.auto_test_start_time = datetime.now()
+        self.run_id = get_test_reporter().begin_run("TEST2")
 
         # Przyciski sterowania
         self.play_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'], fg=self.colors['text_secondary'])
@@ -525,32 +535,33 @@ class ToneGeneratorTest:
         if not self.auto_test_running:
             return
 
-        start_time = time.time()
-        end_time = start_time + self.auto_duration
-
         # Ustaw początkową częstotliwość
-        self.frequency = self.auto_freq_min
-        self.freq_slider.set(self.frequency)
-        self.freq_entry.delete(0, tk.END)
-        self.freq_entry.insert(0, str(self.frequency))
-        self.canvas.itemconfig(self.freq_label_id, text=f"{self.frequency} Hz")
+        self.show_frequency(self.auto_freq_min)
 
-        # Start dźwięku
-        wave_data = self.generate_wave(self.frequency)
-        self.sound = pygame.sndarray.make_sound(wave_data)
-        self.sound.play(loops=-1)
+        # Przejazd syntezowany blokami przez strumień - ciągły fazowo od początku do końca
+        self.stream.set_wave(self.auto_wave_type)
+        self.stream.set_gain(self.auto_volume / 100.0)
+        self.stream.start_sweep(self.auto_freq_min, self.auto_freq_max, self.auto_duration)
         self.is_playing = True
 
+        start_time = time.time()
+        end_time = start_time + self.auto_duration
+
+        # Instrumentacja: kroki UI nie powinny wywoływać żadnej syntezy poza strumieniem
+        self.sweep_steps = 0
+        self.sweep_step_syntheses = 0
+        self.sweep_stream_start = get_synthesis_count('stream')
+
         # Animacja
         if not self.animation_running:
             self.animation_running = True
             self.animate_wave()
 
-        # Aktualizuj częstotliwość w pętli
+        # Aktualizuj etykiety w pętli
         self.sweep_step(start_time, end_time)
 
     def sweep_step(self, start_time, end_time):
-        """Jeden krok frequency sweep"""
+        """Jeden krok frequency sweep - tylko UI, dźwięk syntezuje strumień"""
         if not self.auto_test_running:
             return
 
@@ -560,33 +571,20 @@ class ToneGeneratorTest:
 
         if current_time >= end_time:
             # Test zakończony
+            self.log_sweep_stats()
             self.stop_auto_test(save_report=False)
             self.show_auto_close_message()
             return
 
-        # Oblicz aktualną częstotliwość (interpolacja logarytmiczna)
-        progress = elapsed / total_duration
-
-        # Logarytmiczna interpolacja
-        log_min = np.log10(self.auto_freq_min)
-        log_max = np.log10(self.auto_freq_max)
-
-        # Pierwsza połowa: 20Hz → 20kHz, druga połowa: 20kHz → 20Hz
-        if progress <= 0.5:
-            # Idzie w górę 20Hz → 20kHz
-            sweep_progress = progress * 2  # 0.0 → 1.0
-            current_freq = int(10 ** (log_min + sweep_progress * (log_max - log_min)))
-        else:
-            # Idzie w dół 20kHz → 20Hz
-            sweep_progress = (progress - 0.5) * 2  # 0.0 → 1.0
-            current_freq = int(10 ** (log_max - sweep_progress * (log_max - log_min)))
-
-        # Aktualizuj częstotliwość
-        self.frequency = current_freq
-        self.freq_slider.set(current_freq)
-        self.freq_entry.delete(0, tk.END)
-        self.freq_entry.insert(0, str(current_freq))
-        self.canvas.itemconfig(self.freq_label_id, text=f"{current_freq} Hz")
+        # Częstotliwość z tego samego odwzorowania czas → Hz co strumień
+        current_freq = int(sweep_frequency(elapsed, self.auto_freq_min,
+                                           self.auto_freq_max, total_duration))
+
+        # Aktualizuj częstotliwość - tylko widok, bez callbacków audio
+        before = get_synthesis_count('tone', 'loop', 'sweep')
+        self.show_frequency(current_freq)
+        self.sweep_steps += 1
+        self.sweep_step_syntheses += get_synthesis_count('tone', 'loop', 'sweep') - before
 
         # Aktualizuj status
         remaining = int(total_duration - elapsed)
@@ -595,16 +593,15 @@ class ToneGeneratorTest:
             fg=self.colors['text_primary']
         )
 
-        # Aktualizuj dźwięk
-        if self.sound:
-            self.sound.stop()
-        wave_data = self.generate_wave(current_freq)
-        self.sound = pygame.sndarray.make_sound(wave_data)
-        self.sound.play(loops=-1)
-
         # Następny krok za 50ms
         self.auto_test_job = self.parent_frame.after(50, lambda: self.sweep_step(start_time, end_time))
 
+    def log_sweep_stats(self):
+        """Wypisuje liczbę syntez w trakcie przejazdu (instrumentacja)"""
+        stream_blocks = get_synthesis_count('stream') - self.sweep_stream_start
+        print(f"[ToneGenerator] Przejazd: {self.sweep_steps} kroków UI, "
+              f"syntez z kroków: {self.sweep_step_syntheses}, bloków strumienia: {stream_blocks}")
+
     def stop_auto_test(self, save_report=True):
         """Zatrzymuje automatyczny test"""
         # Zapisz raport jeśli przerwano
@@ -619,8 +616,7 @@ class ToneGeneratorTest:
             self.auto_test_job = None
 
         # Zatrzymaj dźwięk
-        if self.sound:
-            self.sound.stop()
+        self.stream.stop()
         self.is_playing = False
         self.animation_running = False
 
@@ -671,7 +667,8 @@ class ToneGeneratorTest:
                 duration=duration,
                 volume=self.auto_volume,
                 status=status,
-                interrupted=interrupted
+                interrupted=interrupted,
+                test_id=self.run_id
             )
         except Exception as e:
             print(f"Błąd zapisu raportu TEST 2: {e}")
@@ -745,44 +742,37 @@ class ToneGeneratorTest:
                   bg='#FFFFFF', fg='#000000', bd=2, relief=tk.SOLID, width=16,
                   command=confirm).pack(pady=(15, 0))
 
-    # === ORIGINAL METHODS (bez zmian) ===
-
-    def generate_wave(self, frequency, duration=1.0, sample_rate=44100):
-        """Generuje falę dźwiękową"""
-        samples = int(duration * sample_rate)
-        t = np.linspace(0, duration, samples, False)
-
-        wave_type = self.wave_var.get()
+    # === WIDOK CZĘSTOTLIWOŚCI ===
 
-        if wave_type == "sine":
-            wave = np.sin(2 * np.pi * frequency * t)
-        elif wave_type == "square":
-            wave = np.sign(np.sin(2 * np.pi * frequency * t))
-        elif wave_type == "sawtooth":
-            wave = 2 * (t * frequency - np.floor(t * frequency + 0.5))
-        elif wave_type == "triangle":
-            wave = 2 * np.abs(2 * (t * frequency - np.floor(t * frequency + 0.5))) - 1
-        else:
-            wave = np.sin(2 * np.pi * frequency * t)
+    def show_frequency(self, frequency):
+        """
+        Aktualizuje stan i widżety częstotliwości bez wpływu na dźwięk
+        Tk wywołuje command suwaka asynchronicznie po set(), więc on_slider_change
+        rozpoznaje takie echo po tym, że wartość już jest bieżąca
+        """
+        self.frequency = frequency
+        self.freq_slider.set(frequency)
+        self.freq_entry.delete(0, tk.END)
+        self.freq_entry.insert(0, str(frequency))
+        self.canvas.itemconfig(self.freq_label_id, text=f"{frequency} Hz")
 
-        amplitude = self.volume / 100.0
-        wave = wave * amplitude
-        wave = np.int16(wave * 32767)
-        wave = np.repeat(wave.reshape(-1, 1), 2, axis=1)
+    def set_frequency(self, frequency):
+        """Zmiana częstotliwości przez operatora - widok i strumień"""
+        self.show_frequency(frequency)
+        self.stream.set_frequency(frequency)
 
-        return wave
+    # === ORIGINAL METHODS (bez zmian) ===
 
     def play_tone(self):
         if self.is_playing and not self.is_paused:
             return
 
-        if self.is_paused:
-            pygame.mixer.music.unpause()
-            self.is_paused = False
-        else:
-            wave_data = self.generate_wave(self.frequency)
-            self.sound = pygame.sndarray.make_sound(wave_data)
-            self.sound.play(loops=-1)
+        # Wznowienie po pauzie kontynuuje fazę strumienia
+        self.stream.set_frequency(self.frequency)
+        self.stream.set_wave(self.wave_var.get())
+        self.stream.set_gain(self.volume / 100.0)
+        self.stream.start()
+        self.is_paused = False
 
         self.is_playing = True
         self.play_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'])
@@ -795,15 +785,13 @@ class ToneGeneratorTest:
 
     def pause_tone(self):
         if self.is_playing and not self.is_paused:
-            if self.sound:
-                self.sound.stop()
+            self.stream.stop()
             self.is_paused = True
             self.play_btn.config(state=tk.NORMAL, bg=self.colors['button_bg'])
             self.pause_btn.config(state=tk.DISABLED, bg=self.colors['bg_card'])
 
     def stop_tone(self):
-        if self.sound:
-            self.sound.stop()
+        self.stream.stop()
         self.is_playing = False
         self.is_paused = False
         self.animation_running = False
@@ -815,32 +803,19 @@ class ToneGeneratorTest:
         self.canvas.delete("wave_line")
 
     def on_slider_change(self, value):
-        self.frequency = int(float(value))
-        self.freq_entry.delete(0, tk.END)
-        self.freq_entry.insert(0, str(self.frequency))
-        self.canvas.itemconfig(self.freq_label_id, text=f"{self.frequency} Hz")
+        frequency = int(float(value))
 
-        if self.is_playing and not self.is_paused:
-            if self.sound:
-                self.sound.stop()
-            wave_data = self.generate_wave(self.frequency)
-            self.sound = pygame.sndarray.make_sound(wave_data)
-            self.sound.play(loops=-1)
+        # Echo show_frequency() albo auto test - nic do zrobienia dla dźwięku
+        if frequency == self.frequency or self.auto_test_running:
+            return
+
+        self.set_frequency(frequency)
 
     def update_frequency_from_entry(self):
         try:
             freq = int(self.freq_entry.get())
             if 20 <= freq <= 20000:
-                self.frequency = freq
-                self.freq_slider.set(freq)
-                self.canvas.itemconfig(self.freq_label_id, text=f"{self.frequency} Hz")
-
-                if self.is_playing and not self.is_paused:
-                    if self.sound:
-                        self.sound.stop()
-                    wave_data = self.generate_wave(self.frequency)
-                    self.sound = pygame.sndarray.make_sound(wave_data)
-                    self.sound.play(loops=-1)
+                self.set_frequency(freq)
             else:
                 self.freq_entry.delete(0, tk.END)
                 self.freq_entry.insert(0, str(self.frequency))
@@ -851,37 +826,15 @@ class ToneGeneratorTest:
     def adjust_frequency(self, delta):
         new_freq = self.frequency + delta
         new_freq = max(20, min(20000, new_freq))
-        self.frequency = new_freq
-        self.freq_slider.set(new_freq)
-        self.freq_entry.delete(0, tk.END)
-        self.freq_entry.insert(0, str(new_freq))
-        self.canvas.itemconfig(self.freq_label_id, text=f"{self.frequency} Hz")
-
-        if self.is_playing and not self.is_paused:
-            if self.sound:
-                self.sound.stop()
-            wave_data = self.generate_wave(self.frequency)
-            self.sound = pygame.sndarray.make_sound(wave_data)
-            self.sound.play(loops=-1)
+        self.set_frequency(new_freq)
 
     def on_volume_change(self, value):
         self.volume = int(float(value))
         self.vol_label.config(text=f"POZIOM: {self.volume}%")
-
-        if self.is_playing and not self.is_paused:
-            if self.sound:
-                self.sound.stop()
-            wave_data = self.generate_wave(self.frequency)
-            self.sound = pygame.sndarray.make_sound(wave_data)
-            self.sound.play(loops=-1)
+        self.stream.set_gain(self.volume / 100.0)
 
     def on_wave_change(self):
-        if self.is_playing and not self.is_paused:
-            if self.sound:
-                self.sound.stop()
-            wave_data = self.generate_wave(self.frequency)
-            self.sound = pygame.sndarray.make_sound(wave_data)
-            self.sound.play(loops=-1)
+        self.stream.set_wave(self.wave_var.get())
 
     def animate_wave(self):
         if not self.animation_running:
@@ -894,20 +847,8 @@ class ToneGeneratorTest:
         num_points = width
 
         cycles = 3
-        t = np.linspace(0, cycles / self.frequency, num_points)
-
-        wave_type = self.wave_var.get()
-
-        if wave_type == "sine":
-            y = np.sin(2 * np.pi * self.frequency * t)
-        elif wave_type == "square":
-            y = np.sign(np.sin(2 * np.pi * self.frequency * t))
-        elif wave_type == "sawtooth":
-            y = 2 * (t * self.frequency - np.floor(t * self.frequency + 0.5))
-        elif wave_type == "triangle":
-            y = 2 * np.abs(2 * (t * self.frequency - np.floor(t * self.frequency + 0.5))) - 1
-        else:
-            y = np.sin(2 * np.pi * self.frequency * t)
+        phase = np.mod(np.linspace(0, cycles, num_points, dtype=np.float32), 1.0)
+        y = render_wave(phase, self.wave_var.get(), out=phase)
 
         y_scaled = height / 2 + (y * (height / 2 - 30))
 
@@ -928,6 +869,11 @@ class ToneGeneratorTest:
         if self.animation_running:
             self.canvas.after(50, self.animate_wave)
 
+    def on_destroy(self, event):
+        if event.widget is self.parent_frame:
+            self.auto_test_running = False
+            self.stream.stop()
+
     def cleanup_and_return(self):
         # Zatrzymaj auto test jeśli działa
         if self.auto_test_running:
@@ -0,0 +1,412 @@
+"""
+Track Player - Odtwarzanie utworów z zdekodowanego PCM
+Bose Audio Multi-Tool
+
+Utwór dekodowany jest raz do int16 (mikser pygame) i trzymany w cache LRU
+z budżetem pamięci. Start, przewijanie i powrót na początek fragmentu to
+wycinek tablicy w RAM zamiast ponownego otwarcia i dekodowania pliku
+(pygame.mixer.music.load + play(start=...)). Kolejne utwory playlisty
+dekodowane są z wyprzedzeniem w wątku tła (prefetch).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pygame
+
+from audio_analysis import get_cached_loudness, loudness_gain, loudness_target, run_async, track_loudness
+from audio_metadata import get_audio_metadata
+from resource_manager import TRACK_CHANNEL, get_resource_manager
+from signals import mixer_sample_rate
+
+# Budżet zdekodowanych utworów (~4 min stereo 44.1 kHz ≈ 42 MiB)
+TRACK_CACHE_BUDGET = 256 * 1024 * 1024
+
+# Ile kolejnych utworów playlisty dekodować z wyprzedzeniem
+PREFETCH_DEPTH = 2
+FRAME_BYTES = 4   # int16 × 2 kanały
+
+
+class TrackCache:
+    """Cache LRU zdekodowanych utworów - singleton"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._initialized = True
+        self.tracks = OrderedDict()   # ścieżka → (stempel pliku, Sound, pcm, bajty)
+        self.budget = TRACK_CACHE_BUDGET
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+        self.decode_seconds = 0.0
+        self.prefetched = 0
+        self.prefetch_hits = 0
+        self._lock = threading.Lock()
+        self._decoding = {}            # ścieżka → Event, dekodowanie w toku
+        self._unused = set()           # zdekodowane z wyprzedzeniem, jeszcze nie odtworzone
+
+        self._queue = []               # ścieżki do prefetchu, zastępowane przy każdym prefetch()
+        self._queue_cond = threading.Condition(self._lock)
+        self._worker = None
+
+    def get(self, filepath):
+        """Zwraca PCM int16 (N, 2) utworu - dekodowanie tylko przy pierwszym użyciu"""
+        return self._get(filepath, prefetch=False)
+
+    def _get(self, filepath, prefetch):
+        stat = os.stat(filepath)
+        stamp = (stat.st_size, stat.st_mtime)
+
+        while True:
+            with self._lock:
+                entry = self.tracks.get(filepath)
+                if entry is not None and entry[0] == stamp:
+                    if not prefetch:
+                        self.tracks.move_to_end(filepath)
+                        self.hits += 1
+                        if filepath in self._unused:
+                            self._unused.discard(filepath)
+                            self.prefetch_hits += 1
+                    return entry[2]
+
+                # Ten sam plik dekodowany już w innym wątku - poczekaj na wynik
+                pending = self._decoding.get(filepath)
+                if pending is None:
+                    if not prefetch:
+                        self.misses += 1
+                    done = threading.Event()
+                    self._decoding[filepath] = done
+                    break
+            pending.wait()
+
+        try:
+            return self._decode(filepath, stamp, prefetch)
+        finally:
+            with self._lock:
+                self._decoding.pop(filepath, None)
+            done.set()
+
+    def contains(self, filepath):
+        """Czy aktualny PCM utworu jest już w cache (get() nie będzie dekodować)"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        with self._lock:
+            entry = self.tracks.get(filepath)
+            return entry is not None and entry[0] == (stat.st_size, stat.st_mtime)
+
+    def decode(self, filepath):
+        """
+        PCM utworu do analizy: z cache, jeśli już jest, w przeciwnym razie
+        dekodowany jednorazowo - bez wpisu do cache i bez wpływu na statystyki
+        """
+        stat = os.stat(filepath)
+        stamp = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            entry = self.tracks.get(filepath)
+            if entry is not None and entry[0] == stamp:
+                return entry[2]
+        # Kopia - widok na bufor Sound nie może przeżyć samego Sound
+        return pygame.sndarray.array(pygame.mixer.Sound(filepath))
+
+    def _decode(self, filepath, stamp, prefetch):
+        start = time.perf_counter()
+        sound = pygame.mixer.Sound(filepath)
+        # Widok na bufor Sound (bez kopii) - Sound trzymany w cache razem z nim
+        pcm = pygame.sndarray.samples(sound)
+        size = pcm.nbytes
+        elapsed = time.perf_counter() - start
+        print(f"[TrackCache] Zdekodowano{' (prefetch)' if prefetch else ''} {os.path.basename(filepath)}: "
+              f"{size / 1048576:.1f} MiB w {elapsed * 1000:.0f} ms")
+
+        with self._lock:
+            self.decodes += 1
+            self.decode_seconds += elapsed
+            old = self.tracks.pop(filepath, None)
+            if old is not None:
+                self.total_bytes -= old[3]
+            if size <= self.budget:
+                if prefetch:
+                    # Utwór "na zapas" nie wyprzedza w LRU tych już używanych
+                    self.tracks[filepath] = (stamp, sound, pcm, size)
+                    self.tracks.move_to_end(filepath, last=False)
+                    self._unused.add(filepath)
+                    self.prefetched += 1
+                else:
+                    self.tracks[filepath] = (stamp, sound, pcm, size)
+                self.total_bytes += size
+                while self.total_bytes > self.budget:
+                    evicted_path, (_, _, _, evicted) = self.tracks.popitem(last=False)
+                    self._unused.discard(evicted_path)
+                    self.total_bytes -= evicted
+
+        return pcm
+
+    # ─────────────────────────────────────────
+    # PREFETCH
+    # ─────────────────────────────────────────
+
+    def prefetch(self, filepaths):
+        """
+        Dekoduje w tle podane utwory (kolejne z playlisty) - zastępuje poprzednią kolejkę
+        Prefetch nie wypycha z cache utworów już używanych: plik, który nie mieści się
+        w wolnej części budżetu, jest pomijany
+        """
+        with self._queue_cond:
+            self._queue = [p for p in filepaths if p not in self.tracks]
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._prefetch_worker, daemon=True)
+                self._worker.start()
+            self._queue_cond.notify()
+
+    def prefetch_playlist(self, playlist, index, depth=PREFETCH_DEPTH):
+        """Prefetch utworu index (o ile jeszcze nie zdekodowany) i depth następnych, cyklicznie"""
+        if not playlist:
+            return
+        count = min(depth + 1, len(playlist))
+        self.prefetch([playlist[(index + i) % len(playlist)] for i in range(count)])
+
+    def _prefetch_worker(self):
+        while True:
+            with self._queue_cond:
+                while not self._queue:
+                    self._queue_cond.wait()
+                filepath = self._queue.pop(0)
+                free = self.budget - self.total_bytes
+
+            try:
+                # Metadane z nagłówka (cache) - przy okazji rozgrzewa je dla UI
+                info = get_audio_metadata().get(filepath)
+                if info is None:
+                    continue
+                # Mikser przelicza na własną częstotliwość - od niej zależy rozmiar PCM
+                estimate = info['duration'] * mixer_sample_rate() * FRAME_BYTES
+                if estimate > free:
+                    print(f"[TrackCache] Prefetch pominięty (budżet): {os.path.basename(filepath)}")
+                    continue
+                pcm = self._get(filepath, prefetch=True)
+                # Poziom liczony przy okazji prefetchu - TEST 1 ma korektę od pierwszego kroku
+                if loudness_target() is not None and get_cached_loudness(filepath) is None:
+                    track_loudness(filepath, pcm=pcm)
+            except Exception as e:
+                print(f"[TrackCache] Błąd prefetchu {os.path.basename(filepath)}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self.tracks.clear()
+            self._unused.clear()
+            self.total_bytes = 0
+
+    def get_status(self):
+        with self._lock:
+            return {
+                'tracks': len(self.tracks),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'decodes': self.decodes,
+                'avg_decode_ms': self.decode_seconds / self.decodes * 1000 if self.decodes else 0.0,
+                'prefetched': self.prefetched,
+                'prefetch_hits': self.prefetch_hits,
+                'prefetch_pending': len(self._queue)
+            }
+
+
+def get_track_cache():
+    """Zwraca instancję TrackCache (singleton)"""
+    return TrackCache()
+
+
+class TrackPlayer:
+    """Odtwarzacz utworu na zarezerwowanym kanale - zamiennik pygame.mixer.music"""
+
+    def __init__(self, channel_id=TRACK_CHANNEL):
+        self.channel_id = channel_id
+        self.filepath = None
+        self.pcm = None
+        self.sample_rate = mixer_sample_rate()
+        self.length = 0.0
+        self.volume = 1.0
+        self.gain = 1.0           # korekta głośności utworu (poziom zintegrowany → cel)
+        self._pending_gain = None # korekta zmierzona w trakcie odtwarzania - od następnego kroku
+
+        self._sound = None
+        self._start_pos = 0.0
+        self._started_at = 0.0
+        self._paused_at = None
+        self._loop_length = 0.0   # > 0: odtwarzany fragment w pętli
+        self._loading = None      # utwór dekodowany w tle przez load_async()
+
+    @property
+    def channel(self):
+        return get_resource_manager().reserved_channel(self.channel_id)
+
+    def load(self, filepath, pcm=None):
+        """Przygotowuje utwór (z cache PCM) - nie zaczyna odtwarzania"""
+        self.stop()
+        self.pcm = pcm if pcm is not None else get_track_cache().get(filepath)
+        self.filepath = filepath
+        self.sample_rate = mixer_sample_rate()
+        self.length = len(self.pcm) / self.sample_rate
+
+        # Korekta poziomu z cache metadanych; brak = analiza w tle, a jej wynik
+        # obowiązuje od następnego set_volume()/play() - poziom w trakcie kroku
+        # TEST 1 się nie zmienia
+        target = loudness_target()
+        loudness = get_cached_loudness(filepath)
+        self.gain = loudness_gain(loudness, target)
+        self._pending_gain = None
+        if loudness is None and target is not None:
+            # PCM przekazany jawnie - po szybkiej zmianie utworu self.pcm wskazuje już inny
+            threading.Thread(target=self._measure_loudness, args=(filepath, self.pcm, target),
+                             daemon=True).start()
+
+    def load_async(self, window, filepath, on_loaded, on_error=None):
+        """
+        load() bez blokowania wątku Tk: utwór spoza cache dekodowany jest w tle
+        (run_async), a on_loaded() wołane po załadowaniu. Późniejsze load_async()
+        albo stop() unieważnia ładowanie w toku
+        """
+        self.stop()
+        self._loading = filepath
+
+        def loaded(pcm=None):
+            if self._loading != filepath:
+                return
+            self._loading = None
+            try:
+                self.load(filepath, pcm)
+            except Exception as e:
+                failed(e)
+                return
+            on_loaded()
+
+        def failed(error):
+            if on_error:
+                on_error(error)
+
+        def decode_failed(error):
+            if self._loading == filepath:
+                self._loading = None
+                failed(error)
+
+        if get_track_cache().contains(filepath):
+            loaded()
+        else:
+            print(f"[TrackPlayer] Dekodowanie w tle: {os.path.basename(filepath)}")
+            run_async(window, get_track_cache().get, (filepath,), loaded, decode_failed)
+
+    @property
+    def is_loading(self):
+        return self._loading is not None
+
+    def _measure_loudness(self, filepath, pcm, target):
+        try:
+            gain = loudness_gain(track_loudness(filepath, pcm=pcm), target)
+        except Exception as e:
+            print(f"[TrackPlayer] Błąd pomiaru poziomu: {e}")
+            return
+        if self.filepath == filepath:
+            self._pending_gain = gain
+
+    def _apply_pending_gain(self):
+        gain, self._pending_gain = self._pending_gain, None
+        if gain is not None:
+            self.gain = gain
+
+    @property
+    def output_volume(self):
+        """Głośność kanału: poziom ustawiony przez test × korekta poziomu utworu"""
+        return self.volume * self.gain
+
+    def play(self, start=0.0):
+        """Odtwarza od pozycji start [s] - wycinek PCM w RAM, bez dekodowania"""
+        if self.pcm is None:
+            return
+
+        frame = min(max(int(start * self.sample_rate), 0), len(self.pcm) - 1)
+        self._sound = pygame.mixer.Sound(buffer=self.pcm[frame:])
+
+        channel = self.channel
+        self._apply_pending_gain()
+        channel.set_volume(self.output_volume)
+        channel.play(self._sound)
+
+        self._start_pos = frame / self.sample_rate
+        self._started_at = time.perf_counter()
+        self._paused_at = None
+        self._loop_length = 0.0
+
+    def play_fragment(self, start, end):
+        """
+        Zapętla fragment [start, end) - wycięty raz segment PCM z loops=-1
+        Pętla jest dokładna co do próbki i nie wymaga odpytywania pozycji
+        """
+        if self.pcm is None:
+            return
+
+        first = min(max(int(start * self.sample_rate), 0), len(self.pcm) - 1)
+        last = min(max(int(end * self.sample_rate), first + 1), len(self.pcm))
+        self._sound = pygame.mixer.Sound(buffer=self.pcm[first:last])
+
+        channel = self.channel
+        self._apply_pending_gain()
+        channel.set_volume(self.output_volume)
+        channel.play(self._sound, loops=-1)
+
+        self._start_pos = first / self.sample_rate
+        self._started_at = time.perf_counter()
+        self._paused_at = None
+        self._loop_length = (last - first) / self.sample_rate
+
+    def pause(self):
+        if self._sound is not None and self._paused_at is None:
+            self.channel.pause()
+            self._paused_at = time.perf_counter()
+
+    def unpause(self):
+        if self._paused_at is not None:
+            self.channel.unpause()
+            self._started_at += time.perf_counter() - self._paused_at
+            self._paused_at = None
+
+    def stop(self):
+        self._loading = None
+        if self._sound is not None:
+            self.channel.stop()
+        self._sound = None
+        self._paused_at = None
+
+    def set_volume(self, volume):
+        """Głośność 0.0-1.0 (kanał - bez zmiany próbek), z korektą poziomu utworu"""
+        self.volume = min(max(volume, 0.0), 1.0)
+        self._apply_pending_gain()
+        if self._sound is not None:
+            self.channel.set_volume(self.output_volume)
+
+    def get_pos(self):
+        """Pozycja odtwarzania w utworze [s]"""
+        if self._sound is None:
+            return 0.0
+        now = self._paused_at if self._paused_at is not None else time.perf_counter()
+        elapsed = now - self._started_at
+        if self._loop_length > 0:
+            elapsed %= self._loop_length
+        return min(self._start_pos + elapsed, self.length)
+
+    def get_busy(self):
+        return self._sound is not None and self.channel.get_busy()